@@ -0,0 +1,95 @@
+"""
+Content-addressed cache of image analysis results
+
+The key is a SHA-256 of the uploaded bytes plus the model version and the
+confidence threshold, so a re-uploaded photo (retries, shared pictures,
+re-submits) gets the stored detections, thumbnail and annotated URLs back
+without running YOLO or writing new files. Entries are evicted least
+recently used beyond max_entries; entries from another model version are
+purged at startup and can never match anyway, since the version is part
+of the key. Eviction only drops cache rows: the files stay, because
+reports may already point at them.
+"""
+
+import json
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class AnalysisCache:
+    """LRU cache rows in the analysis_cache table; callers pass the connection"""
+
+    def __init__(self, model_version, conf, max_entries=5000):
+        self.model_version = model_version
+        self.conf = conf
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0, "stale": 0}
+
+    def key(self, data):
+        return f"{content_hash(data)}:{self.model_version}:{self.conf}"
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def get(self, conn, key, exists=None):
+        """Cached result dict, or None. `exists(result)` rejects rows whose files are gone"""
+        row = conn.execute("SELECT result FROM analysis_cache WHERE key = ?", (key,)).fetchone()
+        if row:
+            result = json.loads(row['result'])
+            if exists is None or exists(result):
+                conn.execute("UPDATE analysis_cache SET last_used_at = datetime('now') WHERE key = ?", (key,))
+                conn.commit()
+                self._count("hits")
+                return result
+            conn.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+            conn.commit()
+            self._count("stale")
+        self._count("misses")
+        return None
+
+    def put(self, conn, key, result):
+        conn.execute("""
+            INSERT OR REPLACE INTO analysis_cache (key, model_version, result, last_used_at)
+            VALUES (?, ?, ?, datetime('now'))
+        """, (key, self.model_version, json.dumps(result)))
+        count = conn.execute("SELECT COUNT(*) FROM analysis_cache -- full-scan-ok: bounded by max_entries").fetchone()[0]
+        evicted = 0
+        if count > self.max_entries:
+            evicted = conn.execute("""
+                DELETE FROM analysis_cache WHERE key IN (
+                    SELECT key FROM analysis_cache ORDER BY last_used_at LIMIT ?
+                )
+            """, (count - self.max_entries,)).rowcount
+        conn.commit()
+        self._count("stores")
+        if evicted:
+            self._count("evicted", evicted)
+
+    def purge_other_versions(self, conn):
+        """Drop entries computed by a different model; returns rows removed"""
+        removed = conn.execute(
+            "DELETE FROM analysis_cache WHERE model_version != ? -- full-scan-ok: startup only",
+            (self.model_version,)
+        ).rowcount
+        conn.commit()
+        if removed:
+            logger.info(f"🧹 Dropped {removed} analysis cache entries from an older model")
+        return removed
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0
+        stats["max_entries"] = self.max_entries
+        stats["model_version"] = self.model_version
+        return stats
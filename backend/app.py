@@ -7,40 +7,124 @@ COMPLETE VERSION WITH CORS FIXES
 
 import os
 import io
+import atexit
+import base64
 import sqlite3
 import json
 import logging
 from datetime import datetime, timedelta
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
-from PIL import Image, ImageDraw, ImageFont
 import jwt
 from functools import wraps
-from ultralytics import YOLO
-import cv2
 import numpy as np
 
+from analysis_cache import AnalysisCache
+from blob_store import LocalBlobStore, is_blob_id, store_blob, touch
+from bulk_ingest import iter_ndjson, chunked, validate_chunk, insert_rows
+from clusters import query_clusters, MAX_CLUSTER_ZOOM
+from data_version import DataVersion, conditional
+from db_pool import ConnectionPool
+from fast_json import RawJSON, compress_response, encode, encode_rows, json_response, row_dict
+from dedup import find_duplicate, merge_submission
+from tiles import TileCache, CLUSTER_TILE_ZOOM, valid_tile
+from geo import parse_bbox, radius_bbox
+from image_pipeline import decode, save_annotated
+from image_variants import VariantCache, VARIANT_WIDTHS, THUMB_WIDTH, available_formats, negotiate_format, variant_url
+from inference import BatchScheduler, QueueFull
+from inference_workers import InferencePool, worker_count
+from jobs import JobRunner, create_job, delete_job, get_job
+from media import StaticManifest, send_asset, send_media, IMMUTABLE_MAX_AGE
+from model_backends import load_backend
+from migrations import run_migrations
+from query_cache import QueryCache
+from report_queries import build_reports_query
+from stats_rollup import read_counters, daily_counts, severity_counts as severity_counts_rollup
+
 # ---- CONFIG ----
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 UPLOADS_DIR = os.path.join(STATIC_DIR, "uploads")
+UPLOADS_URL = "/static/uploads"
 THUMBS_DIR = os.path.join(STATIC_DIR, "thumbs")
 DB_PATH = os.path.join(BASE_DIR, "potholes.db")
+DATA_VERSION_PATH = f"{DB_PATH}.version"  # shared with dashboard.py and manage.py
+TILE_CACHE_DIR = os.path.join(BASE_DIR, "tile_cache")
+VARIANT_CACHE_DIR = os.path.join(BASE_DIR, "variant_cache")
+STATIC_CACHE_DIR = os.path.join(BASE_DIR, "static_cache")
 
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 os.makedirs(THUMBS_DIR, exist_ok=True)
 
 ALLOWED_EXT = {"png", "jpg", "jpeg", "webp", "gif"}
 MAX_MB = 16
+MAX_RADIUS_M = 50000
+MAX_PAGE_SIZE = 1000  # /api/reports ?limit is capped at this (ReportPage asks for 1000)
+TILE_MAX_AGE = 60  # seconds browsers/proxies may reuse a tile before revalidating
+
+# Resized image variants (/img/<name>): disk cache bound (LRU) and browser cache lifetime
+VARIANT_CACHE_MAX_MB = int(os.environ.get("VARIANT_CACHE_MAX_MB", "512"))
+VARIANT_MAX_AGE = 7 * 24 * 3600
+
+# Read-endpoint result cache (reports, comments, stats): body bytes bound (LRU) and TTL
+QUERY_CACHE_MAX_MB = int(os.environ.get("QUERY_CACHE_MAX_MB", "32"))
+QUERY_CACHE_TTL_S = 60
+
+# Uploads and thumbnails from before content addressing may in theory be replaced
+LEGACY_MEDIA_MAX_AGE = 24 * 3600
+
+# Submissions this close to a recently active report confirm it instead of adding a marker
+DEDUP_RADIUS_M = 15
+DEDUP_WINDOW_DAYS = 30
+
+# Bulk ingestion: rows per executemany/transaction and per-item errors echoed back
+BULK_CHUNK_SIZE = 2000
+MAX_BULK_ERRORS = 1000
+
+# Inference runtime: torch, onnx or openvino (exported once and cached next to the weights)
+YOLO_WEIGHTS = "yolov8n.pt"
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", "0")) or None
+INFERENCE_INT8 = os.environ.get("INFERENCE_INT8", "").lower() in ("1", "true", "yes")
+
+# Out-of-process inference: model worker processes per CPU core (0, the default, loads the model in this process)
+INFERENCE_WORKERS_PER_CORE = float(os.environ.get("INFERENCE_WORKERS_PER_CORE", "0"))
+INFERENCE_WORKERS = worker_count(INFERENCE_WORKERS_PER_CORE)
+INFERENCE_WORKER_TIMEOUT_S = 30
+INFERENCE_HEALTH_INTERVAL_S = 10
+
+# YOLO micro-batching: concurrent uploads share one forward pass
+YOLO_CONF = 0.25
+YOLO_MAX_BATCH = 8
+YOLO_MAX_WAIT_MS = 20
+YOLO_MAX_QUEUE = 256
+YOLO_TIMEOUT_S = 60
+
+# Asynchronous analyze-image jobs: worker threads and queued-job backpressure
+ANALYSIS_WORKERS = 4
+ANALYSIS_MAX_PENDING = 64
+ANALYSIS_RETRY_AFTER_S = 5
+
+# Content-addressed analysis cache: entries kept (LRU) per model version
+ANALYSIS_CACHE_MAX_ENTRIES = 5000
 
 # JWT Secret
 SECRET_KEY = os.environ.get("SECRET_KEY", "deepseek-pothole-ai-secret-2024")
 
 # Initialize Flask
-app = Flask(__name__, static_folder=STATIC_DIR, static_url_path="")
+# Static files are served by serve_static/serve_frontend below, not Flask's static route
+app = Flask(__name__, static_folder=None)
+data_version = DataVersion(DATA_VERSION_PATH)
+# Tile renders that overlap another process's invalidation are not stored
+tile_cache = TileCache(TILE_CACHE_DIR, data_version=data_version)
+query_cache = QueryCache(QUERY_CACHE_MAX_MB * 1024 * 1024, ttl=QUERY_CACHE_TTL_S, data_version=data_version)
+blob_store = LocalBlobStore(UPLOADS_DIR, UPLOADS_URL)
+static_manifest = StaticManifest(STATIC_DIR, STATIC_CACHE_DIR, exclude=("uploads", "thumbs")).build()
+variant_cache = VariantCache(VARIANT_CACHE_DIR, VARIANT_CACHE_MAX_MB * 1024 * 1024)
+IMAGE_FORMATS = available_formats()
 app.config["SECRET_KEY"] = SECRET_KEY
 app.config["MAX_CONTENT_LENGTH"] = MAX_MB * 1024 * 1024
 
@@ -60,6 +144,9 @@ CORS(app, resources={
     }
 })
 
+# Large JSON bodies are compressed for clients that accept gzip/brotli
+app.after_request(compress_response)
+
 # SocketIO with enhanced CORS
 socketio = SocketIO(
     app,
@@ -82,71 +169,27 @@ logger = logging.getLogger(__name__)
 
 
 # ---- DATABASE ----
+db_pool = ConnectionPool(DB_PATH)
+
+
 def db_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow this thread's pooled connection; conn.close() hands it back"""
+    return db_pool.connect()
+
+
+def record_write(*tags):
+    """After a commit: drop cached results with these tags and bump the data version"""
+    query_cache.record_write(tags, data_version.bump)
+
+
+@app.teardown_appcontext
+def release_db_conn(exception=None):
+    db_pool.release()
 
 
 def init_db():
     conn = db_conn()
-
-    # Users table
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            role TEXT DEFAULT 'user',
-            created_at TEXT DEFAULT (datetime('now')),
-            last_login TEXT
-        )
-    """)
-
-    # Reports table
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS reports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            text TEXT NOT NULL,
-            lat REAL NOT NULL,
-            lon REAL NOT NULL,
-            severity TEXT NOT NULL,
-            image_url TEXT,
-            thumb_url TEXT,
-            ai_conf REAL,
-            ai_boxes TEXT,
-            verified BOOLEAN DEFAULT FALSE,
-            votes INTEGER DEFAULT 0,
-            created_at TEXT DEFAULT (datetime('now')),
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    """)
-
-    # Comments table
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS comments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            report_id INTEGER,
-            text TEXT NOT NULL,
-            created_at TEXT DEFAULT (datetime('now')),
-            FOREIGN KEY (user_id) REFERENCES users (id),
-            FOREIGN KEY (report_id) REFERENCES reports (id)
-        )
-    """)
-
-    # Votes table
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS votes (
-            user_id INTEGER,
-            report_id INTEGER,
-            vote_type TEXT CHECK(vote_type IN ('up', 'down')),
-            created_at TEXT DEFAULT (datetime('now')),
-            PRIMARY KEY (user_id, report_id)
-        )
-    """)
+    run_migrations(conn)
 
     # Create default admin user
     try:
@@ -201,92 +244,78 @@ def get_user_by_id(user_id):
 
 
 # ---- IMAGE PROCESSING ----
-def make_thumb(src, size=(480, 480)):
-    try:
-        im = Image.open(src)
-        im.thumbnail(size, Image.Resampling.LANCZOS)
-        name = f"th_{os.path.basename(src)}"
-        path = os.path.join(THUMBS_DIR, name)
-        im.save(path, optimize=True, quality=85)
-        return f"/static/thumbs/{name}"
-    except Exception as e:
-        logger.error(f"Thumbnail error: {e}")
-        return None
-
-
-def draw_detections(image_path, detections):
-    """Draw bounding boxes on image for visualization"""
+def draw_detections(image, name, detections):
+    """Draw bounding boxes on image for visualization; returns the annotated blob id"""
     try:
-        image = Image.open(image_path)
-        draw = ImageDraw.Draw(image)
-
-        # Try to load a font, fallback to default
-        try:
-            font = ImageFont.truetype("Arial.ttf", 20)
-        except:
-            font = ImageFont.load_default()
-
-        for detection in detections:
-            box = detection['box']
-            conf = detection['conf']
-
-            # Draw rectangle
-            draw.rectangle(box, outline="red", width=3)
-
-            # Draw confidence text
-            text = f"{conf:.2f}"
-            draw.text((box[0], box[1] - 20), text, fill="red", font=font)
-
-        # Save annotated image
-        annotated_path = image_path.replace('.', '_annotated.')
-        image.save(annotated_path)
-        return f"/static/uploads/{os.path.basename(annotated_path)}"
+        out = io.BytesIO()
+        save_annotated(image, detections, out, format="JPEG")
+        conn = db_conn()
+        annotated = store_blob(conn, blob_store, out.getvalue(), "jpg", parent=name)
+        conn.close()
+        return annotated
     except Exception as e:
         logger.error(f"Annotation error: {e}")
         return None
 
 
 # ---- AI MODEL ----
-logger.info("🔍 Loading YOLOv8 model...")
+# `python app.py` runs under the debug reloader: the first process only watches
+# files and restarts the serving child, so it must not load models or start workers
+RELOADER_PARENT = __name__ == "__main__" and os.environ.get("WERKZEUG_RUN_MAIN") != "true"
+
+if RELOADER_PARENT:
+    logger.info("🔍 Reloader process: the serving child loads the YOLO model")
+else:
+    logger.info(f"🔍 Loading YOLOv8 model ({INFERENCE_BACKEND} backend, {INFERENCE_WORKERS or 'no'} worker processes)...")
 try:
-    # Try to load custom pothole model, fallback to pretrained
-    yolo_model = YOLO("yolov8n.pt")
+    if RELOADER_PARENT:
+        yolo_model = None
+    elif INFERENCE_WORKERS:
+        # Split the cores between the workers unless a thread count is configured
+        yolo_model = InferencePool(
+            INFERENCE_BACKEND, YOLO_WEIGHTS, YOLO_CONF, workers=INFERENCE_WORKERS,
+            threads=INFERENCE_THREADS or max(1, (os.cpu_count() or 1) // INFERENCE_WORKERS),
+            int8=INFERENCE_INT8, timeout_s=INFERENCE_WORKER_TIMEOUT_S,
+            health_interval_s=INFERENCE_HEALTH_INTERVAL_S
+        )
+        atexit.register(yolo_model.close)
+    else:
+        yolo_model = load_backend(
+            INFERENCE_BACKEND, YOLO_WEIGHTS, YOLO_CONF,
+            threads=INFERENCE_THREADS, int8=INFERENCE_INT8
+        )
     logger.info("✅ YOLO model loaded successfully")
 except Exception as e:
     logger.error(f"❌ Failed to load YOLO model: {e}")
     yolo_model = None
 
 
-def analyze_with_yolo(image_path):
-    """Run YOLO detection and extract pothole-like boxes"""
-    if not yolo_model:
-        return []
+def predict_batch(images):
+    """One forward pass over a batch of images; one detection list per image"""
+    return yolo_model.predict_batch(images)
 
-    try:
-        results = yolo_model(image_path, conf=0.25)
-        detections = []
 
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                confidence = float(box.conf[0])
-                coordinates = [float(x) for x in box.xyxy[0].tolist()]
-
-                # Filter for objects that might be potholes (adjust classes as needed)
-                detections.append({
-                    "conf": confidence,
-                    "box": coordinates,
-                    "class": result.names[int(box.cls[0])] if hasattr(box, 'cls') else "unknown"
-                })
+yolo_scheduler = BatchScheduler(
+    predict_batch, max_batch=YOLO_MAX_BATCH, max_wait_ms=YOLO_MAX_WAIT_MS,
+    max_queue=YOLO_MAX_QUEUE, name="yolo", workers=INFERENCE_WORKERS or 1
+) if yolo_model else None
 
-        logger.info(
-            f"Detected {len(detections)} objects with average confidence: {np.mean([d['conf'] for d in detections]) if detections else 0:.3f}")
-        return detections
 
-    except Exception as e:
-        logger.error(f"Detection error: {e}")
+def analyze_with_yolo(image):
+    """Run YOLO detection (image path or RGB array) through the batch scheduler; raises on failure"""
+    if not yolo_scheduler:
         return []
 
+    detections = yolo_scheduler.submit(image).result(timeout=YOLO_TIMEOUT_S)
+    logger.info(
+        f"Detected {len(detections)} objects with average confidence: {np.mean([d['conf'] for d in detections]) if detections else 0:.3f}")
+    return detections
+
+
+analysis_cache = AnalysisCache(
+    yolo_model.version, YOLO_CONF, max_entries=ANALYSIS_CACHE_MAX_ENTRIES
+) if yolo_model else None
+
 
 # ---- HEALTH CHECK ----
 @app.route("/api/health", methods=["GET"])
@@ -296,7 +325,14 @@ def health_check():
         "status": "healthy",
         "message": "AI Pothole Detection Backend is running",
         "timestamp": datetime.utcnow().isoformat(),
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "db_pool": db_pool.stats(),
+        "inference": dict(yolo_scheduler.stats(), backend=yolo_model.name) if yolo_scheduler else None,
+        "inference_workers": yolo_model.stats() if isinstance(yolo_model, InferencePool) else None,
+        "analysis_jobs": analysis_jobs.stats(),
+        "analysis_cache": analysis_cache.stats() if analysis_cache else None,
+        "image_variants": dict(variant_cache.stats, formats=IMAGE_FORMATS),
+        "query_cache": query_cache.stats()
     })
 
 
@@ -321,6 +357,7 @@ def register():
         )
         user_id = cursor.lastrowid
         conn.commit()
+        record_write("users")
 
         # Generate token
         token = jwt.encode({
@@ -376,6 +413,8 @@ def login():
     )
     conn.commit()
     conn.close()
+    # Only the dashboard's user list shows last_login; nothing cached here does
+    record_write()
 
     # Generate token
     token = jwt.encode({
@@ -398,10 +437,96 @@ def login():
 
 
 # ---- IMAGE UPLOAD & ANALYSIS ----
+def analyze_upload(name, cache_key=None, data=None):
+    """Detections and annotated copy for a stored upload
+
+    The image is decoded once (data, or the stored file when not given) and
+    that buffer feeds the model and the annotation. The thumbnail is an
+    /img variant, rendered on its first request rather than here. With a
+    cache_key the result is stored in the analysis cache, but only when
+    detection actually ran; a failed model call is never cached.
+    """
+    if data is None:
+        data = blob_store.read(name)
+    image = decode(data)
+
+    # Run AI detection; boxes come back in buffer pixels, report them in original ones
+    detected = False
+    try:
+        detections = [
+            dict(d, box=image.to_original(d['box'])) for d in analyze_with_yolo(image.array)
+        ]
+        detected = yolo_scheduler is not None
+    except Exception as e:
+        logger.error(f"Detection error: {e}")
+        detections = []
+    avg_conf = round(float(np.mean([d['conf'] for d in detections])), 3) if detections else 0
+
+    # Create annotated image
+    annotated_id = draw_detections(image, name, detections) if detections else None
+
+    result = {
+        "url": blob_store.url(name),
+        "thumb_url": variant_url(name),
+        "annotated_url": blob_store.url(annotated_id) if annotated_id else None,
+        "image_id": name,
+        "annotated_id": annotated_id,
+        "detections": detections,
+        "detection_count": len(detections),
+        "avg_conf": avg_conf
+    }
+
+    if cache_key and detected:
+        conn = db_conn()
+        analysis_cache.put(conn, cache_key, result)
+        conn.close()
+    return result
+
+
+def cached_files_exist(result):
+    """A cache hit is only usable while the blobs it points at are still there"""
+    if not result.get('image_id'):
+        return False
+    return all(blob_store.exists(blob) for blob in (result['image_id'], result['annotated_id']) if blob)
+
+
+def run_analysis_job(job):
+    if not blob_store.exists(job['image_name']):
+        raise FileNotFoundError(f"upload {job['image_name']} is missing")
+    return analyze_upload(job['image_name'], job['cache_key'])
+
+
+def push_job_result(job):
+    socketio.emit("analysis_done", job_payload(job), to=f"job:{job['id']}")
+
+
+def job_payload(job):
+    return {
+        "job_id": job['id'],
+        "state": job['state'],
+        "result": job['result'],
+        "error": job['error'],
+        "created_at": job['created_at'],
+        "updated_at": job['updated_at']
+    }
+
+
+analysis_jobs = JobRunner(
+    db_conn, run_analysis_job, max_workers=ANALYSIS_WORKERS,
+    max_pending=ANALYSIS_MAX_PENDING, on_finished=push_job_result
+)
+
+
 @app.route("/api/analyze-image", methods=["POST"])
 @token_required
 def analyze_image(current_user):
-    """Accept uploaded image and run AI detection"""
+    """Accept uploaded image and run AI detection
+
+    With ?async=1 (or an `async` form field) the upload is stored, a job is
+    queued and 202 is returned at once; the result arrives as a Socket.IO
+    `analysis_done` event in room job:<id> and from GET /api/jobs/<id>.
+    Uploads already in the analysis cache are answered with 200 in both modes.
+    """
     if 'image' not in request.files:
         return jsonify({"error": "No image file provided"}), 400
 
@@ -409,34 +534,62 @@ def analyze_image(current_user):
     if file.filename == '' or not allowed_file(file.filename):
         return jsonify({"error": "Invalid file type"}), 400
 
-    try:
-        # Save uploaded file
-        timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
-        filename = secure_filename(file.filename)
-        name = f"{timestamp}_{filename}"
-        path = os.path.join(UPLOADS_DIR, name)
-        file.save(path)
+    run_async = (request.args.get('async') or request.form.get('async', '')).lower() in ('1', 'true', 'yes')
 
-        # Run AI detection
-        detections = analyze_with_yolo(path)
-        avg_conf = round(np.mean([d['conf'] for d in detections]), 3) if detections else 0
-
-        # Create thumbnail
-        thumb_url = make_thumb(path)
+    try:
+        # Identical bytes analyzed by the same model: answer from the cache, write nothing
+        data = file.read()
+        cache_key = analysis_cache.key(data) if analysis_cache else None
+        if cache_key:
+            conn = db_conn()
+            cached = analysis_cache.get(conn, cache_key, exists=cached_files_exist)
+            if cached:
+                # The blobs are about to be reported again; keep them out of garbage collection
+                touch(conn, [blob for blob in (cached['image_id'], cached['annotated_id']) if blob])
+            conn.close()
+            if cached:
+                logger.info(f"♻️ User {current_user['username']} re-uploaded a cached image")
+                return jsonify({
+                    "status": "success",
+                    **cached,
+                    "cached": True,
+                    "user_id": current_user['id']
+                })
 
-        # Create annotated image
-        annotated_url = draw_detections(path, detections) if detections else None
+        # Save uploaded file, content-addressed: identical bytes share one blob
+        conn = db_conn()
+        name = store_blob(conn, blob_store, data, file.filename.rsplit('.', 1)[1])
+        conn.close()
 
-        logger.info(f"✅ User {current_user['username']} analyzed image: {len(detections)} detections")
+        if run_async:
+            conn = db_conn()
+            job_id = create_job(conn, current_user['id'], name, cache_key)
+            try:
+                analysis_jobs.submit(job_id)
+            except QueueFull:
+                # The unreferenced blob is left to garbage collection
+                delete_job(conn, job_id)
+                conn.close()
+                response = jsonify({"error": "Analysis queue is full, try again shortly"})
+                response.headers['Retry-After'] = str(ANALYSIS_RETRY_AFTER_S)
+                return response, 429
+            conn.close()
+
+            logger.info(f"🕒 User {current_user['username']} queued analysis job {job_id}")
+            return jsonify({
+                "status": "queued",
+                "job_id": job_id,
+                "status_url": f"/api/jobs/{job_id}",
+                "url": blob_store.url(name)
+            }), 202
+
+        result = analyze_upload(name, cache_key, data)
+
+        logger.info(f"✅ User {current_user['username']} analyzed image: {result['detection_count']} detections")
 
         return jsonify({
             "status": "success",
-            "url": f"/static/uploads/{name}",
-            "thumb_url": thumb_url,
-            "annotated_url": annotated_url,
-            "detections": detections,
-            "detection_count": len(detections),
-            "avg_conf": avg_conf,
+            **result,
             "user_id": current_user['id']
         })
 
@@ -445,6 +598,18 @@ def analyze_image(current_user):
         return jsonify({"error": "Image processing failed"}), 500
 
 
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+@token_required
+def get_analysis_job(current_user, job_id):
+    conn = db_conn()
+    job = get_job(conn, job_id)
+    conn.close()
+
+    if not job or (job['user_id'] != current_user['id'] and current_user['role'] != 'admin'):
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_payload(job))
+
+
 # ---- REPORTS ----
 @app.route("/api/report", methods=["POST"])
 @token_required
@@ -455,27 +620,72 @@ def add_report(current_user):
     if not data or not all(field in data for field in required_fields):
         return jsonify({"error": "Missing required fields"}), 400
 
+    try:
+        lat = float(data['lat'])
+        lon = float(data['lon'])
+    except (TypeError, ValueError):
+        return jsonify({"error": "lat and lon must be numbers"}), 400
+    # Comparisons are false for NaN, so this rejects it too
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"error": "lat/lon out of range"}), 400
+
+    ai_conf = data.get('ai_conf')
+    if ai_conf is not None:
+        try:
+            ai_conf = float(ai_conf)
+        except (TypeError, ValueError):
+            return jsonify({"error": "ai_conf must be a number"}), 400
+        if not 0 <= ai_conf <= 1:
+            return jsonify({"error": "ai_conf must be in [0, 1]"}), 400
+
+    try:
+        # Stored JSON is embedded raw in responses; NaN/Infinity would make them invalid
+        ai_boxes = json.dumps(data['detections'], allow_nan=False) if data.get('detections') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "detections must be JSON without NaN or Infinity"}), 400
+
+    submission = {
+        'text': data['text'],
+        'lat': lat,
+        'lon': lon,
+        'severity': data['severity'],
+        'image_url': data.get('image_url'),
+        'thumb_url': data.get('thumb_url'),
+        'ai_conf': ai_conf,
+        'ai_boxes': ai_boxes
+    }
+
     try:
         conn = db_conn()
-        cursor = conn.cursor()
 
-        cursor.execute("""
-            INSERT INTO reports 
-            (user_id, text, lat, lon, severity, image_url, thumb_url, ai_conf, ai_boxes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            current_user['id'],
-            data['text'],
-            float(data['lat']),
-            float(data['lon']),
-            data['severity'],
-            data.get('image_url'),
-            data.get('thumb_url'),
-            data.get('ai_conf'),
-            json.dumps(data.get('detections', [])) if data.get('detections') else None
-        ))
-
-        report_id = cursor.lastrowid
+        # Hold the write lock across lookup and insert so concurrent
+        # submissions of the same pothole cannot both create a row
+        conn.execute("BEGIN IMMEDIATE")
+        duplicate = find_duplicate(
+            conn, submission['lat'], submission['lon'], DEDUP_RADIUS_M, DEDUP_WINDOW_DAYS
+        )
+
+        if duplicate:
+            report_id = duplicate['id']
+            merge_submission(conn, duplicate, submission)
+        else:
+            cursor = conn.execute("""
+                INSERT INTO reports 
+                (user_id, text, lat, lon, severity, image_url, thumb_url, ai_conf, ai_boxes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                current_user['id'],
+                submission['text'],
+                submission['lat'],
+                submission['lon'],
+                submission['severity'],
+                submission['image_url'],
+                submission['thumb_url'],
+                submission['ai_conf'],
+                submission['ai_boxes']
+            ))
+            report_id = cursor.lastrowid
+
         conn.commit()
 
         # Get the complete report
@@ -486,12 +696,21 @@ def add_report(current_user):
 
         conn.close()
 
-        report_dict = dict(report)
-        report_dict['created_at'] = report_dict['created_at']
+        # Socket payloads and this response carry ai_boxes decoded, as /api/reports does
+        report_dict = row_dict(report)
+        report_dict['merged'] = bool(duplicate)
 
-        # Broadcast new report
-        socketio.emit("new_report", report_dict)
-        logger.info(f"✅ New report added by {current_user['username']}: ID {report_id}")
+        record_write("reports")
+        tile_cache.invalidate_point(report_dict['lat'], report_dict['lon'])
+
+        if duplicate:
+            socketio.emit("report_confirmed", report_dict)
+            logger.info(f"🔁 Report by {current_user['username']} merged into ID {report_id} "
+                        f"({report_dict['confirmations']} confirmations)")
+        else:
+            # Broadcast new report
+            socketio.emit("new_report", report_dict)
+            logger.info(f"✅ New report added by {current_user['username']}: ID {report_id}")
 
         return jsonify(report_dict)
 
@@ -500,66 +719,291 @@ def add_report(current_user):
         return jsonify({"error": "Failed to create report"}), 500
 
 
+@app.route("/api/reports/bulk", methods=["POST"])
+@token_required
+def add_reports_bulk(current_user):
+    """Ingest many reports at once from a JSON array or an NDJSON stream
+
+    Items take the same fields as POST /api/report plus an optional
+    ISO-8601 created_at. Bulk feeds skip duplicate merging.
+    """
+    if request.mimetype in ("application/x-ndjson", "application/ndjson"):
+        items = iter_ndjson(line.decode("utf-8", "replace") for line in request.stream)
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            return jsonify({"error": "Expected a JSON array or an NDJSON body"}), 400
+        items = enumerate(data)
+
+    received = inserted = 0
+    errors = []
+    id_ranges = []
+    bounds = [90.0, 180.0, -90.0, -180.0]  # min_lat, min_lon, max_lat, max_lon
+
+    try:
+        conn = db_conn()
+        for chunk in chunked(items, BULK_CHUNK_SIZE):
+            received += len(chunk)
+            rows, chunk_errors = validate_chunk(chunk, current_user['id'])
+            errors.extend(chunk_errors)
+            if not rows:
+                continue
+
+            first_id, last_id = insert_rows(conn, rows)
+            inserted += len(rows)
+            id_ranges.append([first_id, last_id])
+            for row in rows:
+                bounds = [min(bounds[0], row[2]), min(bounds[1], row[3]),
+                          max(bounds[2], row[2]), max(bounds[3], row[3])]
+        conn.close()
+    except Exception as e:
+        logger.error(f"❌ Bulk ingestion error after {inserted} reports: {e}")
+        if inserted:
+            # Earlier chunks are committed
+            record_write("reports")
+        return jsonify({
+            "error": "Bulk ingestion failed",
+            "received": received,
+            "inserted": inserted,
+            "id_ranges": id_ranges
+        }), 500
+
+    if inserted:
+        record_write("reports")
+        tile_cache.invalidate_all()
+        # One coalesced broadcast for the whole batch
+        socketio.emit("reports_bulk", {
+            "count": inserted,
+            "id_ranges": id_ranges,
+            "bbox": [bounds[1], bounds[0], bounds[3], bounds[2]]
+        })
+
+    logger.info(f"📦 Bulk ingest by {current_user['username']}: "
+                f"{inserted}/{received} reports inserted, {len(errors)} rejected")
+
+    errors.sort(key=lambda e: e['index'])
+
+    return jsonify({
+        "received": received,
+        "inserted": inserted,
+        "rejected": len(errors),
+        "id_ranges": id_ranges,
+        "errors": errors[:MAX_BULK_ERRORS]
+    })
+
+
 @app.route("/api/reports")
+@conditional(data_version)
 def get_reports():
-    """Get paginated reports with filters"""
+    """Get paginated reports with filters
+
+    Viewport queries: ?bbox=minLon,minLat,maxLon,maxLat
+    Radius queries:   ?lat=..&lon=..&radius=<meters>
+    Both go through the reports_rtree spatial index.
+
+    Keyset paging: pass pagination.next_cursor back as ?after=<cursor>.
+    Cursor pages skip the COUNT(*) unless ?include_total=true.
+    """
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', 50, type=int)
+    if page < 1 or limit < 1:
+        return jsonify({"error": "page and limit must be positive integers"}), 400
+    limit = min(limit, MAX_PAGE_SIZE)
     severity = request.args.get('severity')
     verified = request.args.get('verified')
 
-    offset = (page - 1) * limit
+    cursor = request.args.get('after')
+    include_total = request.args.get('include_total', 'false' if cursor else 'true').lower() == 'true'
 
-    conn = db_conn()
+    try:
+        spatial = spatial_filter(request.args)
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    verified = verified.lower() == 'true' if verified is not None else None
+    if after:
+        page = None
+
+    # Parsed values, so equivalent query strings share an entry
+    key = ("reports", page, limit, severity, verified, include_total, tuple(after or ()),
+           tuple(sorted((spatial or {}).items())))
+    body = query_cache.get(
+        key, lambda: load_reports_page(page, limit, severity, verified, spatial, after, include_total),
+        tags=("reports", "votes")
+    )
+    return json_response(RawJSON(body))
 
-    query = """
-        SELECT r.*, u.username, 
-               (SELECT COUNT(*) FROM votes v WHERE v.report_id = r.id AND v.vote_type = 'up') as upvotes,
-               (SELECT COUNT(*) FROM votes v WHERE v.report_id = r.id AND v.vote_type = 'down') as downvotes
-        FROM reports r 
-        JOIN users u ON r.user_id = u.id
-    """
-    params = []
 
-    where_clauses = []
-    if severity:
-        where_clauses.append("r.severity = ?")
-        params.append(severity)
-    if verified is not None:
-        where_clauses.append("r.verified = ?")
-        params.append(verified.lower() == 'true')
+def load_reports_page(page, limit, severity, verified, spatial, after, include_total):
+    """Encoded /api/reports body; `page` is None in cursor mode"""
+    offset = 0 if after else (page - 1) * limit
 
-    if where_clauses:
-        query += " WHERE " + " AND ".join(where_clauses)
+    query, page_params, count_query, params = build_reports_query(
+        spatial=spatial,
+        severity=severity,
+        verified=verified,
+        after=after
+    )
 
-    query += " ORDER BY r.created_at DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+    conn = db_conn()
 
-    rows = conn.execute(query, params).fetchall()
+    # Fetch one extra row to learn whether another page exists
+    rows = conn.execute(query, page_params + [limit + 1, offset]).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
 
-    # Get total count for pagination
-    count_query = "SELECT COUNT(*) as total FROM reports r"
-    if where_clauses:
-        count_query += " WHERE " + " AND ".join(where_clauses)
-    total = conn.execute(count_query, params[:-2]).fetchone()['total']
+    # Totals are optional; by default only offset pagination pays for them
+    total = None
+    if include_total:
+        total = conn.execute(count_query, params).fetchone()['total']
 
     conn.close()
 
-    reports = [dict(row) for row in rows]
+    next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more and rows else None
 
-    logger.info(f"📊 Fetched {len(reports)} reports (page {page})")
+    logger.info(f"📊 Fetched {len(rows)} reports ({'cursor' if after else f'page {page}'})")
 
-    return jsonify({
-        "reports": reports,
+    return encode({
+        "reports": encode_rows(rows),
         "pagination": {
             "page": page,
             "limit": limit,
             "total": total,
-            "pages": (total + limit - 1) // limit
+            "pages": (total + limit - 1) // limit if total is not None else None,
+            "has_more": has_more,
+            "next_cursor": next_cursor
         }
     })
 
 
+def encode_cursor(created_at, report_id):
+    """Opaque keyset cursor for the (created_at, id) ordering of reports"""
+    raw = json.dumps([created_at, report_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, report_id = json.loads(raw)
+        return [str(created_at), int(report_id)]
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def spatial_filter(args):
+    """Turn bbox / lat+lon+radius query args into a bounding-box filter"""
+    if args.get('bbox'):
+        return {'bbox': parse_bbox(args['bbox'])}
+
+    if args.get('radius'):
+        try:
+            lat = float(args['lat'])
+            lon = float(args['lon'])
+            radius = float(args['radius'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("radius queries need numeric lat, lon and radius")
+        if radius <= 0 or radius > MAX_RADIUS_M:
+            raise ValueError(f"radius must be between 0 and {MAX_RADIUS_M} meters")
+        return {
+            'bbox': radius_bbox(lat, lon, radius),
+            'center': (lat, lon),
+            'radius': radius
+        }
+
+    return None
+
+
+# ---- CLUSTERS ----
+@app.route("/api/clusters")
+def get_clusters():
+    """Pre-aggregated marker clusters for ?bbox=minLon,minLat,maxLon,maxLat&zoom=z"""
+    zoom = request.args.get('zoom', type=int)
+    if zoom is None or not request.args.get('bbox'):
+        return jsonify({"error": "bbox and zoom are required"}), 400
+    zoom = max(0, min(zoom, MAX_CLUSTER_ZOOM))
+
+    conn = db_conn()
+    try:
+        clusters = query_clusters(conn, parse_bbox(request.args['bbox']), zoom)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        conn.close()
+
+    logger.info(f"🗺️ Fetched {len(clusters)} clusters (zoom {zoom})")
+
+    return jsonify({
+        "zoom": zoom,
+        "max_zoom": MAX_CLUSTER_ZOOM,
+        "clusters": clusters
+    })
+
+
+# ---- VECTOR TILES ----
+@app.route("/api/tiles/<int:z>/<int:x>/<int:y>.mvt")
+def get_tile(z, x, y):
+    """Mapbox Vector Tile of reports (clusters below CLUSTER_TILE_ZOOM)"""
+    if not valid_tile(z, x, y):
+        return jsonify({"error": "Tile out of range"}), 404
+
+    conn = db_conn()
+    data = tile_cache.get(conn, z, x, y)
+    conn.close()
+
+    response = app.response_class(data, mimetype="application/vnd.mapbox-vector-tile")
+    response.add_etag()
+    response.cache_control.public = True
+    response.cache_control.max_age = TILE_MAX_AGE
+    return response.make_conditional(request)
+
+
+# ---- IMAGE VARIANTS ----
+@app.route("/img/<name>")
+def get_image_variant(name):
+    """Upload resized to an allowed width (?w=) and format (?fmt=, else negotiated via Accept)"""
+    width = request.args.get("w", THUMB_WIDTH, type=int)
+    if width not in VARIANT_WIDTHS:
+        return jsonify({"error": f"w must be one of {', '.join(map(str, VARIANT_WIDTHS))}"}), 400
+    fmt = request.args.get("fmt")
+    if fmt and fmt not in IMAGE_FORMATS:
+        return jsonify({"error": f"fmt must be one of {', '.join(IMAGE_FORMATS)}"}), 400
+    if name != secure_filename(name) or not allowed_file(name):
+        return jsonify({"error": "Image not found"}), 404
+
+    if not blob_store.exists(name):
+        return jsonify({"error": "Image not found"}), 404
+
+    negotiated = not fmt
+    fmt = fmt or negotiate_format(request.accept_mimetypes, IMAGE_FORMATS)
+    key = variant_cache.key(name, width, fmt, blob_store.revision(name))
+
+    if request.if_none_match.contains(key):
+        response = app.response_class(status=304)
+    else:
+        try:
+            data = variant_cache.get(key, width, fmt, lambda: blob_store.read(name))
+        except FileNotFoundError:
+            return jsonify({"error": "Image not found"}), 404
+        except Exception as e:
+            logger.error(f"Variant error for {name}: {e}")
+            return jsonify({"error": "Image could not be decoded"}), 422
+        response = app.response_class(data, mimetype=f"image/{fmt}")
+
+    response.set_etag(key)
+    response.cache_control.public = True
+    if is_blob_id(name):
+        # Content-addressed source: this URL can never serve different bytes
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = VARIANT_MAX_AGE
+    if negotiated:
+        response.vary.add("Accept")
+    return response
+
+
 # ---- COMMENTS ----
 @app.route("/api/comment", methods=["POST"])
 @token_required
@@ -590,6 +1034,7 @@ def add_comment(current_user):
 
         conn.commit()
         conn.close()
+        record_write("comments")
 
         comment_dict = dict(comment)
         socketio.emit("new_comment", comment_dict)
@@ -604,9 +1049,18 @@ def add_comment(current_user):
 
 
 @app.route("/api/comments")
+@conditional(data_version)
 def get_comments():
     report_id = request.args.get('report_id')
+    if report_id and report_id.strip().isdigit():
+        report_id = int(report_id)
 
+    body = query_cache.get(("comments", report_id), lambda: load_comments(report_id), tags=("comments",))
+    return json_response(RawJSON(body))
+
+
+def load_comments(report_id):
+    """Encoded /api/comments body: one report's comments, or the latest 100"""
     conn = db_conn()
 
     if report_id:
@@ -628,10 +1082,9 @@ def get_comments():
 
     conn.close()
 
-    comments_list = [dict(row) for row in rows]
-    logger.info(f"💬 Fetched {len(comments_list)} comments")
+    logger.info(f"💬 Fetched {len(rows)} comments")
 
-    return jsonify(comments_list)
+    return encode_rows(rows).data
 
 
 # ---- VOTES ----
@@ -648,34 +1101,34 @@ def add_vote(current_user):
 
     try:
         conn = db_conn()
-        cursor = conn.cursor()
 
-        # Remove existing vote
-        cursor.execute(
-            "DELETE FROM votes WHERE user_id = ? AND report_id = ?",
-            (current_user['id'], data['report_id'])
-        )
+        # One write transaction: upsert the vote, triggers adjust the counters
+        conn.execute("BEGIN IMMEDIATE")
+        if not conn.execute("SELECT 1 FROM reports WHERE id = ?", (data['report_id'],)).fetchone():
+            conn.rollback()
+            conn.close()
+            return jsonify({"error": "Report not found"}), 404
 
-        # Add new vote
-        cursor.execute("""
+        conn.execute("""
             INSERT INTO votes (user_id, report_id, vote_type)
             VALUES (?, ?, ?)
+            ON CONFLICT (user_id, report_id)
+            DO UPDATE SET vote_type = excluded.vote_type, created_at = datetime('now')
         """, (current_user['id'], data['report_id'], data['vote_type']))
 
-        conn.commit()
-
-        # Get updated vote counts
-        upvotes = conn.execute(
-            "SELECT COUNT(*) as count FROM votes WHERE report_id = ? AND vote_type = 'up'",
+        counts = conn.execute(
+            "SELECT upvotes, downvotes, lat, lon FROM reports WHERE id = ?",
             (data['report_id'],)
-        ).fetchone()['count']
+        ).fetchone()
+        conn.commit()
+        conn.close()
+        record_write("votes")
 
-        downvotes = conn.execute(
-            "SELECT COUNT(*) as count FROM votes WHERE report_id = ? AND vote_type = 'down'",
-            (data['report_id'],)
-        ).fetchone()['count']
+        # Cluster tiles carry no vote attributes, only report tiles need a refresh
+        tile_cache.invalidate_point(counts['lat'], counts['lon'], min_zoom=CLUSTER_TILE_ZOOM)
 
-        conn.close()
+        upvotes = counts['upvotes']
+        downvotes = counts['downvotes']
 
         socketio.emit("vote_update", {
             "report_id": data['report_id'],
@@ -697,29 +1150,27 @@ def add_vote(current_user):
 
 # ---- STATISTICS ----
 @app.route("/api/stats")
+@conditional(data_version)
 def get_stats():
+    """Totals from the trigger-maintained rollups (see stats_rollup.py)"""
+    # Day buckets roll over at midnight UTC, so the date is part of the key
+    key = ("stats", datetime.utcnow().strftime("%Y-%m-%d"))
+    body = query_cache.get(key, load_stats, tags=("reports", "users"))
+    return json_response(RawJSON(body))
+
+
+def load_stats():
     conn = db_conn()
 
-    total_reports = conn.execute("SELECT COUNT(*) as count FROM reports").fetchone()['count']
-    total_users = conn.execute("SELECT COUNT(*) as count FROM users").fetchone()['count']
-    severity_counts = dict(conn.execute("""
-        SELECT severity, COUNT(*) as count 
-        FROM reports 
-        GROUP BY severity
-    """).fetchall())
-
-    recent_reports = conn.execute("""
-        SELECT COUNT(*) as count 
-        FROM reports 
-        WHERE created_at >= datetime('now', '-7 days')
-    """).fetchone()['count']
-
-    # Get recent activity (last 24 hours)
-    daily_reports = conn.execute("""
-        SELECT COUNT(*) as count 
-        FROM reports 
-        WHERE created_at >= datetime('now', '-1 day')
-    """).fetchone()['count']
+    totals = read_counters(conn, ['reports', 'users'])
+    total_reports = int(totals['reports'])
+    total_users = int(totals['users'])
+    severity_counts = severity_counts_rollup(conn)
+
+    # Day buckets (UTC): the last 7 days including today, and today alone
+    days = daily_counts(conn, 'reports', 7)
+    recent_reports = sum(count for _, count in days)
+    daily_reports = days[-1][1]
 
     conn.close()
 
@@ -733,21 +1184,37 @@ def get_stats():
 
     logger.info(f"📈 Stats fetched: {total_reports} total reports, {total_users} users")
 
-    return jsonify(stats_data)
+    return encode(stats_data)
 
 
 # ---- SERVE STATIC FILES ----
 @app.route("/static/<path:path>")
 def serve_static(path):
-    return send_from_directory(STATIC_DIR, path)
+    """Frontend assets from the manifest, uploads with immutable caching and byte ranges"""
+    asset = static_manifest.get(path)
+    if asset:
+        return send_asset(asset)
+
+    name = os.path.basename(path)
+    if is_blob_id(name) and blob_store.url(name) == f"/static/{path}":
+        if not blob_store.exists(name):
+            return jsonify({"error": "Not found"}), 404
+        return send_media(blob_store.path(name), etag=name.split(".")[0])
+
+    if path.startswith(("uploads/", "thumbs/")):
+        response = send_from_directory(STATIC_DIR, path, max_age=LEGACY_MEDIA_MAX_AGE)
+        response.cache_control.public = True
+        return response
+    return jsonify({"error": "Not found"}), 404
 
 
 @app.route("/", defaults={"path": ""})
 @app.route("/<path:path>")
 def serve_frontend(path):
-    if path and os.path.exists(os.path.join(STATIC_DIR, path)):
-        return send_from_directory(STATIC_DIR, path)
-    return send_from_directory(STATIC_DIR, "index.html")
+    """Static assets by manifest lookup; any other path gets the app shell (index.html)"""
+    if path.startswith(("api/", "static/", "img/")):
+        return jsonify({"error": "Endpoint not found"}), 404
+    return send_asset(static_manifest.get(path) or static_manifest.get("index.html"))
 
 
 # ---- SOCKET EVENTS ----
@@ -762,6 +1229,33 @@ def handle_disconnect():
     logger.info('❌ Client disconnected from Socket.IO')
 
 
+def socket_user(token):
+    """User a Socket.IO event's token belongs to, or None"""
+    try:
+        payload = jwt.decode(token or '', SECRET_KEY, algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return None
+    return get_user_by_id(payload.get('user_id'))
+
+
+@socketio.on('watch_job')
+def handle_watch_job(data):
+    """Subscribe to an analysis job; replays the result if it already finished"""
+    data = data or {}
+    job_id = str(data.get('job_id', ''))
+    user = socket_user(data.get('token'))
+    conn = db_conn()
+    job = get_job(conn, job_id)
+    conn.close()
+    # Same answer for missing and foreign jobs, as GET /api/jobs/<id> gives
+    if not job or not user or (job['user_id'] != user['id'] and user['role'] != 'admin'):
+        emit('analysis_done', {"job_id": job_id, "state": "failed", "error": "Job not found"})
+        return
+    join_room(f"job:{job_id}")
+    if job['state'] in ('done', 'failed'):
+        emit('analysis_done', job_payload(job))
+
+
 @socketio.on('join_report')
 def handle_join_report(data):
     report_id = data.get('report_id')
@@ -796,15 +1290,29 @@ if __name__ == "__main__":
     init_db()
     logger.info("✅ Database initialized")
 
+    if analysis_cache:
+        conn = db_conn()
+        analysis_cache.purge_other_versions(conn)
+        conn.close()
+
+    # debug=True below runs us under the reloader; only its serving child may own jobs
+    if not RELOADER_PARENT:
+        analysis_jobs.requeue_unfinished()
+
     logger.info("🌐 Backend running at http://127.0.0.1:5000")
     logger.info("🔗 Frontend should connect from http://localhost:3000")
     logger.info("📊 API endpoints available at:")
     logger.info("   - GET  /api/health")
     logger.info("   - POST /api/register")
     logger.info("   - POST /api/login")
-    logger.info("   - POST /api/analyze-image")
+    logger.info("   - POST /api/analyze-image[?async=1]")
+    logger.info("   - GET  /api/jobs/<id>")
     logger.info("   - POST /api/report")
     logger.info("   - GET  /api/reports")
+    logger.info("   - POST /api/reports/bulk")
+    logger.info("   - GET  /api/clusters")
+    logger.info("   - GET  /api/tiles/<z>/<x>/<y>.mvt")
+    logger.info("   - GET  /img/<name>?w=&fmt=")
     logger.info("   - POST /api/comment")
     logger.info("   - GET  /api/comments")
     logger.info("   - POST /api/vote")
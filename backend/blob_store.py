@@ -0,0 +1,187 @@
+"""
+Content-addressed storage for uploads
+
+A blob is named by the SHA-256 of its bytes plus an extension
+("<sha256>.<ext>"), so identical uploads are stored once and two uploads
+can never collide. The app only talks to the BlobStore interface;
+LocalBlobStore keeps blobs under <root>/<h[:2]>/<h[2:4]>/<id>, 65536
+shard directories, so none of them grows large. Another backend (an
+S3-compatible bucket, say) only has to implement the same five calls.
+
+The blobs table records each stored blob and how many reports point at it
+through image_url; triggers on reports keep that count current for every
+write path (API, bulk and video ingestion, retention, restores).
+collect_garbage() removes blobs nobody references once they are older
+than a grace period, which covers uploads that are still being analyzed
+or waiting to be reported. Derived blobs (annotated copies) name their
+source as parent and live as long as it does.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+BLOB_ID = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,5}$")
+GC_GRACE_HOURS = 24
+GC_BATCH_SIZE = 500
+
+GC_SQL = """
+    DELETE FROM blobs WHERE id IN (
+        SELECT b.id FROM blobs b
+        WHERE b.refcount = 0 AND b.touched_at < ?
+          AND NOT EXISTS (SELECT 1 FROM blobs p WHERE p.id = b.parent AND p.refcount > 0)
+        LIMIT ?
+    )
+    RETURNING id, size
+"""
+
+
+def blob_id(data, ext):
+    return f"{hashlib.sha256(data).hexdigest()}.{ext.lower().lstrip('.')}"
+
+
+def is_blob_id(name):
+    return bool(BLOB_ID.match(name))
+
+
+class BlobStore(ABC):
+    """Immutable blobs by id; ids come from blob_id() and are safe path components"""
+
+    @abstractmethod
+    def put(self, data, ext):
+        """Store bytes unless already present; returns the blob id"""
+
+    @abstractmethod
+    def read(self, blob_id):
+        """Blob bytes; raises FileNotFoundError if it does not exist"""
+
+    @abstractmethod
+    def exists(self, blob_id):
+        """Whether the blob is stored"""
+
+    @abstractmethod
+    def delete(self, blob_id):
+        """Remove a blob; a missing blob is not an error"""
+
+    @abstractmethod
+    def url(self, blob_id):
+        """URL the blob is served from"""
+
+    def revision(self, blob_id):
+        """Token that changes whenever `blob_id` could name different bytes"""
+        return ""  # blob ids are content hashes
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs in a sharded tree under `root`, served from `url_prefix`
+
+    Names that are not blob ids are uploads from before content addressing,
+    stored flat in `root`; they can still be read but are never written.
+    """
+
+    def __init__(self, root, url_prefix):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+
+    def _relpath(self, blob_id):
+        if is_blob_id(blob_id):
+            return os.path.join(blob_id[:2], blob_id[2:4], blob_id)
+        return blob_id
+
+    def path(self, blob_id):
+        return os.path.join(self.root, self._relpath(blob_id))
+
+    def put(self, data, ext):
+        blob = blob_id(data, ext)
+        path = self.path(blob)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return blob
+
+    def read(self, blob_id):
+        with open(self.path(blob_id), "rb") as f:
+            return f.read()
+
+    def exists(self, blob_id):
+        return os.path.isfile(self.path(blob_id))
+
+    def delete(self, blob_id):
+        try:
+            os.remove(self.path(blob_id))
+        except FileNotFoundError:
+            pass
+
+    def url(self, blob_id):
+        return f"{self.url_prefix}/{self._relpath(blob_id).replace(os.sep, '/')}"
+
+    def revision(self, blob_id):
+        if is_blob_id(blob_id):
+            return ""
+        # A legacy upload is only a file name; its mtime tells replacements apart
+        try:
+            return str(os.stat(self.path(blob_id)).st_mtime_ns)
+        except FileNotFoundError:
+            return ""
+
+
+# ---- registry ----
+def store_blob(conn, store, data, ext, parent=None):
+    """Register and store bytes; returns the blob id. Commits.
+
+    The row is written (or its touched_at refreshed) before the bytes, so a
+    concurrent collect_garbage() can never remove a blob that is being
+    stored again.
+    """
+    blob = blob_id(data, ext)
+    conn.execute("""
+        INSERT INTO blobs (id, url, size, parent) VALUES (?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET touched_at = datetime('now')
+    """, (blob, store.url(blob), len(data), parent))
+    conn.commit()
+    store.put(data, ext)
+    return blob
+
+
+def touch(conn, blob_ids):
+    """Restart the grace period of blobs that are about to be referenced again"""
+    conn.executemany("UPDATE blobs SET touched_at = datetime('now') WHERE id = ?", [(b,) for b in blob_ids])
+    conn.commit()
+
+
+def collect_garbage(conn, store, grace_hours=GC_GRACE_HOURS, batch_size=GC_BATCH_SIZE):
+    """Delete unreferenced blobs older than the grace period; returns (blobs, bytes) removed
+
+    Only blobs untouched for the whole grace period are candidates, which
+    covers an upload between its analysis and its report. Rows are deleted
+    before files, so a crash in between leaves stray files behind, never
+    registered blobs without files.
+    """
+    cutoff = (datetime.utcnow() - timedelta(hours=grace_hours)).strftime("%Y-%m-%d %H:%M:%S")
+    removed, freed = 0, 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(GC_SQL, (cutoff, batch_size)).fetchall()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        for row in rows:
+            store.delete(row[0])
+        removed += len(rows)
+        freed += sum(row[1] for row in rows)
+        if len(rows) < batch_size:
+            break
+    if removed:
+        logger.info(f"🧹 Removed {removed} unreferenced blobs ({freed // 1024} KB)")
+    return removed, freed
@@ -0,0 +1,153 @@
+"""
+Bulk report ingestion for fleet and partner feeds
+
+Items arrive as a JSON array or an NDJSON stream and are processed in
+chunks: each chunk is validated column-wise with numpy, then written with
+one executemany inside one short write transaction. Invalid items are
+reported by index and never abort the rest of the batch.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+
+from clusters import add_reports_to_grid
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ("low", "medium", "high")
+REQUIRED_FIELDS = ("text", "lat", "lon", "severity")
+
+INSERT_SQL = """
+    INSERT INTO reports
+    (user_id, text, lat, lon, severity, image_url, thumb_url, ai_conf, ai_boxes, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, datetime('now')))
+"""
+
+
+def iter_ndjson(stream):
+    """Yield (index, item_or_error) for each non-blank line of an NDJSON stream"""
+    index = 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield index, json.loads(line)
+        except ValueError as e:
+            yield index, ValueError(f"invalid JSON: {e}")
+        index += 1
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def normalize_time(value):
+    """ISO-8601 -> SQLite 'YYYY-MM-DD HH:MM:SS' in UTC; None stays None"""
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def validate_chunk(chunk, user_id):
+    """Split [(index, item)] into insertable rows and [{index, error}]"""
+    errors = []
+    candidates = []
+    for index, item in chunk:
+        if isinstance(item, Exception):
+            errors.append({"index": index, "error": str(item)})
+        elif not isinstance(item, dict):
+            errors.append({"index": index, "error": "item must be an object"})
+        elif not all(field in item for field in REQUIRED_FIELDS):
+            errors.append({"index": index, "error": "missing required fields"})
+        elif not isinstance(item["text"], str) or not all(
+                isinstance(item.get(field), (str, type(None))) for field in ("image_url", "thumb_url")):
+            errors.append({"index": index, "error": "text must be a string, image_url/thumb_url strings or null"})
+        elif item["severity"] not in SEVERITIES:
+            errors.append({"index": index, "error": f"severity must be one of {', '.join(SEVERITIES)}"})
+        else:
+            candidates.append((index, item))
+
+    if not candidates:
+        return [], errors
+
+    # Column-wise numeric checks over the whole chunk
+    lat = np.array([_to_float(item["lat"]) for _, item in candidates])
+    lon = np.array([_to_float(item["lon"]) for _, item in candidates])
+    conf = np.array([_to_float(item["ai_conf"]) if item.get("ai_conf") is not None else 0.0
+                     for _, item in candidates])
+    ok = (np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+          & np.isfinite(conf) & (conf >= 0) & (conf <= 1))
+
+    rows = []
+    for (index, item), valid, item_lat, item_lon, item_conf in zip(candidates, ok, lat, lon, conf):
+        if not valid:
+            errors.append({"index": index, "error": "lat/lon out of range or ai_conf not in [0, 1]"})
+            continue
+        try:
+            created_at = normalize_time(item.get("created_at"))
+        except ValueError:
+            errors.append({"index": index, "error": "created_at is not ISO-8601"})
+            continue
+        detections = item.get("detections")
+        try:
+            # ai_boxes is embedded raw in API responses, which must stay valid JSON
+            ai_boxes = json.dumps(detections, allow_nan=False) if detections else None
+        except ValueError:
+            errors.append({"index": index, "error": "detections contain NaN or Infinity"})
+            continue
+        rows.append((
+            user_id,
+            item["text"],
+            float(item_lat),
+            float(item_lon),
+            item["severity"],
+            item.get("image_url"),
+            item.get("thumb_url"),
+            float(item_conf) if item.get("ai_conf") is not None else None,
+            ai_boxes,
+            created_at
+        ))
+    return rows, errors
+
+
+def insert_rows(conn, rows):
+    """Insert validated rows in one transaction; returns (first_id, last_id)
+
+    The per-row cluster-grid trigger is suspended for the duration and the
+    grid is updated once for the whole id range. The suspension row never
+    commits, so other connections always see the trigger active.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        before = conn.execute("SELECT MAX(id) FROM reports").fetchone()[0] or 0
+        conn.execute("INSERT INTO trigger_suspensions (name) VALUES ('grid')")
+        conn.executemany(INSERT_SQL, rows)
+        conn.execute("DELETE FROM trigger_suspensions WHERE name = 'grid'")
+        after = conn.execute("SELECT MAX(id) FROM reports").fetchone()[0] or 0
+        add_reports_to_grid(conn, before + 1, after)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return before + 1, after
@@ -0,0 +1,121 @@
+"""
+Hierarchical grid index for server-side marker clustering
+
+Every report is counted into one cell per zoom level in report_grid.
+At zoom z the world is split into 2**(z + GRID_SHIFT) columns of equal
+longitude width and half as many rows of the same latitude height, so a
+cell spans roughly CELL_PX screen pixels on a 256 px-tile map. Cells keep
+the count, coordinate sums (for the centroid) and per-severity counts, so
+they can be decremented exactly when reports go away. Triggers maintain
+the grid (see migrations.m006_report_grid); readers only range-scan the
+primary key of one zoom level.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+CELL_PX = 64
+GRID_SHIFT = 2  # 256 px tile / 64 px cell = 2**2 cells per tile edge
+MAX_CLUSTER_ZOOM = 17
+MAX_CLUSTER_CELLS = 16384
+SEVERITY_ORDER = ("high", "medium", "low")
+
+
+# zoom, cell_x, cell_y for `row` against every grid_zooms entry `z`
+GRID_CELL_SQL = """z.zoom,
+               MIN(CAST(({row}.lon + 180.0) / 360.0 * z.cells AS INTEGER), z.cells - 1),
+               MIN(CAST(({row}.lat + 90.0) / 360.0 * z.cells AS INTEGER), z.cells / 2 - 1)"""
+
+
+def cells_per_world(zoom):
+    return 1 << (zoom + GRID_SHIFT)
+
+
+def cell_of(lat, lon, zoom):
+    """Grid cell (x, y) containing a point; mirrors the trigger arithmetic"""
+    cells = cells_per_world(zoom)
+    x = min(int((lon + 180.0) / 360.0 * cells), cells - 1)
+    y = min(int((lat + 90.0) / 360.0 * cells), cells // 2 - 1)
+    return x, y
+
+
+def cell_bbox(x, y, zoom):
+    """(min_lon, min_lat, max_lon, max_lat) of grid cell (x, y)"""
+    size = 360.0 / cells_per_world(zoom)
+    return x * size - 180.0, y * size - 90.0, (x + 1) * size - 180.0, (y + 1) * size - 90.0
+
+
+def cell_range(bbox, zoom):
+    """Inclusive (x0, y0, x1, y1) cell range covering a bbox"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    x0, y0 = cell_of(min_lat, min_lon, zoom)
+    x1, y1 = cell_of(max_lat, max_lon, zoom)
+    return x0, y0, x1, y1
+
+
+def worst_severity(row):
+    for severity in SEVERITY_ORDER:
+        if row[severity] > 0:
+            return severity
+    return None
+
+
+def query_clusters(conn, bbox, zoom):
+    """Return cluster dicts for the cells of `zoom` intersecting `bbox`"""
+    x0, y0, x1, y1 = cell_range(bbox, zoom)
+    if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_CLUSTER_CELLS:
+        raise ValueError("bbox too large for this zoom level")
+
+    rows = conn.execute("""
+        SELECT cell_x, cell_y, count, sum_lat, sum_lon, low, medium, high
+        FROM report_grid
+        WHERE zoom = ? AND cell_x BETWEEN ? AND ? AND cell_y BETWEEN ? AND ? AND count > 0
+    """, (zoom, x0, x1, y0, y1)).fetchall()
+
+    return [{
+        "lat": row['sum_lat'] / row['count'],
+        "lon": row['sum_lon'] / row['count'],
+        "count": row['count'],
+        "severity": worst_severity(row),
+        "severity_counts": {s: row[s] for s in SEVERITY_ORDER},
+        "cell": [row['cell_x'], row['cell_y']]
+    } for row in rows]
+
+
+def add_reports_to_grid(conn, first_id, last_id):
+    """Set-based grid update for a freshly inserted id range
+
+    Used by bulk writers that suspended the per-row grid trigger; runs in
+    the caller's transaction.
+    """
+    conn.execute(f"""
+        INSERT INTO report_grid (zoom, cell_x, cell_y, count, sum_lat, sum_lon, low, medium, high)
+        SELECT {GRID_CELL_SQL.format(row='r')},
+               COUNT(*), SUM(r.lat), SUM(r.lon),
+               SUM(r.severity = 'low'), SUM(r.severity = 'medium'), SUM(r.severity = 'high')
+        FROM reports r, grid_zooms z
+        WHERE r.id BETWEEN ? AND ?
+        GROUP BY 1, 2, 3
+        ON CONFLICT (zoom, cell_x, cell_y) DO UPDATE SET
+            count = count + excluded.count,
+            sum_lat = sum_lat + excluded.sum_lat,
+            sum_lon = sum_lon + excluded.sum_lon,
+            low = low + excluded.low,
+            medium = medium + excluded.medium,
+            high = high + excluded.high
+    """, (first_id, last_id))
+
+
+def rebuild_grid(conn):
+    """Recompute report_grid from reports; the caller commits"""
+    conn.execute("DELETE FROM report_grid -- full-scan-ok: rebuild")
+    conn.execute(f"""
+        INSERT INTO report_grid (zoom, cell_x, cell_y, count, sum_lat, sum_lon, low, medium, high)
+        SELECT {GRID_CELL_SQL.format(row='r')},
+               COUNT(*), SUM(r.lat), SUM(r.lon),
+               SUM(r.severity = 'low'), SUM(r.severity = 'medium'), SUM(r.severity = 'high')
+        FROM reports r, grid_zooms z
+        GROUP BY 1, 2, 3
+    """)
+    logger.info("🗺️ Cluster grid rebuilt")
@@ -7,19 +7,37 @@ import os
 import sqlite3
 import json
 import logging
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, render_template_string
+from datetime import datetime
+from flask import Flask, Response, request, jsonify, render_template_string, stream_with_context
 from flask_cors import CORS
 import threading
 import psutil
 import time
 
+from blob_store import LocalBlobStore
+from data_version import DataVersion, conditional
+from db_pool import ConnectionPool
+from exports import parse_export_args, stream_export, export_filename, export_mimetype
+from fast_json import compress_response, encode_rows, json_response, row_dict
+from geo import parse_bbox
+from retention import ARCHIVE_DIR, RETENTION_DAYS, RetentionWorker
+from migrations import run_migrations
+from stats_rollup import read_counters, severity_counts, daily_counts
+from tiles import TileCache
+
 # Dashboard configuration
 DASHBOARD_PORT = 5001
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "potholes.db")
+DATA_VERSION_PATH = f"{DB_PATH}.version"  # shared with the API server
+TILE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tile_cache")
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "uploads")
+UPLOADS_URL = "/static/uploads"
 
 app = Flask(__name__)
 CORS(app)
+app.after_request(compress_response)
+tile_cache = TileCache(TILE_CACHE_DIR)
+data_version = DataVersion(DATA_VERSION_PATH)
 
 # Dashboard HTML template
 DASHBOARD_HTML = """
@@ -254,6 +272,13 @@ DASHBOARD_HTML = """
             <h3>🗄️ Database Operations</h3>
             <button class="btn btn-primary" onclick="refreshDatabase()">Refresh Stats</button>
             <button class="btn btn-danger" onclick="clearOldData()">Clear Old Data (30+ days)</button>
+            <select id="exportFormat" class="btn">
+                <option value="json">JSON</option>
+                <option value="ndjson">NDJSON</option>
+                <option value="csv">CSV (reports)</option>
+                <option value="geojson">GeoJSON</option>
+                <option value="geojsonseq">GeoJSON Seq</option>
+            </select>
             <button class="btn btn-success" onclick="exportData()">Export Data</button>
         </div>
     </div>
@@ -290,15 +315,18 @@ DASHBOARD_HTML = """
         // Load dashboard data
         async function loadDashboardData() {
             try {
-                const response = await fetch('/api/dashboard/stats');
-                const data = await response.json();
+                // The browser revalidates stats with If-None-Match; a 304 reuses its cached copy
+                const [data, live] = await Promise.all([
+                    fetch('/api/dashboard/stats').then(r => r.json()),
+                    fetch('/api/dashboard/system').then(r => r.json())
+                ]);
 
                 // Update system stats
-                document.getElementById('cpuUsage').textContent = data.system_stats.cpu_percent + '%';
-                document.getElementById('memoryUsage').textContent = data.system_stats.memory_percent + '%';
+                document.getElementById('cpuUsage').textContent = live.system_stats.cpu_percent + '%';
+                document.getElementById('memoryUsage').textContent = live.system_stats.memory_percent + '%';
                 document.getElementById('totalReports').textContent = data.database_stats.total_reports;
                 document.getElementById('totalUsers').textContent = data.database_stats.total_users;
-                document.getElementById('activeConnections').textContent = data.system_stats.active_connections;
+                document.getElementById('activeConnections').textContent = live.system_stats.active_connections;
                 document.getElementById('detectionAccuracy').textContent = data.database_stats.avg_confidence + '%';
 
                 // Update charts
@@ -317,7 +345,7 @@ DASHBOARD_HTML = """
                 updateUsersTable(data.recent_users);
 
                 // Update logs
-                updateLogs(data.recent_logs);
+                updateLogs(live.recent_logs);
 
             } catch (error) {
                 console.error('Error loading dashboard data:', error);
@@ -375,19 +403,28 @@ DASHBOARD_HTML = """
         }
 
         async function clearOldData() {
-            if (confirm('Are you sure you want to clear data older than 30 days?')) {
-                await fetch('/api/dashboard/clear-old-data', { method: 'POST' });
+            if (confirm('Archive and clear data older than 30 days?')) {
+                const response = await fetch('/api/dashboard/clear-old-data', { method: 'POST' });
+                const result = await response.json();
+                alert(result.message);
+                pollRetention();
+            }
+        }
+
+        async function pollRetention() {
+            const status = await (await fetch('/api/dashboard/retention')).json();
+            if (status.state === 'running') {
+                setTimeout(pollRetention, 2000);
+            } else {
                 loadDashboardData();
             }
         }
 
-        async function exportData() {
-            const response = await fetch('/api/dashboard/export');
-            const blob = await response.blob();
-            const url = window.URL.createObjectURL(blob);
+        function exportData() {
+            // Navigate to the stream so the browser writes it straight to disk
+            const format = document.getElementById('exportFormat').value;
             const a = document.createElement('a');
-            a.href = url;
-            a.download = `pothole-data-${new Date().toISOString().split('T')[0]}.json`;
+            a.href = `/api/dashboard/export?format=${format}&gzip=1`;
             a.click();
         }
 
@@ -406,10 +443,22 @@ DASHBOARD_HTML = """
 """
 
 
+db_pool = ConnectionPool(DB_PATH)
+# The API server shares the on-disk tile cache and upload store
+retention_worker = RetentionWorker(lambda: db_pool.connect(), ARCHIVE_DIR,
+                                   on_reports_deleted=tile_cache.invalidate_all,
+                                   blob_store=LocalBlobStore(UPLOADS_DIR, UPLOADS_URL),
+                                   data_version=data_version)
+
+
 def db_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow this thread's pooled connection; conn.close() hands it back"""
+    return db_pool.connect()
+
+
+@app.teardown_appcontext
+def release_db_conn(exception=None):
+    db_pool.release()
 
 
 def get_system_stats():
@@ -419,34 +468,34 @@ def get_system_stats():
         'memory_percent': round(psutil.virtual_memory().percent, 1),
         'disk_usage': round(psutil.disk_usage('/').percent, 1),
         'active_connections': len(psutil.net_connections()),
+        'db_pool': db_pool.stats(),
         'timestamp': datetime.utcnow().isoformat()
     }
 
 
 def get_database_stats():
-    """Get comprehensive database statistics"""
+    """Get comprehensive database statistics from the rollup tables"""
     conn = db_conn()
 
+    totals = read_counters(
+        conn, ['reports', 'users', 'comments', 'votes', 'ai_conf_sum', 'ai_conf_count']
+    )
+
     stats = {}
 
     # Basic counts
-    stats['total_reports'] = conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
-    stats['total_users'] = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
-    stats['total_comments'] = conn.execute("SELECT COUNT(*) FROM comments").fetchone()[0]
-    stats['total_votes'] = conn.execute("SELECT COUNT(*) FROM votes").fetchone()[0]
+    stats['total_reports'] = int(totals['reports'])
+    stats['total_users'] = int(totals['users'])
+    stats['total_comments'] = int(totals['comments'])
+    stats['total_votes'] = int(totals['votes'])
 
     # AI detection stats
-    result = conn.execute("SELECT AVG(ai_conf) FROM reports WHERE ai_conf IS NOT NULL").fetchone()
-    stats['avg_confidence'] = round((result[0] or 0) * 100, 1)
+    avg_conf = totals['ai_conf_sum'] / totals['ai_conf_count'] if totals['ai_conf_count'] else 0
+    stats['avg_confidence'] = round(avg_conf * 100, 1)
 
-    # Recent activity
-    stats['reports_today'] = conn.execute(
-        "SELECT COUNT(*) FROM reports WHERE created_at >= datetime('now', '-1 day')"
-    ).fetchone()[0]
-
-    stats['new_users_today'] = conn.execute(
-        "SELECT COUNT(*) FROM users WHERE created_at >= datetime('now', '-1 day')"
-    ).fetchone()[0]
+    # Recent activity (today's UTC bucket)
+    stats['reports_today'] = daily_counts(conn, 'reports', 1)[0][1]
+    stats['new_users_today'] = daily_counts(conn, 'users', 1)[0][1]
 
     conn.close()
     return stats
@@ -455,30 +504,17 @@ def get_database_stats():
 def get_severity_data():
     """Get reports grouped by severity"""
     conn = db_conn()
-    result = conn.execute(
-        "SELECT severity, COUNT(*) as count FROM reports GROUP BY severity"
-    ).fetchall()
+    data = severity_counts(conn)
     conn.close()
-    return {row['severity']: row['count'] for row in result}
+    return data
 
 
 def get_activity_data():
     """Get activity data for the last 7 days"""
     conn = db_conn()
-
-    dates = []
-    counts = []
-
-    for i in range(7):
-        date = (datetime.now() - timedelta(days=6 - i)).strftime('%Y-%m-%d')
-        count = conn.execute(
-            "SELECT COUNT(*) FROM reports WHERE DATE(created_at) = ?", (date,)
-        ).fetchone()[0]
-        dates.append(date)
-        counts.append(count)
-
+    days = daily_counts(conn, 'reports', 7)
     conn.close()
-    return {'labels': dates, 'values': counts}
+    return {'labels': [day for day, _ in days], 'values': [count for _, count in days]}
 
 
 def get_recent_reports(limit=10):
@@ -492,7 +528,7 @@ def get_recent_reports(limit=10):
         LIMIT ?
     """, (limit,)).fetchall()
     conn.close()
-    return [dict(report) for report in reports]
+    return [row_dict(report) for report in reports]
 
 
 def get_recent_users(limit=10):
@@ -536,15 +572,23 @@ def dashboard():
 
 
 @app.route('/api/dashboard/stats')
+@conditional(data_version)
 def dashboard_stats():
-    """Comprehensive dashboard statistics"""
+    """Database statistics; unchanged data is revalidated with a 304"""
     return jsonify({
-        'system_stats': get_system_stats(),
         'database_stats': get_database_stats(),
         'severity_data': get_severity_data(),
         'activity_data': get_activity_data(),
         'recent_reports': get_recent_reports(),
-        'recent_users': get_recent_users(),
+        'recent_users': get_recent_users()
+    })
+
+
+@app.route('/api/dashboard/system')
+def dashboard_system():
+    """Live host metrics and log tail; these change without any write"""
+    return jsonify({
+        'system_stats': get_system_stats(),
         'recent_logs': get_recent_logs()
     })
 
@@ -557,37 +601,41 @@ def refresh_data():
 
 @app.route('/api/dashboard/clear-old-data', methods=['POST'])
 def clear_old_data():
-    """Clear data older than 30 days"""
-    conn = db_conn()
+    """Archive and clear data older than 30 days in the background"""
+    started = retention_worker.start(RETENTION_DAYS)
+    status = retention_worker.status()
+    if not started:
+        return jsonify({'status': 'running', 'message': 'A retention sweep is already running',
+                        'retention': status}), 409
+    return jsonify({'status': 'accepted', 'message': 'Retention sweep started', 'retention': status}), 202
 
-    # Clear old reports, comments, and votes
-    conn.execute("DELETE FROM reports WHERE created_at < datetime('now', '-30 days')")
-    conn.execute("DELETE FROM comments WHERE created_at < datetime('now', '-30 days')")
-    conn.execute("DELETE FROM votes WHERE created_at < datetime('now', '-30 days')")
 
-    conn.commit()
-    conn.close()
-
-    return jsonify({'status': 'success', 'message': 'Old data cleared successfully'})
+@app.route('/api/dashboard/retention')
+def retention_status():
+    """Progress of the current or last retention sweep"""
+    return jsonify(retention_worker.status())
 
 
 @app.route('/api/dashboard/export')
 def export_data():
-    """Export database data as JSON"""
-    conn = db_conn()
-
-    data = {
-        'exported_at': datetime.utcnow().isoformat(),
-        'reports': [dict(row) for row in conn.execute("SELECT * FROM reports").fetchall()],
-        'users': [dict(row) for row in
-                  conn.execute("SELECT id, username, email, role, created_at FROM users").fetchall()],
-        'comments': [dict(row) for row in conn.execute("SELECT * FROM comments").fetchall()],
-        'votes': [dict(row) for row in conn.execute("SELECT * FROM votes").fetchall()]
-    }
+    """Stream database data as JSON, NDJSON, CSV or GeoJSON
 
-    conn.close()
+    Query args: format, tables, since, until, bbox, gzip (see exports.py).
+    """
+    try:
+        options = parse_export_args(request.args, parse_bbox)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    return jsonify(data)
+    return Response(
+        stream_with_context(stream_export(db_conn, options)),
+        mimetype=export_mimetype(options),
+        headers={
+            'Content-Disposition': f'attachment; filename="{export_filename(options)}"',
+            # Let reverse proxies pass chunks through instead of buffering the file
+            'X-Accel-Buffering': 'no'
+        }
+    )
 
 
 @app.route('/api/dashboard/query', methods=['POST'])
@@ -605,9 +653,10 @@ def execute_query():
         result = conn.execute(query).fetchall()
         conn.close()
 
-        return jsonify({
+        # No raw columns: an ad-hoc query may return anything under any name
+        return json_response({
             'columns': list(result[0].keys()) if result else [],
-            'data': [dict(row) for row in result]
+            'data': encode_rows(result, raw_columns=())
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -618,6 +667,10 @@ if __name__ == '__main__':
     print("📊 Access the dashboard at: http://localhost:5001")
     print("🔧 This dashboard provides real-time monitoring and debugging capabilities")
 
+    conn = db_conn()
+    run_migrations(conn)
+    conn.close()
+
     app.run(
         host='0.0.0.0',
         port=DASHBOARD_PORT,
@@ -0,0 +1,117 @@
+"""
+Data version for conditional GETs on the read endpoints
+
+Every write path calls DataVersion.bump() once its transaction has
+committed. The version is a counter in a small file next to the database,
+so the API server, the dashboard and manage.py commands all see each
+other's writes, and reading it is a few-byte file read, not a query.
+
+@conditional(version) derives a view's ETag and Last-Modified from the
+version and answers a matching If-None-Match (or, without one,
+If-Modified-Since) with 304 before the view, and so the database, is
+reached. The ETag also carries the UTC date, because day-bucketed
+statistics change at midnight without any write.
+
+The version is read before the view queries, so a write landing during
+the query leaves the response with the older ETag and the next poll
+fetches again; a response is never marked newer than its data.
+"""
+
+import os
+import time
+import uuid
+import threading
+from functools import wraps
+
+from flask import current_app, request
+
+try:
+    import fcntl
+except ImportError:  # Windows: bumps are only serialized within a process
+    fcntl = None
+
+
+class DataVersion:
+    """Monotonic write counter shared through `path`
+
+    The file holds "<epoch> <counter> <updated_at>". The epoch is random
+    and chosen when the file is created, so a deleted file cannot bring
+    back ETags that clients still hold.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def read(self):
+        """(token, updated_at epoch seconds) of the current version"""
+        try:
+            with open(self.path) as f:
+                epoch, counter, updated_at = f.read().split()
+            return f"{epoch}-{counter}", float(updated_at)
+        except (FileNotFoundError, ValueError):
+            self.bump()
+            return self.read()
+
+    def bump(self):
+        """Record a committed write; returns the new token"""
+        with self._lock, open(f"{self.path}.lock", "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.path) as f:
+                    epoch, counter, _ = f.read().split()
+                counter = int(counter) + 1
+            except (FileNotFoundError, ValueError):
+                epoch, counter = uuid.uuid4().hex[:8], 1
+            # Replaced whole, so readers never see a half-written file
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(f"{epoch} {counter} {time.time():.6f}\n")
+            os.replace(tmp, self.path)
+        return f"{epoch}-{counter}"
+
+    def validators(self):
+        """(ETag, Last-Modified epoch seconds) for a response built now"""
+        token, updated_at = self.read()
+        now = time.time()
+        day_start = now - now % 86400
+        return f"{token}-{time.strftime('%Y%m%d', time.gmtime(now))}", max(updated_at, day_start)
+
+
+def _not_modified(etag, last_modified):
+    """The client's matching ETag (a compressed variant counts), True for a date match, or None"""
+    if request.if_none_match:
+        for tag in (etag, f"{etag}-gzip", f"{etag}-br"):
+            if request.if_none_match.contains_weak(tag):
+                return tag
+        return None
+    since = request.if_modified_since
+    if since and int(last_modified) <= since.timestamp():
+        return True
+    return None
+
+
+def conditional(version):
+    """View decorator: ETag/Last-Modified from `version`, 304 without running the view"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            etag, last_modified = version.validators()
+            matched = _not_modified(etag, last_modified)
+            if matched:
+                response = current_app.response_class(status=304)
+                # compress_response() skips 304s; keep what it would have sent
+                response.vary.add("Accept-Encoding")
+                response.set_etag(matched if matched is not True else etag)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+            response.last_modified = last_modified
+            # Always revalidate; heuristic freshness would hide new reports
+            response.cache_control.no_cache = True
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,147 @@
+"""
+SQLite connection pool shared by the API server and the dashboard
+
+Connections are long-lived and tuned once (WAL, synchronous=NORMAL, mmap,
+page cache, busy timeout) instead of being opened and closed per call.
+A thread checks a connection out on its first ``connect()`` and keeps it
+until the outermost ``close()`` or until ``release()`` is called on request
+teardown, so nested helpers (e.g. ``token_required`` -> ``get_user_by_id``
+-> handler) share a single connection.
+"""
+
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("mmap_size", 256 * 1024 * 1024),
+    ("cache_size", -64 * 1024),  # negative = KiB, i.e. 64 MiB
+    ("temp_store", "MEMORY"),
+)
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to the pool"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.depth = 0
+
+    def close(self):
+        if self.pool is None:
+            return super().close()
+        self.pool.checkin(self)
+
+    def really_close(self):
+        super().close()
+
+
+class ConnectionPool:
+    """Thread-affine pool of persistent SQLite connections"""
+
+    def __init__(self, path, max_idle=8, busy_timeout_ms=5000,
+                 cached_statements=256, pragmas=DEFAULT_PRAGMAS):
+        self.path = path
+        self.max_idle = max_idle
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.pragmas = pragmas
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {
+            "opened": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "reuses": 0,
+            "checkins": 0,
+            "rollbacks": 0,
+        }
+
+    # ---- connection lifecycle ----
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        conn.pool = self
+        with self._lock:
+            self._stats["opened"] += 1
+        return conn
+
+    def connect(self):
+        """Return this thread's connection, checking one out if needed"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+                self._stats["checkouts"] += 1
+                if conn is not None:
+                    self._stats["reuses"] += 1
+            if conn is None:
+                conn = self._open()
+            self._local.conn = conn
+        conn.depth += 1
+        return conn
+
+    def checkin(self, conn):
+        """Drop one reference; the outermost close() returns it to the pool"""
+        conn.depth -= 1
+        if conn.depth > 0:
+            return
+        self._return(conn)
+
+    def release(self):
+        """Force this thread's connection back into the pool (request teardown)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._return(conn)
+
+    def _return(self, conn):
+        conn.depth = 0
+        if getattr(self._local, "conn", None) is conn:
+            self._local.conn = None
+
+        if conn.in_transaction:
+            # A handler bailed out mid-transaction; never leak it to the next user
+            conn.rollback()
+            with self._lock:
+                self._stats["rollbacks"] += 1
+
+        with self._lock:
+            self._stats["checkins"] += 1
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+            self._stats["closed"] += 1
+        conn.really_close()
+
+    def close_all(self):
+        """Close every idle connection (shutdown / tests)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._stats["closed"] += len(idle)
+        for conn in idle:
+            conn.really_close()
+
+    # ---- introspection ----
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle)
+        stats["in_use"] = stats["opened"] - stats["closed"] - stats["idle"]
+        stats["max_idle"] = self.max_idle
+        return stats
@@ -0,0 +1,69 @@
+"""
+Duplicate-report detection and merging on the report write path
+
+A submission within `radius_m` of a report that was created or confirmed
+inside the time window is treated as a confirmation of that report
+instead of a new pothole. Candidates come from the reports_rtree index,
+so the lookup only touches reports near the submission.
+"""
+
+from geo import radius_bbox, haversine_m
+
+SEVERITY_RANK = {"low": 1, "medium": 2, "high": 3}
+
+
+def find_duplicate(conn, lat, lon, radius_m, window_days):
+    """Return the nearest open report within radius_m, or None"""
+    min_lon, min_lat, max_lon, max_lat = radius_bbox(lat, lon, radius_m)
+    candidates = conn.execute("""
+        SELECT r.*
+        FROM reports_rtree g JOIN reports r ON r.id = g.id
+        WHERE g.min_lon <= ? AND g.max_lon >= ? AND g.min_lat <= ? AND g.max_lat >= ?
+          AND COALESCE(r.last_confirmed_at, r.created_at) >= datetime('now', ?)
+    """, (max_lon, min_lon, max_lat, min_lat, f"-{int(window_days)} days")).fetchall()
+
+    best, best_distance = None, None
+    for row in candidates:
+        distance = haversine_m(lat, lon, row['lat'], row['lon'])
+        if distance <= radius_m and (best is None or distance < best_distance):
+            best, best_distance = row, distance
+    return best
+
+
+def combined_confidence(existing, new):
+    """Noisy-OR: independent sightings raise confidence, never lower it"""
+    if existing is None:
+        return new
+    if new is None:
+        return existing
+    return round(1 - (1 - float(existing)) * (1 - float(new)), 3)
+
+
+def worse_severity(existing, new):
+    return new if SEVERITY_RANK.get(new, 0) > SEVERITY_RANK.get(existing, 0) else existing
+
+
+def merge_submission(conn, report, submission):
+    """Fold a submission into an existing report as one more confirmation
+
+    `submission` carries the same fields add_report would insert. Media and
+    detections are only filled in when the original report had none.
+    """
+    conn.execute("""
+        UPDATE reports SET
+            confirmations = confirmations + 1,
+            last_confirmed_at = datetime('now'),
+            severity = ?,
+            ai_conf = ?,
+            image_url = COALESCE(image_url, ?),
+            thumb_url = COALESCE(thumb_url, ?),
+            ai_boxes = COALESCE(ai_boxes, ?)
+        WHERE id = ?
+    """, (
+        worse_severity(report['severity'], submission['severity']),
+        combined_confidence(report['ai_conf'], submission.get('ai_conf')),
+        submission.get('image_url'),
+        submission.get('thumb_url'),
+        submission.get('ai_boxes'),
+        report['id']
+    ))
@@ -0,0 +1,228 @@
+"""
+Streaming data export for the dashboard
+
+Rows are pulled from SQLite in fetchmany() batches and serialized as they
+arrive, so an export starts sending immediately and its memory use stays
+flat whatever the table size. Every table is read inside one read
+transaction, giving a consistent snapshot across tables under WAL.
+
+Formats: json (the legacy single document), ndjson, csv (one table),
+geojson and geojsonseq (reports only). Any of them can be gzipped on the
+fly. JSON formats are encoded with fast_json, ai_boxes embedded as JSON.
+"""
+
+import io
+import csv
+import zlib
+from datetime import datetime
+
+from bulk_ingest import normalize_time
+from fast_json import RawJSON, dumps, encode, encode_rows, row_encoder
+
+EXPORT_BATCH = 1000
+GZIP_LEVEL = 6
+FULL_SCAN_OK = "-- full-scan-ok"
+
+# Column lists are explicit so secrets (users.password_hash) never leave
+EXPORT_COLUMNS = {
+    "reports": ("id", "user_id", "text", "lat", "lon", "severity", "image_url", "thumb_url",
+                "ai_conf", "ai_boxes", "verified", "votes", "upvotes", "downvotes",
+                "confirmations", "last_confirmed_at", "created_at"),
+    "users": ("id", "username", "email", "role", "created_at"),
+    "comments": ("id", "user_id", "report_id", "text", "created_at"),
+    "votes": ("user_id", "report_id", "vote_type", "created_at"),
+}
+EXPORT_TABLES = tuple(EXPORT_COLUMNS)
+
+FORMATS = {
+    # format: (mimetype, file extension)
+    "json": ("application/json", "json"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "geojson": ("application/geo+json", "geojson"),
+    "geojsonseq": ("application/geo+json-seq", "geojsons"),
+}
+GEO_FORMATS = ("geojson", "geojsonseq")
+RECORD_SEPARATOR = "\x1e"  # RFC 8142 GeoJSON text sequences
+
+
+def parse_export_args(args, parse_bbox):
+    """Validate export query args into a dict, raising ValueError"""
+    fmt = args.get("format", "json").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+    if args.get("tables"):
+        tables = [t.strip() for t in args["tables"].split(",") if t.strip()]
+        unknown = [t for t in tables if t not in EXPORT_COLUMNS]
+        if unknown:
+            raise ValueError(f"unknown tables: {', '.join(unknown)}")
+    elif fmt in ("csv",) + GEO_FORMATS:
+        tables = ["reports"]
+    else:
+        tables = list(EXPORT_TABLES)
+
+    if fmt == "csv" and len(tables) != 1:
+        raise ValueError("csv exports one table at a time")
+    if fmt in GEO_FORMATS and tables != ["reports"]:
+        raise ValueError(f"{fmt} only exports reports")
+
+    try:
+        since = normalize_time(args.get("since"))
+        until = normalize_time(args.get("until"))
+    except ValueError:
+        raise ValueError("since/until must be ISO-8601 timestamps")
+
+    return {
+        "format": fmt,
+        "tables": tables,
+        "since": since,
+        "until": until,
+        "bbox": parse_bbox(args["bbox"]) if args.get("bbox") else None,
+        "gzip": args.get("gzip", "").lower() in ("1", "true", "yes"),
+    }
+
+
+def build_export_query(table, since=None, until=None, bbox=None):
+    """Return (sql, params) selecting one table's export rows
+
+    The bbox limits reports to the area and comments/votes to reports in
+    it; users are never filtered by area.
+    """
+    columns = ", ".join(f"t.{c}" for c in EXPORT_COLUMNS[table])
+    from_clause = f"FROM {table} t"
+    where_clauses = []
+    params = []
+
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        area = "g.min_lon <= ? AND g.max_lon >= ? AND g.min_lat <= ? AND g.max_lat >= ?"
+        area_params = [max_lon, min_lon, max_lat, min_lat]
+        if table == "reports":
+            from_clause = "FROM reports_rtree g JOIN reports t ON t.id = g.id"
+            where_clauses.append(area)
+            params.extend(area_params)
+        elif table in ("comments", "votes"):
+            where_clauses.append(f"t.report_id IN (SELECT g.id FROM reports_rtree g WHERE {area})")
+            params.extend(area_params)
+
+    if since:
+        where_clauses.append("t.created_at >= ?")
+        params.append(since)
+    if until:
+        where_clauses.append("t.created_at < ?")
+        params.append(until)
+
+    sql = f"SELECT {columns} {from_clause}"
+    if where_clauses:
+        sql += " WHERE " + " AND ".join(where_clauses)
+    else:
+        sql += f" {FULL_SCAN_OK}"
+    return sql, params
+
+
+def iter_rows(conn, table, options):
+    sql, params = build_export_query(table, options["since"], options["until"], options["bbox"])
+    cursor = conn.execute(sql, params)
+    try:
+        while True:
+            batch = cursor.fetchmany(EXPORT_BATCH)
+            if not batch:
+                return
+            yield batch
+    finally:
+        cursor.close()
+
+
+# Properties of a report feature: every column but the coordinates
+_properties = row_encoder(EXPORT_COLUMNS["reports"], exclude=("lat", "lon"))
+
+
+def _feature(row):
+    return encode({
+        "type": "Feature",
+        "id": row["id"],
+        "geometry": {"type": "Point", "coordinates": [row["lon"], row["lat"]]},
+        "properties": RawJSON(_properties(row)),
+    })
+
+
+def _serialize(conn, options):
+    """Yield byte chunks of the export, one per fetched batch"""
+    fmt = options["format"]
+    tables = options["tables"]
+
+    if fmt == "json":
+        yield b'{"exported_at":' + dumps(datetime.utcnow().isoformat())
+        for table in tables:
+            yield f',"{table}":['.encode()
+            first = True
+            for batch in iter_rows(conn, table, options):
+                body = encode_rows(batch).data[1:-1]
+                yield body if first else b"," + body
+                first = False
+            yield b"]"
+        yield b"}"
+
+    elif fmt == "ndjson":
+        for table in tables:
+            encode_row = row_encoder(EXPORT_COLUMNS[table])
+            prefix = b'{"table":' + dumps(table) + b","
+            for batch in iter_rows(conn, table, options):
+                yield b"".join(prefix + encode_row(row)[1:] + b"\n" for row in batch)
+
+    elif fmt == "csv":
+        table = tables[0]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS[table])
+        for batch in iter_rows(conn, table, options):
+            writer.writerows(batch)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+
+    elif fmt == "geojson":
+        yield b'{"type":"FeatureCollection","features":['
+        first = True
+        for batch in iter_rows(conn, "reports", options):
+            body = b",".join(_feature(row) for row in batch)
+            yield body if first else b"," + body
+            first = False
+        yield b"]}"
+
+    elif fmt == "geojsonseq":
+        separator = RECORD_SEPARATOR.encode()
+        for batch in iter_rows(conn, "reports", options):
+            yield b"".join(separator + _feature(row) + b"\n" for row in batch)
+
+
+def stream_export(connect, options):
+    """Generator of response bytes; borrows a connection for its lifetime"""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if options["gzip"] else None
+    conn = connect()
+    try:
+        # One read transaction = one snapshot of every exported table
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        for data in _serialize(conn, options):
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+        if compressor:
+            yield compressor.flush()
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def export_filename(options):
+    ext = FORMATS[options["format"]][1]
+    name = f"pothole-data-{datetime.utcnow().strftime('%Y-%m-%d')}.{ext}"
+    return name + ".gz" if options["gzip"] else name
+
+
+def export_mimetype(options):
+    return "application/gzip" if options["gzip"] else FORMATS[options["format"]][0]
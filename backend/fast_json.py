@@ -0,0 +1,160 @@
+"""
+Fast JSON responses built straight from sqlite3 rows
+
+Rows are serialized with orjson when it is installed (the stdlib encoder
+otherwise), a whole batch per call instead of dict(row) -> jsonify. JSON
+stored in TEXT columns (reports.ai_boxes) is spliced in as raw bytes
+rather than parsed and re-encoded, so clients get an array where they used
+to get a string holding one.
+
+compress_response() is an after_request hook that gzips (or brotli-encodes,
+when the module is installed) JSON bodies above COMPRESS_MIN_BYTES for
+clients that accept it.
+
+benchmark() compares the old dict(row) + json.dumps path with this one;
+run it with `manage.py bench-json`.
+"""
+
+import gzip
+import json
+import time
+
+from flask import current_app, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# TEXT columns that always hold JSON written by json.dumps
+RAW_JSON_COLUMNS = ("ai_boxes",)
+
+COMPRESS_MIN_BYTES = 1400  # roughly one packet; smaller bodies gain nothing
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/geo+json"}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def dumps(value):
+    """JSON bytes; unknown types (datetimes with the stdlib encoder) become strings"""
+    if orjson:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class RawJSON:
+    """Already-encoded JSON bytes, embedded as-is by encode()"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def row_dict(row, raw_columns=RAW_JSON_COLUMNS):
+    """dict(row) with raw_columns decoded, matching what encode_rows() sends"""
+    item = dict(row)
+    for key in raw_columns:
+        if key in item:
+            item[key] = json.loads(item[key]) if item[key] else None
+    return item
+
+
+def row_encoder(keys, raw_columns=RAW_JSON_COLUMNS, exclude=()):
+    """Function turning one row (values in `keys` order) into JSON object bytes"""
+    plain = [(key, i) for i, key in enumerate(keys) if key not in raw_columns and key not in exclude]
+    prefixes = [(dumps(key) + b":", i) for i, key in enumerate(keys) if key in raw_columns and key not in exclude]
+    if not prefixes:
+        return lambda row: dumps({key: row[i] for key, i in plain})
+
+    def encode_row(row):
+        head = dumps({key: row[i] for key, i in plain})[:-1]
+        tail = b",".join(prefix + (row[i].encode("utf-8") if row[i] else b"null") for prefix, i in prefixes)
+        return head + (b"," if plain else b"") + tail + b"}"
+    return encode_row
+
+
+def encode_rows(rows, raw_columns=RAW_JSON_COLUMNS):
+    """JSON array of row objects as RawJSON; raw_columns are embedded unparsed"""
+    if not rows:
+        return RawJSON(b"[]")
+    keys = rows[0].keys()
+    if not any(key in raw_columns for key in keys):
+        return RawJSON(dumps([dict(zip(keys, row)) for row in rows]))
+    return RawJSON(b"[" + b",".join(map(row_encoder(keys, raw_columns), rows)) + b"]")
+
+
+def encode(value):
+    """Serialize a payload that may hold RawJSON as dict values (not inside lists)"""
+    if isinstance(value, RawJSON):
+        return value.data
+    if isinstance(value, dict):
+        return b"{" + b",".join(dumps(str(k)) + b":" + encode(v) for k, v in value.items()) + b"}"
+    return dumps(value)
+
+
+def json_response(value, status=200):
+    return current_app.response_class(encode(value), status=status, mimetype="application/json")
+
+
+# ---- compression ----
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, GZIP_LEVEL)
+
+
+def compress_response(response):
+    """after_request hook: compress large JSON bodies by Accept-Encoding"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    encodings = (["br"] if brotli else []) + ["gzip"]
+    encoding = next((e for e in encodings if request.accept_encodings[e]), None)
+    if encoding is None:
+        return response
+
+    response.set_data(_compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # A different byte sequence needs its own validator
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+# ---- benchmark ----
+def benchmark(rows, repeat=20):
+    """Bytes and best-of-`repeat` milliseconds: old dict(row) + stdlib path vs encode_rows"""
+    def old():
+        return json.dumps({"reports": [dict(row) for row in rows]}).encode("utf-8")
+
+    def new():
+        return encode({"reports": encode_rows(rows)})
+
+    results = {}
+    for name, serialize in (("stdlib", old), ("fast", new)):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = serialize()
+            best = min(best, time.perf_counter() - started)
+        results[name] = {
+            "ms": round(best * 1000, 2),
+            "bytes": len(body),
+            "gzip_bytes": len(_compress(body, "gzip")),
+            "br_bytes": len(_compress(body, "br")) if brotli else None,
+        }
+    results["encoder"] = "orjson" if orjson else "json"
+    results["rows"] = len(rows)
+    return results
@@ -0,0 +1,45 @@
+"""
+Geographic helpers for viewport and radius queries
+"""
+
+import math
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEG_LAT = math.pi * EARTH_RADIUS_M / 180.0
+
+
+def parse_bbox(value):
+    """Parse 'minLon,minLat,maxLon,maxLat' into a tuple, raising ValueError"""
+    parts = [float(p) for p in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError("bbox must be minLon,minLat,maxLon,maxLat")
+
+    min_lon, min_lat, max_lon, max_lat = parts
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180 and
+            -90 <= min_lat <= 90 and -90 <= max_lat <= 90):
+        raise ValueError("bbox out of range")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox min must not exceed max")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def radius_bbox(lat, lon, radius_m):
+    """Bounding box that fully contains a circle of radius_m around (lat, lon)"""
+    dlat = radius_m / METERS_PER_DEG_LAT
+    cos_lat = math.cos(math.radians(lat))
+    dlon = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+    return (
+        max(-180.0, lon - dlon),
+        max(-90.0, lat - dlat),
+        min(180.0, lon + dlon),
+        min(90.0, lat + dlat),
+    )
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,160 @@
+"""
+Resized WebP/AVIF/JPEG variants of uploaded images, rendered on demand
+
+`/img/<name>?w=<width>&fmt=<format>` serves an upload scaled down to one of
+VARIANT_WIDTHS in one of VARIANT_FORMATS. Without `fmt` the best format the
+client's Accept header allows is picked. A variant is rendered on its first
+request and kept in a size-bounded disk cache; each file's mtime is its
+last use, and the least recently used files are evicted once the cache
+outgrows max_bytes.
+
+A variant key hashes the source id and its revision (empty for
+content-addressed blobs, the file mtime for uploads from before
+blob_store) with the width, format and encoder settings. The key doubles
+as a strong ETag: identical inputs give identical bytes, and a
+conditional request is answered without touching the cache at all.
+"""
+
+import io
+import os
+import hashlib
+import logging
+import threading
+
+from PIL import Image, features
+
+from image_pipeline import decode
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (160, 320, 480, 960, 1600)
+THUMB_WIDTH = 480
+
+# format -> (PIL format, mimetype, save options); best first for negotiation
+VARIANT_FORMATS = {
+    "avif": ("AVIF", "image/avif", {"quality": 60, "speed": 8}),
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+
+def available_formats():
+    """Allow-listed formats this Pillow build can encode"""
+    return [fmt for fmt in VARIANT_FORMATS if fmt == "jpeg" or features.check(fmt)]
+
+
+def negotiate_format(accept_mimetypes, formats):
+    """Best format the client accepts; JPEG is always acceptable"""
+    for fmt in formats:
+        if fmt != "jpeg" and VARIANT_FORMATS[fmt][1] in accept_mimetypes.values():
+            return fmt
+    return "jpeg"
+
+
+def variant_url(name, width=THUMB_WIDTH):
+    return f"/img/{name}?w={width}"
+
+
+def render_variant(data, width, fmt):
+    """Encode image bytes at most `width` pixels wide (never upscaled)"""
+    # decode() bounds the long edge; twice the width keeps portrait photos wide enough
+    image = Image.fromarray(decode(data, target=2 * width).array)
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))),
+                             Image.Resampling.LANCZOS, reducing_gap=2.0)
+    pil_format, _, options = VARIANT_FORMATS[fmt]
+    out = io.BytesIO()
+    image.save(out, pil_format, **options)
+    return out.getvalue()
+
+
+class VariantCache:
+    """Rendered variants on disk at <root>/<key[:2]>/<key>.<fmt>, LRU by mtime"""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._rendering = {}
+        self._size = None
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def key(self, source_id, width, fmt, revision=""):
+        """Strong validator for a variant of `source_id` as of `revision`"""
+        options = VARIANT_FORMATS[fmt][2]
+        source = f"{source_id}@{revision}" if revision else source_id
+        identity = f"{source}:{width}:{fmt}:{sorted(options.items())}"
+        return hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+    def path(self, key, fmt):
+        return os.path.join(self.root, key[:2], f"{key}.{fmt}")
+
+    def get(self, key, width, fmt, read_source):
+        """Variant bytes, rendering them from read_source() and storing them on a miss"""
+        path = self.path(key, fmt)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            self.stats["hits"] += 1
+            return data
+        except FileNotFoundError:
+            pass
+
+        # One render per key; concurrent requests for it wait for the first
+        with self._lock:
+            event = self._rendering.get(key)
+            owner = event is None
+            if owner:
+                event = self._rendering[key] = threading.Event()
+        if not owner:
+            event.wait()
+            return self.get(key, width, fmt, read_source)
+
+        try:
+            self.stats["misses"] += 1
+            data = render_variant(read_source(), width, fmt)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            self._grow(len(data))
+        finally:
+            with self._lock:
+                del self._rendering[key]
+            event.set()
+        return data
+
+    def _files(self):
+        for shard in os.scandir(self.root):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if not entry.name.endswith(".tmp"):
+                        yield entry
+
+    def _grow(self, nbytes):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry.stat().st_size for entry in self._files())
+            else:
+                self._size += nbytes
+            if self._size <= self.max_bytes:
+                return
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used variants down to 90% of max_bytes (lock held)"""
+        entries = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in self._files()))
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._size -= size
+            self.stats["evicted"] += 1
+        logger.info(f"🧹 Image variant cache trimmed to {self._size // (1024 * 1024)} MB")
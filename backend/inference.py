@@ -0,0 +1,123 @@
+"""
+Micro-batching scheduler for model inference
+
+Request threads submit one input each and get a Future back. A single
+worker thread drains the queue into batches: it waits for the first item,
+then keeps collecting until the batch is full or max_wait_ms has passed
+since that first item, and runs the whole batch through one call of the
+batch function. Under load batches fill up and throughput rises; when
+traffic is light a request waits at most max_wait_ms extra. With several
+workers (one per inference process) batches are collected and run
+concurrently.
+"""
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """The scheduler already holds max_queue pending items"""
+
+
+class BatchScheduler:
+    """Collects submissions into batches for `predict_batch(items) -> results`"""
+
+    def __init__(self, predict_batch, max_batch=8, max_wait_ms=20, max_queue=256, name="inference", workers=1):
+        self.predict_batch = predict_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "batches": 0,
+            "max_queue_depth": 0,
+            "batch_sizes": {},
+            "queue_wait_ms_total": 0.0,
+            "inference_ms_total": 0.0,
+        }
+        self.workers = workers
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item):
+        """Queue one input; the Future resolves to its own result"""
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise QueueFull(f"{self.name} queue is full")
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue.qsize())
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.predict_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"batch of {len(items)} returned {len(results)} results")
+                error = None
+            except Exception as e:
+                logger.error(f"❌ {self.name} batch of {len(items)} failed: {e}")
+                results, error = None, e
+            elapsed = time.monotonic() - started
+
+            for i, (_, future, queued_at) in enumerate(batch):
+                if error is None:
+                    future.set_result(results[i])
+                else:
+                    future.set_exception(error)
+
+            with self._lock:
+                stats = self._stats
+                stats["batches"] += 1
+                stats["completed" if error is None else "failed"] += len(batch)
+                stats["batch_sizes"][len(batch)] = stats["batch_sizes"].get(len(batch), 0) + 1
+                stats["queue_wait_ms_total"] += sum(started - queued_at for _, _, queued_at in batch) * 1000
+                stats["inference_ms_total"] += elapsed * 1000
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["batch_sizes"] = dict(stats["batch_sizes"])
+        done = stats["completed"] + stats["failed"]
+        stats["queue_depth"] = self._queue.qsize()
+        stats["max_batch"] = self.max_batch
+        stats["workers"] = self.workers
+        stats["max_wait_ms"] = self.max_wait * 1000
+        stats["avg_batch_size"] = round(done / stats["batches"], 2) if stats["batches"] else 0
+        stats["avg_queue_wait_ms"] = round(stats.pop("queue_wait_ms_total") / done, 2) if done else 0
+        stats["avg_batch_ms"] = round(stats.pop("inference_ms_total") / stats["batches"], 2) if stats["batches"] else 0
+        return stats
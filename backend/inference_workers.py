@@ -0,0 +1,331 @@
+"""
+Out-of-process inference workers
+
+The web process no longer loads the model. A pool of worker processes,
+each running one model_backends backend, does the inference, so a heavy
+forward pass cannot hold the GIL that HTTP requests and socket heartbeats
+need, and batches run on several cores at once.
+
+Workers are plain `python inference_workers.py` subprocesses, not forks of
+the web process, so they never import Flask, the app or its state. Each
+worker owns a shared-memory segment: the parent copies a batch of RGB
+arrays into it and sends only their offsets and shapes over a socket; the
+worker maps the arrays in place. Detections (a few hundred bytes) come back
+over the socket.
+
+A monitor thread pings idle workers, and a worker that crashes, times out
+or fails a ping is killed and restarted with exponential backoff while the
+others keep serving.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import logging
+import threading
+import subprocess
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from model_backends import load_rgb
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.abspath(__file__)
+SEGMENT_BYTES = 32 * 1024 * 1024  # initial segment; grown when a batch does not fit
+ALIGN = 64
+PING_TIMEOUT_S = 5
+MAX_BACKOFF_S = 60
+
+
+class WorkerError(Exception):
+    """A worker crashed, timed out or is unavailable; the batch was not run"""
+
+
+def worker_count(per_core, cores=None):
+    """Processes for a per-core ratio: at least one, or 0 (in-process) when per_core <= 0"""
+    if per_core <= 0:
+        return 0
+    return max(1, round((cores or os.cpu_count() or 1) * per_core))
+
+
+def _aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+# ---- parent side ----
+class _Worker:
+    """One worker process, its socket and its shared-memory segment"""
+
+    def __init__(self, index, config):
+        self.index = index
+        self.config = config
+        self.process = None
+        self.conn = None
+        self.segment = None
+        self.name = self.version = None
+        self.retry_at = 0
+        self.backoff = 1
+
+    def start(self, timeout):
+        parent_sock, child_sock = socket.socketpair()
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, str(child_sock.fileno()), json.dumps(self.config)],
+            pass_fds=(child_sock.fileno(),), cwd=os.path.dirname(WORKER_SCRIPT)
+        )
+        child_sock.close()
+        self.conn = Connection(parent_sock.detach())
+        kind, *payload = self._receive(timeout, "start")
+        if kind != "ready":
+            self.stop()
+            raise WorkerError(f"inference worker {self.index} failed to load the model: {payload[0]}")
+        self.name, self.version = payload
+        logger.info(f"✅ Inference worker {self.index} ready (pid {self.process.pid}, {self.name})")
+
+    def stop(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def release(self):
+        self.stop()
+        if self.segment:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
+
+    def _receive(self, timeout, what):
+        try:
+            if not self.conn.poll(timeout):
+                raise WorkerError(f"inference worker {self.index} timed out ({what})")
+            return self.conn.recv()
+        except (EOFError, OSError):
+            code = self.process.wait()
+            raise WorkerError(f"inference worker {self.index} exited with code {code} ({what})")
+
+    def request(self, message, timeout, what):
+        try:
+            self.conn.send(message)
+        except OSError:
+            raise WorkerError(f"inference worker {self.index} is gone ({what})")
+        return self._receive(timeout, what)
+
+    def ping(self):
+        return self.request(("ping",), PING_TIMEOUT_S, "ping")[0] == "pong"
+
+    def predict(self, arrays, timeout):
+        layout, offset = [], 0
+        for array in arrays:
+            layout.append((offset, array.shape, array.dtype.str))
+            offset += _aligned(array.nbytes)
+        if self.segment is None or self.segment.size < offset:
+            if self.segment:
+                self.segment.close()
+                self.segment.unlink()
+            self.segment = SharedMemory(create=True, size=max(offset, SEGMENT_BYTES))
+
+        for array, (start, shape, dtype) in zip(arrays, layout):
+            np.ndarray(shape, dtype, buffer=self.segment.buf, offset=start)[...] = array
+
+        kind, payload = self.request(("predict", self.segment.name, layout), timeout, f"batch of {len(arrays)}")
+        if kind == "error":
+            raise RuntimeError(payload)
+        return payload
+
+
+class InferencePool:
+    """Backend-compatible predict_batch() served by `workers` model processes"""
+
+    def __init__(self, backend, weights, conf, workers=1, threads=None, int8=False,
+                 timeout_s=30, start_timeout_s=300, health_interval_s=10):
+        self.name = backend
+        self.timeout = timeout_s
+        self.start_timeout = start_timeout_s
+        self.health_interval = health_interval_s
+        config = {"name": backend, "weights": weights, "conf": conf, "threads": threads, "int8": int8}
+        self._workers = [_Worker(i, config) for i in range(workers)]
+        self._idle = queue.Queue()
+        self._dead = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._stats = {"batches": 0, "crashes": 0, "restarts": 0, "failed_restarts": 0,
+                       "health_checks": 0, "failed_health_checks": 0}
+
+        try:
+            for worker in self._workers:
+                worker.start(self.start_timeout)
+                self._idle.put(worker)
+        except Exception:
+            self.close()
+            raise
+        self.version = self._workers[0].version
+
+        self._monitor = threading.Thread(target=self._run_monitor, name=f"{backend}-monitor", daemon=True)
+        self._monitor.start()
+
+    def predict_batch(self, images):
+        """Run one batch on the next idle worker; raises WorkerError if none recovers in time"""
+        arrays = [np.ascontiguousarray(load_rgb(image)) for image in images]
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise WorkerError("no inference worker available")
+
+        try:
+            detections = worker.predict(arrays, self.timeout)
+        except WorkerError as e:
+            logger.error(f"❌ {e}; restarting it")
+            self._retire(worker, "crashes")
+            raise
+        except Exception:
+            self._idle.put(worker)
+            raise
+        self._idle.put(worker)
+        with self._lock:
+            self._stats["batches"] += 1
+        return detections
+
+    def _retire(self, worker, reason):
+        worker.stop()
+        with self._lock:
+            self._stats[reason] += 1
+            worker.retry_at = time.monotonic()
+            self._dead.append(worker)
+        self._wake.set()
+
+    def _run_monitor(self):
+        while not self._closed:
+            with self._lock:
+                retries = [w.retry_at for w in self._dead]
+            # Sleep until the next health check, or the next scheduled restart if sooner
+            timeout = min([self.health_interval] + [at - time.monotonic() for at in retries])
+            self._wake.wait(max(timeout, 0))
+            self._wake.clear()
+            if self._closed:
+                break
+            self._restart_dead()
+            self._check_idle()
+
+    def _restart_dead(self):
+        now = time.monotonic()
+        with self._lock:
+            due = [w for w in self._dead if w.retry_at <= now]
+        for worker in due:
+            try:
+                worker.start(self.start_timeout)
+            except WorkerError as e:
+                logger.error(f"❌ {e}; retrying in {worker.backoff}s")
+                with self._lock:
+                    self._stats["failed_restarts"] += 1
+                    worker.retry_at = time.monotonic() + worker.backoff
+                worker.backoff = min(worker.backoff * 2, MAX_BACKOFF_S)
+                continue
+            worker.backoff = 1
+            with self._lock:
+                self._dead.remove(worker)
+                self._stats["restarts"] += 1
+            self._idle.put(worker)
+
+    def _check_idle(self):
+        """Ping the workers that are idle right now; busy ones are covered by the batch timeout"""
+        idle = []
+        while True:
+            try:
+                idle.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in idle:
+            try:
+                healthy = worker.ping()
+            except WorkerError as e:
+                logger.error(f"❌ {e}")
+                healthy = False
+            with self._lock:
+                self._stats["health_checks"] += 1
+            if healthy:
+                self._idle.put(worker)
+            else:
+                with self._lock:
+                    self._stats["failed_health_checks"] += 1
+                self._retire(worker, "crashes")
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        for worker in self._workers:
+            worker.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["dead"] = len(self._dead)
+        stats["workers"] = len(self._workers)
+        stats["idle"] = self._idle.qsize()
+        stats["pids"] = [w.process.pid for w in self._workers if w.process and w.process.poll() is None]
+        stats["shared_memory_bytes"] = sum(w.segment.size for w in self._workers if w.segment)
+        return stats
+
+
+# ---- worker side ----
+def _attach(name):
+    segment = SharedMemory(name=name)
+    # The parent owns the segment; stop this process's tracker from unlinking it on exit
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def worker_main(fd, config):
+    """Load the backend, then serve ping/predict requests until the parent goes away"""
+    from model_backends import load_backend
+
+    conn = Connection(fd)
+    try:
+        backend = load_backend(config["name"], config["weights"], config["conf"],
+                               threads=config["threads"], int8=config["int8"])
+    except Exception as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+        return 1
+    conn.send(("ready", backend.name, backend.version))
+
+    segment = None
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+
+        if message[0] == "ping":
+            conn.send(("pong",))
+            continue
+
+        _, name, layout = message
+        if segment is None or segment.name != name:
+            if segment:
+                segment.close()
+            segment = _attach(name)
+        images = [np.ndarray(shape, dtype, buffer=segment.buf, offset=start) for start, shape, dtype in layout]
+        try:
+            reply = ("result", backend.predict_batch(images))
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        del images
+        conn.send(reply)
+
+    if segment:
+        segment.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s inference-worker %(message)s')
+    sys.exit(worker_main(int(sys.argv[1]), json.loads(sys.argv[2])))
@@ -0,0 +1,127 @@
+"""
+Background image-analysis jobs persisted in SQLite
+
+The upload handler stores the file, inserts an analysis_jobs row and
+returns straight away; a bounded thread pool runs the analysis and writes
+the result back to the row. Rows left queued or running by a previous
+process are picked up again on startup, so a restart loses no work.
+"""
+
+import json
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from inference import QueueFull
+
+logger = logging.getLogger(__name__)
+
+
+def create_job(conn, user_id, image_name, cache_key=None):
+    """Insert a queued job and commit; returns its id"""
+    job_id = uuid.uuid4().hex
+    conn.execute(
+        "INSERT INTO analysis_jobs (id, user_id, image_name, cache_key) VALUES (?, ?, ?, ?)",
+        (job_id, user_id, image_name, cache_key)
+    )
+    conn.commit()
+    return job_id
+
+
+def get_job(conn, job_id):
+    row = conn.execute("SELECT * FROM analysis_jobs WHERE id = ?", (job_id,)).fetchone()
+    if not row:
+        return None
+    job = dict(row)
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+def delete_job(conn, job_id):
+    conn.execute("DELETE FROM analysis_jobs WHERE id = ?", (job_id,))
+    conn.commit()
+
+
+def _set_state(conn, job_id, state, result=None, error=None):
+    conn.execute("""
+        UPDATE analysis_jobs
+        SET state = ?, result = ?, error = ?, updated_at = datetime('now')
+        WHERE id = ?
+    """, (state, json.dumps(result) if result is not None else None, error, job_id))
+    conn.commit()
+
+
+class JobRunner:
+    """Bounded pool running `process(job) -> result dict` for queued jobs"""
+
+    def __init__(self, connect, process, max_workers=4, max_pending=64, on_finished=None):
+        self.connect = connect
+        self.process = process
+        self.on_finished = on_finished
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {"submitted": 0, "done": 0, "failed": 0, "rejected": 0, "requeued": 0}
+
+    def submit(self, job_id, force=False):
+        """Schedule a job; raises QueueFull once max_pending jobs are waiting"""
+        with self._lock:
+            if self._pending >= self.max_pending and not force:
+                self._stats["rejected"] += 1
+                raise QueueFull("analysis queue is full")
+            self._pending += 1
+            self._stats["submitted"] += 1
+        self._executor.submit(self._run, job_id)
+
+    def requeue_unfinished(self):
+        """Resubmit jobs a previous process left queued or running"""
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                "SELECT id FROM analysis_jobs WHERE state IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        finally:
+            conn.close()
+        for row in rows:
+            self.submit(row['id'], force=True)
+        with self._lock:
+            self._stats["requeued"] += len(rows)
+        if rows:
+            logger.info(f"♻️ Requeued {len(rows)} unfinished analysis jobs")
+        return len(rows)
+
+    def _run(self, job_id):
+        conn = self.connect()
+        try:
+            _set_state(conn, job_id, "running")
+            job = get_job(conn, job_id)
+            try:
+                result = self.process(job)
+                _set_state(conn, job_id, "done", result=result)
+                outcome = "done"
+            except Exception as e:
+                logger.error(f"❌ Analysis job {job_id} failed: {e}")
+                _set_state(conn, job_id, "failed", error=str(e))
+                outcome = "failed"
+            job = get_job(conn, job_id)
+        except Exception as e:
+            logger.error(f"❌ Analysis job {job_id} could not be recorded: {e}")
+            job, outcome = None, "failed"
+        finally:
+            conn.close()
+            with self._lock:
+                self._pending -= 1
+
+        with self._lock:
+            self._stats[outcome] += 1
+        if job and self.on_finished:
+            self.on_finished(job)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = self._pending
+        stats["max_pending"] = self.max_pending
+        return stats
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the Pothole backend database
+
+    python manage.py migrate
+    python manage.py check-query-plans
+    python manage.py check-votes
+    python manage.py repair-votes
+    python manage.py rebuild-stats
+    python manage.py rebuild-grid
+    python manage.py retention [--days 30] [--no-archive]
+    python manage.py restore-archive archive/reports
+    python manage.py enable-incremental-vacuum
+    python manage.py check-inference-parity --images samples/ [--backends torch,onnx,openvino]
+    python manage.py ingest-video drive.mp4 --track drive.gpx --user-id 1
+    python manage.py gc-blobs [--grace-hours 24]
+    python manage.py bench-json [--rows 1000]
+"""
+
+import os
+import sys
+import json
+import random
+import sqlite3
+import argparse
+import logging
+
+from blob_store import GC_GRACE_HOURS, LocalBlobStore, collect_garbage
+from clusters import rebuild_grid
+from data_version import DataVersion
+from db_pool import ConnectionPool
+from fast_json import benchmark
+from migrations import run_migrations, schema_version
+from query_plans import check_query_plans
+from retention import ARCHIVE_DIR, RETENTION_DAYS, restore_archive, run_retention
+from stats_rollup import rebuild_rollups
+from tiles import TileCache
+from vote_counters import check_vote_counters, repair_vote_counters
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "potholes.db")
+TILE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tile_cache")
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "uploads")
+UPLOADS_URL = "/static/uploads"
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+logger = logging.getLogger("manage")
+
+
+def data_version(args):
+    """The API's data version for --db; bumped so polling clients refetch"""
+    return DataVersion(f"{args.db}.version")
+
+
+def cmd_migrate(conn, args):
+    # main() has already applied pending migrations
+    print(f"✅ Schema at version {schema_version(conn)}")
+    return 0
+
+
+def cmd_check_query_plans(conn, args):
+    failures = check_query_plans()
+    for location, sql, plan in failures:
+        print(f"❌ {location}: {sql}")
+        for line in plan:
+            print(f"      {line}")
+    if failures:
+        print(f"❌ {len(failures)} queries fail the plan check")
+        return 1
+    print("✅ No query falls back to a full scan")
+    return 0
+
+
+def cmd_check_votes(conn, args):
+    mismatches = check_vote_counters(conn)
+    for row in mismatches[:args.show]:
+        print(f"report {row['report_id']}: stored {row['stored_up']}/{row['stored_down']}, "
+              f"actual {row['actual_up']}/{row['actual_down']}")
+    if mismatches:
+        print(f"❌ {len(mismatches)} reports have inconsistent vote counters")
+        return 1
+    print("✅ Vote counters are consistent")
+    return 0
+
+
+def cmd_repair_votes(conn, args):
+    fixed = repair_vote_counters(conn)
+    conn.commit()
+    if fixed:
+        data_version(args).bump()
+        TileCache(TILE_CACHE_DIR).invalidate_all()
+    print(f"✅ Vote counters rebuilt ({fixed} reports corrected)")
+    return 0
+
+
+def cmd_rebuild_stats(conn, args):
+    conn.execute("BEGIN IMMEDIATE")
+    rebuild_rollups(conn)
+    conn.commit()
+    data_version(args).bump()
+    print("✅ Statistics rollups rebuilt")
+    return 0
+
+
+def cmd_rebuild_grid(conn, args):
+    conn.execute("BEGIN IMMEDIATE")
+    rebuild_grid(conn)
+    conn.commit()
+    # Cached cluster tiles and conditional GETs still reflect the old grid
+    data_version(args).bump()
+    TileCache(TILE_CACHE_DIR).invalidate_all()
+    print("✅ Cluster grid rebuilt")
+    return 0
+
+
+def cmd_retention(conn, args):
+    totals = run_retention(conn, args.days, None if args.no_archive else args.archive,
+                           on_reports_deleted=TileCache(TILE_CACHE_DIR).invalidate_all,
+                           blob_store=LocalBlobStore(UPLOADS_DIR, UPLOADS_URL),
+                           data_version=data_version(args))
+    print(f"✅ Removed rows older than {totals['cutoff']}: {totals['deleted']}, "
+          f"{totals['blobs_removed']} unreferenced uploads, {totals['vacuumed_pages']} pages vacuumed")
+    return 0
+
+
+def cmd_gc_blobs(conn, args):
+    removed, freed = collect_garbage(conn, LocalBlobStore(UPLOADS_DIR, UPLOADS_URL), args.grace_hours)
+    print(f"✅ Removed {removed} unreferenced uploads ({freed / (1024 * 1024):.1f} MB)")
+    return 0
+
+
+def _sample_reports(count):
+    """Synthetic report rows, for benchmarking against an empty database"""
+    mem = sqlite3.connect(":memory:")
+    mem.row_factory = sqlite3.Row
+    mem.execute("""CREATE TABLE reports (id INTEGER PRIMARY KEY, user_id INTEGER, text TEXT, lat REAL,
+                   lon REAL, severity TEXT, image_url TEXT, thumb_url TEXT, ai_conf REAL, ai_boxes TEXT,
+                   votes INTEGER, created_at TEXT)""")
+    rng = random.Random(0)
+    boxes = lambda: json.dumps([{"label": "pothole", "confidence": round(rng.random(), 3),
+                                 "bbox": [rng.randint(0, 640) for _ in range(4)]} for _ in range(rng.randint(0, 4))])
+    mem.executemany(
+        """INSERT INTO reports (user_id, text, lat, lon, severity, image_url, thumb_url, ai_conf, ai_boxes,
+                               votes, created_at)
+           VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))""",
+        [(f"Pothole #{i}", 12.9 + rng.random(), 77.5 + rng.random(), rng.choice(("low", "medium", "high")),
+          f"{UPLOADS_URL}/{i:064x}.jpg", f"/img/{i:064x}.jpg?w=480", round(rng.random(), 3), boxes(),
+          rng.randint(-5, 50)) for i in range(count)])
+    return mem.execute("SELECT * FROM reports -- full-scan-ok: in-memory sample").fetchall()
+
+
+def cmd_bench_json(conn, args):
+    rows = conn.execute("SELECT * FROM reports ORDER BY id DESC LIMIT ? -- full-scan-ok: benchmark",
+                        (args.rows,)).fetchall()
+    source = "database"
+    if not rows:
+        rows, source = _sample_reports(args.rows), "synthetic"
+    results = benchmark(rows, args.repeat)
+    print(f"📊 {results['rows']} {source} report rows, encoder {results['encoder']}")
+    for name in ("stdlib", "fast"):
+        entry = results[name]
+        line = f"{name:>7}: {entry['ms']} ms, {entry['bytes']} bytes, gzip {entry['gzip_bytes']}"
+        if entry["br_bytes"] is not None:
+            line += f", br {entry['br_bytes']}"
+        print(line)
+    print(f"✅ x{results['stdlib']['ms'] / max(results['fast']['ms'], 0.01):.1f} faster")
+    return 0
+
+
+def cmd_restore_archive(conn, args):
+    restored = restore_archive(conn, args.path)
+    # Version first, so an API tile render overlapping this is not stored
+    if any(restored.values()):
+        data_version(args).bump()
+    if restored.get("reports"):
+        TileCache(TILE_CACHE_DIR).invalidate_all()
+    print(f"✅ Restored {restored or 'nothing'}")
+    return 0
+
+
+def cmd_enable_incremental_vacuum(conn, args):
+    # Switching an existing database needs one full VACUUM, which rewrites the file
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    print(f"✅ auto_vacuum = {conn.execute('PRAGMA auto_vacuum').fetchone()[0]} (2 = incremental)")
+    return 0
+
+
+def cmd_check_inference_parity(conn, args):
+    # Imported here: the backends pull in numpy/PIL and, lazily, the ML runtimes
+    from model_backends import load_backend, parity_report
+
+    images = sorted(
+        os.path.join(args.images, f) for f in os.listdir(args.images)
+        if f.lower().rsplit(".", 1)[-1] in ("jpg", "jpeg", "png", "webp")
+    ) if os.path.isdir(args.images) else [args.images]
+    if not images:
+        print(f"❌ No images found in {args.images}")
+        return 1
+
+    names = args.backends.split(",")
+    backends = [load_backend(name, args.weights, args.conf, threads=args.threads,
+                             int8=args.int8 and name == "openvino") for name in names]
+    report = parity_report(backends, images, min_iou=args.min_iou, batch=args.batch)
+
+    failed = False
+    for name, entry in report.items():
+        line = f"{name:>9}: {entry['ms_per_image']} ms/image, {entry['detections']} detections"
+        if "matched" in entry:
+            mismatched = entry["missing"] + entry["extra"]
+            failed |= mismatched > args.max_mismatch * max(1, report[names[0]]["detections"])
+            line += (f", matched {entry['matched']}, missing {entry['missing']}, extra {entry['extra']}, "
+                     f"min IoU {entry['min_iou']}, max conf diff {entry['max_conf_diff']}, "
+                     f"speedup x{entry['speedup']}")
+        print(line)
+
+    print("❌ Backends disagree" if failed else f"✅ Backends agree with {names[0]}")
+    return 1 if failed else 0
+
+
+def cmd_ingest_video(conn, args):
+    from model_backends import load_backend
+    from video_ingest import ingest_video, load_track, iso_epoch
+
+    if not conn.execute("SELECT 1 FROM users WHERE id = ?", (args.user_id,)).fetchone():
+        print(f"❌ No user with id {args.user_id}")
+        return 1
+
+    gps = load_track(args.track)
+    start = iso_epoch(args.start) if args.start else gps.start
+    backend = load_backend(args.backend, args.weights, args.conf, threads=args.threads)
+
+    summary = ingest_video(
+        conn, args.video, gps, backend, args.user_id, LocalBlobStore(UPLOADS_DIR, UPLOADS_URL),
+        start_epoch=start + args.offset, batch_size=args.batch,
+        classes=set(args.classes.split(",")) if args.classes else None,
+        dry_run=args.dry_run,
+        sampling={"min_interval_s": args.min_interval, "max_interval_s": args.max_interval,
+                  "diff_threshold": args.diff_threshold}
+    )
+    if summary["inserted"] or summary["merged"]:
+        data_version(args).bump()
+        TileCache(TILE_CACHE_DIR).invalidate_all()
+
+    frames = summary["frames"]
+    print(f"🎞️ {frames.get('frames', 0)} frames, {frames.get('decoded', 0)} decoded, "
+          f"{frames.get('kept', 0)} analysed")
+    print(f"✅ {summary['tracks']} tracked potholes: {summary['inserted']} new reports, "
+          f"{summary['merged']} merged, {summary['unlocated']} outside the GPS track")
+    for sighting in summary.get("sightings", []):
+        print(f"   {sighting['created_at']} {sighting['lat']:.6f},{sighting['lon']:.6f} "
+              f"{sighting['severity']} {sighting['ai_conf']}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate", help="apply pending schema migrations")
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser("check-query-plans", help="fail if any query plan is a full scan")
+    p.set_defaults(func=cmd_check_query_plans)
+
+    p = sub.add_parser("check-votes", help="verify reports.upvotes/downvotes against votes")
+    p.add_argument("--show", type=int, default=20, help="mismatches to print")
+    p.set_defaults(func=cmd_check_votes)
+
+    p = sub.add_parser("repair-votes", help="rebuild reports.upvotes/downvotes from votes")
+    p.set_defaults(func=cmd_repair_votes)
+
+    p = sub.add_parser("rebuild-stats", help="recompute stats_counters/stats_daily from scratch")
+    p.set_defaults(func=cmd_rebuild_stats)
+
+    p = sub.add_parser("rebuild-grid", help="recompute the report_grid clustering index")
+    p.set_defaults(func=cmd_rebuild_grid)
+
+    p = sub.add_parser("retention", help="archive and delete old reports, comments and votes")
+    p.add_argument("--days", type=int, default=RETENTION_DAYS, help="keep rows newer than this")
+    p.add_argument("--archive", default=ARCHIVE_DIR, help="archive directory")
+    p.add_argument("--no-archive", action="store_true", help="delete without archiving")
+    p.set_defaults(func=cmd_retention)
+
+    p = sub.add_parser("restore-archive", help="re-import archived rows (file or directory)")
+    p.add_argument("path")
+    p.set_defaults(func=cmd_restore_archive)
+
+    p = sub.add_parser("enable-incremental-vacuum", help="switch an existing database to auto_vacuum=INCREMENTAL")
+    p.set_defaults(func=cmd_enable_incremental_vacuum)
+
+    p = sub.add_parser("check-inference-parity", help="compare detections and speed across inference backends")
+    p.add_argument("--images", required=True, help="image file or directory of sample images")
+    p.add_argument("--backends", default="torch,onnx,openvino", help="comma list; the first is the reference")
+    p.add_argument("--weights", default="yolov8n.pt")
+    p.add_argument("--conf", type=float, default=0.25)
+    p.add_argument("--threads", type=int, default=None, help="intra-op threads per backend")
+    p.add_argument("--int8", action="store_true", help="use the INT8 OpenVINO model")
+    p.add_argument("--batch", type=int, default=8)
+    p.add_argument("--min-iou", type=float, default=0.9, help="IoU for two boxes to count as the same")
+    p.add_argument("--max-mismatch", type=float, default=0.02,
+                   help="tolerated missing+extra boxes as a fraction of reference detections")
+    p.set_defaults(func=cmd_check_inference_parity)
+
+    p = sub.add_parser("ingest-video", help="detect, track and geo-locate potholes in dashcam video")
+    p.add_argument("video")
+    p.add_argument("--track", required=True, help="GPX or NMEA log recorded with the video")
+    p.add_argument("--user-id", type=int, required=True, help="user the reports are filed under")
+    p.add_argument("--start", help="UTC time of the first frame (default: start of the track)")
+    p.add_argument("--offset", type=float, default=0.0, help="seconds added to the start time")
+    p.add_argument("--backend", default=os.environ.get("INFERENCE_BACKEND", "torch"))
+    p.add_argument("--weights", default="yolov8n.pt")
+    p.add_argument("--conf", type=float, default=0.25)
+    p.add_argument("--threads", type=int, default=None)
+    p.add_argument("--batch", type=int, default=8)
+    p.add_argument("--classes", help="comma list of labels to keep (default: all)")
+    p.add_argument("--min-interval", type=float, default=0.25, help="never analyse frames closer than this (s)")
+    p.add_argument("--max-interval", type=float, default=2.0, help="always analyse a frame this often (s)")
+    p.add_argument("--diff-threshold", type=float, default=6.0, help="mean grey-level change that counts as new")
+    p.add_argument("--dry-run", action="store_true", help="print sightings without writing anything")
+    p.set_defaults(func=cmd_ingest_video)
+
+    p = sub.add_parser("gc-blobs", help="delete uploads no report references")
+    p.add_argument("--grace-hours", type=float, default=GC_GRACE_HOURS,
+                   help="keep unreferenced uploads younger than this")
+    p.set_defaults(func=cmd_gc_blobs)
+
+    p = sub.add_parser("bench-json", help="time report serialization: stdlib json vs fast_json")
+    p.add_argument("--rows", type=int, default=1000, help="report rows to serialize")
+    p.add_argument("--repeat", type=int, default=20, help="runs per encoder; the best one counts")
+    p.set_defaults(func=cmd_bench_json)
+
+    args = parser.parse_args(argv)
+    pool = ConnectionPool(args.db)
+    conn = pool.connect()
+    try:
+        run_migrations(conn)
+        return args.func(conn, args)
+    finally:
+        conn.close()
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Static asset and media serving
+
+Every file goes out through Flask's send_file with conditional=True, which
+answers If-None-Match/If-Modified-Since with 304 and Range requests with
+206. On top of that:
+
+- Content-addressed media (blob uploads, variants of them) never change
+  under their URL, so they get a one-year `immutable` Cache-Control and
+  the content hash as a strong ETag; browsers stop revalidating them.
+- Frontend assets are indexed once at startup by StaticManifest, which
+  replaces a filesystem lookup per request. Their names are not hashed,
+  so they are served `no-cache` with a content-hash ETag: revalidation is
+  a cheap 304. Text assets are precompressed once (gzip, and brotli when
+  the module is installed) into a cache directory and the smallest
+  encoding the client accepts is sent.
+"""
+
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+
+from flask import request, send_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".svg", ".json", ".map", ".txt", ".xml"}
+MIN_COMPRESS_BYTES = 1024
+
+# Content-Encoding -> (file suffix, compressor); preferred first
+ENCODERS = {"gzip": (".gz", lambda data: gzip.compress(data, 9, mtime=0))}
+if brotli:
+    ENCODERS = {"br": (".br", lambda data: brotli.compress(data, quality=11)), **ENCODERS}
+
+
+class Asset:
+    __slots__ = ("path", "mimetype", "etag", "encoded")
+
+    def __init__(self, path, mimetype, etag, encoded):
+        self.path = path
+        self.mimetype = mimetype
+        self.etag = etag
+        self.encoded = encoded  # Content-Encoding -> precompressed file
+
+
+class StaticManifest:
+    """Files under `root` (minus runtime directories), indexed and precompressed once"""
+
+    def __init__(self, root, cache_dir, exclude=()):
+        self.root = root
+        self.cache_dir = cache_dir
+        self.exclude = set(exclude)
+        self.assets = {}
+
+    def build(self):
+        assets = {}
+        for directory, subdirs, files in os.walk(self.root):
+            if directory == self.root:
+                subdirs[:] = [d for d in subdirs if d not in self.exclude]
+            for name in files:
+                path = os.path.join(directory, name)
+                relpath = os.path.relpath(path, self.root).replace(os.sep, "/")
+                assets[relpath] = self._index(relpath, path)
+        self.assets = assets
+        self._prune({path for asset in assets.values() for path in asset.encoded.values()})
+        compressed = sum(1 for asset in assets.values() if asset.encoded)
+        logger.info(f"📦 Indexed {len(assets)} static assets ({compressed} precompressed)")
+        return self
+
+    def _index(self, relpath, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        etag = hashlib.sha256(data).hexdigest()[:32]
+        encoded = {}
+        if os.path.splitext(path)[1].lower() in COMPRESSIBLE and len(data) >= MIN_COMPRESS_BYTES:
+            for encoding, (suffix, compress) in ENCODERS.items():
+                target = os.path.join(self.cache_dir, f"{relpath}.{etag}{suffix}")
+                if not os.path.exists(target):
+                    packed = compress(data)
+                    if len(packed) >= len(data):
+                        continue
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with open(f"{target}.tmp", "wb") as f:
+                        f.write(packed)
+                    os.replace(f"{target}.tmp", target)
+                encoded[encoding] = target
+        return Asset(path, mimetype, etag, encoded)
+
+    def _prune(self, keep):
+        """Drop precompressed files of assets that changed or disappeared"""
+        for directory, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(directory, name)
+                if path not in keep:
+                    os.remove(path)
+
+    def get(self, relpath):
+        return self.assets.get(relpath)
+
+
+def _cache(response, max_age, immutable):
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    # send_file marks everything no-cache unless told otherwise
+    response.cache_control.no_cache = None if max_age else True
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+
+def send_asset(asset):
+    """Frontend asset: precompressed when accepted, revalidated by ETag"""
+    encoding = next((e for e in asset.encoded if request.accept_encodings[e]), None)
+    if encoding is None:
+        response = send_file(asset.path, mimetype=asset.mimetype, etag=asset.etag)
+    else:
+        # Each encoding is its own representation, with its own validator
+        response = send_file(asset.encoded[encoding], mimetype=asset.mimetype, etag=f"{asset.etag}-{encoding}")
+        response.headers["Content-Encoding"] = encoding
+    if asset.encoded:
+        response.vary.add("Accept-Encoding")
+    return _cache(response, 0, immutable=False)
+
+
+def send_media(path, etag=None, max_age=IMMUTABLE_MAX_AGE, immutable=True):
+    """Media file with byte-range support; immutable ones are cached for a year"""
+    response = send_file(path, etag=etag or True)
+    return _cache(response, max_age, immutable)
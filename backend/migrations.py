@@ -0,0 +1,458 @@
+"""
+Versioned schema migrations
+
+The schema version lives in PRAGMA user_version. Each step runs in its own
+transaction together with the version bump, so a crash never leaves a
+half-applied step behind. Steps are idempotent (IF NOT EXISTS, column
+checks) because databases created before this runner existed already
+carry part of the schema at user_version 0.
+
+Append new steps to MIGRATIONS; never edit or reorder shipped ones.
+"""
+
+import logging
+
+from clusters import GRID_CELL_SQL, MAX_CLUSTER_ZOOM, cells_per_world, rebuild_grid
+from stats_rollup import rebuild_rollups
+from vote_counters import repair_vote_counters
+
+logger = logging.getLogger(__name__)
+
+
+def m001_base_tables(conn):
+    """Users, reports, comments and votes"""
+    # Users table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT DEFAULT 'user',
+            created_at TEXT DEFAULT (datetime('now')),
+            last_login TEXT
+        )
+    """)
+
+    # Reports table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            text TEXT NOT NULL,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            severity TEXT NOT NULL,
+            image_url TEXT,
+            thumb_url TEXT,
+            ai_conf REAL,
+            ai_boxes TEXT,
+            verified BOOLEAN DEFAULT FALSE,
+            votes INTEGER DEFAULT 0,
+            created_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+
+    # Comments table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            report_id INTEGER,
+            text TEXT NOT NULL,
+            created_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (report_id) REFERENCES reports (id)
+        )
+    """)
+
+    # Votes table
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS votes (
+            user_id INTEGER,
+            report_id INTEGER,
+            vote_type TEXT CHECK(vote_type IN ('up', 'down')),
+            created_at TEXT DEFAULT (datetime('now')),
+            PRIMARY KEY (user_id, report_id)
+        )
+    """)
+
+
+def m002_reports_rtree(conn):
+    """R*Tree spatial index over reports.lat/lon, kept in sync by triggers"""
+    has_rtree = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reports_rtree'"
+    ).fetchone()
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS reports_rtree USING rtree(
+            id, min_lon, max_lon, min_lat, max_lat
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_rtree_insert AFTER INSERT ON reports
+        BEGIN
+            INSERT INTO reports_rtree VALUES (new.id, new.lon, new.lon, new.lat, new.lat);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_rtree_delete AFTER DELETE ON reports
+        BEGIN
+            DELETE FROM reports_rtree WHERE id = old.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_rtree_update AFTER UPDATE OF lat, lon ON reports
+        BEGIN
+            UPDATE reports_rtree
+            SET min_lon = new.lon, max_lon = new.lon, min_lat = new.lat, max_lat = new.lat
+            WHERE id = new.id;
+        END
+    """)
+    if not has_rtree:
+        conn.execute("INSERT INTO reports_rtree SELECT id, lon, lon, lat, lat FROM reports")
+
+
+def m003_vote_counters(conn):
+    """Denormalized reports.upvotes/downvotes, maintained by triggers on votes"""
+    report_columns = {row['name'] for row in conn.execute("PRAGMA table_info(reports)")}
+    if 'upvotes' not in report_columns:
+        conn.execute("ALTER TABLE reports ADD COLUMN upvotes INTEGER NOT NULL DEFAULT 0")
+        conn.execute("ALTER TABLE reports ADD COLUMN downvotes INTEGER NOT NULL DEFAULT 0")
+        repair_vote_counters(conn)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS votes_counter_insert AFTER INSERT ON votes
+        BEGIN
+            UPDATE reports
+            SET upvotes = upvotes + (new.vote_type = 'up'),
+                downvotes = downvotes + (new.vote_type = 'down')
+            WHERE id = new.report_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS votes_counter_delete AFTER DELETE ON votes
+        BEGIN
+            UPDATE reports
+            SET upvotes = upvotes - (old.vote_type = 'up'),
+                downvotes = downvotes - (old.vote_type = 'down')
+            WHERE id = old.report_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS votes_counter_update AFTER UPDATE OF vote_type ON votes
+        WHEN old.vote_type != new.vote_type
+        BEGIN
+            UPDATE reports
+            SET upvotes = upvotes + (new.vote_type = 'up') - (old.vote_type = 'up'),
+                downvotes = downvotes + (new.vote_type = 'down') - (old.vote_type = 'down')
+            WHERE id = new.report_id;
+        END
+    """)
+
+
+def m004_secondary_indexes(conn):
+    """Indexes behind the app and dashboard filters and orderings"""
+    for ddl in (
+        # keyset pagination and every ORDER BY r.created_at
+        "CREATE INDEX IF NOT EXISTS idx_reports_created_id ON reports (created_at DESC, id DESC)",
+        # ?severity= / ?verified= filters, still ordered by recency
+        "CREATE INDEX IF NOT EXISTS idx_reports_severity_created ON reports (severity, created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_reports_verified_created ON reports (verified, created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_comments_report_created ON comments (report_id, created_at DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_comments_created ON comments (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_votes_report ON votes (report_id, vote_type)",
+        "CREATE INDEX IF NOT EXISTS idx_votes_created ON votes (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at)",
+    ):
+        conn.execute(ddl)
+
+
+def m005_stats_rollups(conn):
+    """Counter and per-day rollup tables kept current by triggers"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stats_daily (
+            day TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            severity TEXT NOT NULL DEFAULT '',
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, kind, severity)
+        ) WITHOUT ROWID
+    """)
+
+    # sign is +1 for the new row and -1 for the old one
+    def report_rollup(row, sign):
+        return f"""
+            INSERT INTO stats_daily (day, kind, severity, count)
+            VALUES (substr({row}.created_at, 1, 10), 'reports', {row}.severity, {sign})
+            ON CONFLICT (day, kind, severity) DO UPDATE SET count = count + excluded.count;
+            INSERT INTO stats_counters (name, value) VALUES
+                ('reports', {sign}),
+                ('severity:' || {row}.severity, {sign}),
+                ('ai_conf_sum', {sign} * COALESCE({row}.ai_conf, 0)),
+                ('ai_conf_count', {sign} * ({row}.ai_conf IS NOT NULL))
+            ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;
+        """
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS stats_reports_insert AFTER INSERT ON reports
+        BEGIN {report_rollup('new', 1)} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS stats_reports_delete AFTER DELETE ON reports
+        BEGIN {report_rollup('old', -1)} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS stats_reports_update
+        AFTER UPDATE OF severity, ai_conf, created_at ON reports
+        BEGIN {report_rollup('old', -1)} {report_rollup('new', 1)} END
+    """)
+
+    for table in ("users", "comments"):
+        for event, row, sign in (("INSERT", "new", 1), ("DELETE", "old", -1)):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS stats_{table}_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO stats_daily (day, kind, severity, count)
+                    VALUES (substr({row}.created_at, 1, 10), '{table}', '', {sign})
+                    ON CONFLICT (day, kind, severity) DO UPDATE SET count = count + excluded.count;
+                    INSERT INTO stats_counters (name, value) VALUES ('{table}', {sign})
+                    ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;
+                END
+            """)
+
+    for event, sign in (("INSERT", 1), ("DELETE", -1)):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS stats_votes_{event.lower()} AFTER {event} ON votes
+            BEGIN
+                INSERT INTO stats_counters (name, value) VALUES ('votes', {sign})
+                ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;
+            END
+        """)
+
+    rebuild_rollups(conn)
+
+
+def grid_delta(row, sign):
+    """Trigger body adding (sign=1) or removing (sign=-1) `row` from report_grid"""
+    return f"""
+        INSERT INTO report_grid (zoom, cell_x, cell_y, count, sum_lat, sum_lon, low, medium, high)
+        SELECT {GRID_CELL_SQL.format(row=row)},
+               {sign}, {sign} * {row}.lat, {sign} * {row}.lon,
+               {sign} * ({row}.severity = 'low'),
+               {sign} * ({row}.severity = 'medium'),
+               {sign} * ({row}.severity = 'high')
+        FROM grid_zooms z WHERE true
+        ON CONFLICT (zoom, cell_x, cell_y) DO UPDATE SET
+            count = count + excluded.count,
+            sum_lat = sum_lat + excluded.sum_lat,
+            sum_lon = sum_lon + excluded.sum_lon,
+            low = low + excluded.low,
+            medium = medium + excluded.medium,
+            high = high + excluded.high;
+    """
+
+
+def m006_report_grid(conn):
+    """Per-zoom clustering grid over reports, kept current by triggers"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS grid_zooms (
+            zoom INTEGER PRIMARY KEY,
+            cells INTEGER NOT NULL
+        )
+    """)
+    conn.executemany(
+        "INSERT OR REPLACE INTO grid_zooms (zoom, cells) VALUES (?, ?)",
+        [(zoom, cells_per_world(zoom)) for zoom in range(MAX_CLUSTER_ZOOM + 1)]
+    )
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS report_grid (
+            zoom INTEGER NOT NULL,
+            cell_x INTEGER NOT NULL,
+            cell_y INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            sum_lat REAL NOT NULL DEFAULT 0,
+            sum_lon REAL NOT NULL DEFAULT 0,
+            low INTEGER NOT NULL DEFAULT 0,
+            medium INTEGER NOT NULL DEFAULT 0,
+            high INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (zoom, cell_x, cell_y)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS grid_reports_insert AFTER INSERT ON reports
+        BEGIN {grid_delta('new', 1)} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS grid_reports_delete AFTER DELETE ON reports
+        BEGIN {grid_delta('old', -1)} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS grid_reports_update AFTER UPDATE OF lat, lon, severity ON reports
+        BEGIN {grid_delta('old', -1)} {grid_delta('new', 1)} END
+    """)
+
+    rebuild_grid(conn)
+
+
+def m007_report_confirmations(conn):
+    """Confirmation counts for merged duplicate submissions"""
+    report_columns = {row['name'] for row in conn.execute("PRAGMA table_info(reports)")}
+    if 'confirmations' not in report_columns:
+        conn.execute("ALTER TABLE reports ADD COLUMN confirmations INTEGER NOT NULL DEFAULT 1")
+        conn.execute("ALTER TABLE reports ADD COLUMN last_confirmed_at TEXT")
+
+
+def m008_suspendable_grid_trigger(conn):
+    """Let bulk writers skip the per-row grid trigger and update cells set-wise"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS trigger_suspensions (
+            name TEXT PRIMARY KEY
+        ) WITHOUT ROWID
+    """)
+    conn.execute("DROP TRIGGER IF EXISTS grid_reports_insert")
+    conn.execute(f"""
+        CREATE TRIGGER grid_reports_insert AFTER INSERT ON reports
+        WHEN NOT EXISTS (SELECT 1 FROM trigger_suspensions WHERE name = 'grid')
+        BEGIN {grid_delta('new', 1)} END
+    """)
+
+
+def m009_analysis_jobs(conn):
+    """Persistent queue for asynchronous /api/analyze-image jobs"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            state TEXT NOT NULL DEFAULT 'queued'
+                CHECK (state IN ('queued', 'running', 'done', 'failed')),
+            image_name TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            updated_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_jobs_state ON analysis_jobs (state, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_jobs_created ON analysis_jobs (created_at)")
+
+
+def m010_analysis_cache(conn):
+    """Content-addressed cache of analysis results, and the key on queued jobs"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_cache (
+            key TEXT PRIMARY KEY,
+            model_version TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at TEXT DEFAULT (datetime('now')),
+            last_used_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_analysis_cache_used ON analysis_cache (last_used_at)")
+    conn.execute("ALTER TABLE analysis_jobs ADD COLUMN cache_key TEXT")
+
+
+def m011_blobs(conn):
+    """Content-addressed upload registry; triggers on reports keep the reference counts"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            id TEXT PRIMARY KEY,
+            url TEXT NOT NULL UNIQUE,
+            size INTEGER NOT NULL,
+            parent TEXT,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT DEFAULT (datetime('now')),
+            touched_at TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_orphans ON blobs (refcount, touched_at)")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS blobs_reports_insert AFTER INSERT ON reports
+        WHEN NEW.image_url IS NOT NULL BEGIN
+            UPDATE blobs SET refcount = refcount + 1 WHERE url = NEW.image_url;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS blobs_reports_delete AFTER DELETE ON reports
+        WHEN OLD.image_url IS NOT NULL BEGIN
+            UPDATE blobs SET refcount = refcount - 1 WHERE url = OLD.image_url;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS blobs_reports_update AFTER UPDATE OF image_url ON reports
+        WHEN OLD.image_url IS NOT NEW.image_url BEGIN
+            UPDATE blobs SET refcount = refcount - 1 WHERE url = OLD.image_url;
+            UPDATE blobs SET refcount = refcount + 1 WHERE url = NEW.image_url;
+        END
+    """)
+
+
+def m012_reports_last_active(conn):
+    """Retention ages reports from their last confirmation, as dedup does"""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reports_last_active ON reports (COALESCE(last_confirmed_at, created_at))"
+    )
+
+
+MIGRATIONS = [
+    (1, m001_base_tables),
+    (2, m002_reports_rtree),
+    (3, m003_vote_counters),
+    (4, m004_secondary_indexes),
+    (5, m005_stats_rollups),
+    (6, m006_report_grid),
+    (7, m007_report_confirmations),
+    (8, m008_suspendable_grid_trigger),
+    (9, m009_analysis_jobs),
+    (10, m010_analysis_cache),
+    (11, m011_blobs),
+    (12, m012_reports_last_active),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn):
+    """Apply every pending migration; safe to call from several processes"""
+    applied = []
+    if schema_version(conn) == 0 and not conn.execute("SELECT 1 FROM sqlite_master").fetchone():
+        # Lets retention shrink the file. WAL has already written the header,
+        # so the switch needs a VACUUM, which costs nothing on an empty file.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+    for version, step in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+
+        # Take the write lock first, then re-check: another process may have won
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version <= schema_version(conn):
+                conn.rollback()
+                continue
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"❌ Migration {version} ({step.__name__}) failed")
+            raise
+
+        applied.append(version)
+        logger.info(f"🗄️ Applied migration {version}: {step.__name__}")
+
+    if not applied:
+        logger.info(f"🗄️ Database schema up to date (version {schema_version(conn)})")
+    return applied
@@ -0,0 +1,343 @@
+"""
+Inference backends for the YOLOv8 detector
+
+Every backend exposes the same predict_batch(images) -> [[{conf, box, class}]]
+so the scheduler and the API never see which runtime is in use:
+
+- torch:    ultralytics/PyTorch, the original path
+- onnx:     the model exported once to ONNX and run with ONNX Runtime
+- openvino: the model exported once to OpenVINO IR (optionally INT8 via
+            NNCF post-training quantization) and run with OpenVINO
+
+Exported models are cached next to the weights and reused until the
+weights change. The exported backends do their own letterbox
+pre-processing and NMS in numpy, mirroring ultralytics' defaults, so their
+boxes line up with the torch backend; `manage.py check-inference-parity`
+verifies that on real images before a switch.
+
+ultralytics, onnxruntime and openvino are imported lazily, only by the
+backend that needs them.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "openvino")
+IMG_SIZE = 640
+PAD_VALUE = 114
+NMS_IOU = 0.7
+MAX_DETECTIONS = 300
+INT8_CALIBRATION_DATA = "coco8.yaml"
+
+
+# ---- export cache ----
+def _manifest_path(weights):
+    return f"{weights}.exports.json"
+
+
+def _load_manifest(weights):
+    try:
+        with open(_manifest_path(weights)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def export_model(weights, fmt, int8=False, imgsz=IMG_SIZE):
+    """Return (exported_path, class_names), exporting only when stale"""
+    key = f"{fmt}{'-int8' if int8 else ''}-{imgsz}"
+    manifest = _load_manifest(weights)
+    entry = manifest.get(key)
+    if (entry and os.path.exists(entry["path"]) and os.path.exists(weights)
+            and entry["weights_mtime"] == os.path.getmtime(weights)):
+        return entry["path"], {int(k): v for k, v in entry["names"].items()}
+
+    from ultralytics import YOLO
+
+    logger.info(f"📦 Exporting {weights} to {key}...")
+    model = YOLO(weights)  # downloads the stock weights if they are missing
+    options = {"format": fmt, "imgsz": imgsz, "dynamic": True}
+    if int8:
+        if fmt != "openvino":
+            raise ValueError("INT8 quantization is only supported for the openvino backend")
+        options.update(int8=True, data=INT8_CALIBRATION_DATA)
+    path = str(model.export(**options))
+
+    manifest[key] = {
+        "path": path,
+        "names": {str(k): v for k, v in model.names.items()},
+        "weights_mtime": os.path.getmtime(weights),
+    }
+    tmp = _manifest_path(weights) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, _manifest_path(weights))
+    logger.info(f"📦 Exported {path}")
+    return path, model.names
+
+
+# ---- pre/post-processing for exported models ----
+def load_rgb(item):
+    """Path, PIL image or HxWx3 uint8 RGB array -> RGB array"""
+    if isinstance(item, np.ndarray):
+        return item
+    if isinstance(item, Image.Image):
+        return np.asarray(item.convert("RGB"))
+    with Image.open(item) as im:
+        return np.asarray(im.convert("RGB"))
+
+
+def letterbox(image, size=IMG_SIZE):
+    """Resize keeping aspect ratio and pad to size x size; returns (array, scale, (pad_x, pad_y))"""
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    resized = np.asarray(Image.fromarray(image).resize((new_w, new_h), Image.Resampling.BILINEAR))
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    canvas = np.full((size, size, 3), PAD_VALUE, dtype=np.uint8)
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    canvas[top:top + new_h, left:left + new_w] = resized
+    return canvas, scale, (left, top)
+
+
+def to_blob(images):
+    """List of letterboxed HxWx3 uint8 arrays -> NCHW float32 in [0, 1]"""
+    return np.ascontiguousarray(np.stack(images).transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+
+
+def nms(boxes, scores, iou_threshold):
+    """Indices kept by greedy non-maximum suppression, best first"""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(x1[i], x1[order[1:]])
+        yy1 = np.maximum(y1[i], y1[order[1:]])
+        xx2 = np.minimum(x2[i], x2[order[1:]])
+        yy2 = np.minimum(y2[i], y2[order[1:]])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(output, conf, names, scale, pad, shape):
+    """One (4 + classes, anchors) YOLOv8 head output -> detection dicts"""
+    preds = output.T
+    class_scores = preds[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(preds)), class_ids]
+    mask = scores > conf
+    if not mask.any():
+        return []
+    preds, class_ids, scores = preds[mask], class_ids[mask], scores[mask]
+
+    cx, cy, w, h = preds[:, 0], preds[:, 1], preds[:, 2], preds[:, 3]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+    # Per-class NMS in one pass by pushing each class into its own coordinate range
+    offsets = class_ids[:, None].astype(np.float32) * 7680.0
+    keep = nms(boxes + offsets, scores, NMS_IOU)[:MAX_DETECTIONS]
+
+    boxes = boxes[keep]
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / scale
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / scale
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, shape[0])
+
+    return [{
+        "conf": float(scores[k]),
+        "box": [float(v) for v in box],
+        "class": names.get(int(class_ids[k]), "unknown")
+    } for k, box in zip(keep, boxes)]
+
+
+# ---- backends ----
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, weights, conf, threads=None, int8=False):
+        if int8:
+            raise ValueError("INT8 quantization is only supported for the openvino backend")
+        from ultralytics import YOLO
+        import torch
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = YOLO(weights)
+        self.conf = conf
+
+    def predict_batch(self, images):
+        # ultralytics reads bare arrays as BGR; ours are RGB, so hand them over as PIL
+        images = [Image.fromarray(i) if isinstance(i, np.ndarray) else i for i in images]
+        results = self.model(images, conf=self.conf, verbose=False)
+        return [self._detections(result) for result in results]
+
+    @staticmethod
+    def _detections(result):
+        detections = []
+        for box in result.boxes:
+            # Filter for objects that might be potholes (adjust classes as needed)
+            detections.append({
+                "conf": float(box.conf[0]),
+                "box": [float(x) for x in box.xyxy[0].tolist()],
+                "class": result.names[int(box.cls[0])] if hasattr(box, 'cls') else "unknown"
+            })
+        return detections
+
+
+class ExportedBackend:
+    """Shared letterbox -> run -> NMS pipeline; subclasses supply _run(blob)"""
+
+    fmt = None
+
+    def __init__(self, weights, conf, threads=None, int8=False):
+        path, self.names = export_model(weights, self.fmt, int8=int8)
+        self.conf = conf
+        self._load(path, threads)
+
+    def predict_batch(self, images):
+        arrays = [load_rgb(item) for item in images]
+        boxed = [letterbox(image) for image in arrays]
+        outputs = self._run(to_blob([b[0] for b in boxed]))
+        return [
+            postprocess(output, self.conf, self.names, scale, pad, image.shape)
+            for output, (_, scale, pad), image in zip(outputs, boxed, arrays)
+        ]
+
+
+class OnnxBackend(ExportedBackend):
+    name = fmt = "onnx"
+
+    def _load(self, path, threads):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoBackend(ExportedBackend):
+    name = fmt = "openvino"
+
+    def _load(self, path, threads):
+        import openvino as ov
+
+        xml = next(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".xml"))
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.model = ov.Core().compile_model(xml, "CPU", config)
+
+    def _run(self, blob):
+        return self.model(blob)[0]
+
+
+BACKEND_CLASSES = {"torch": TorchBackend, "onnx": OnnxBackend, "openvino": OpenVinoBackend}
+
+
+def model_version(name, weights, int8=False):
+    """Identifies the weights and runtime; changes whenever outputs may change"""
+    digest = hashlib.sha256()
+    try:
+        with open(weights, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        weights_id = digest.hexdigest()[:16]
+    except FileNotFoundError:
+        weights_id = os.path.basename(weights)
+    return f"{name}{'-int8' if int8 else ''}-{IMG_SIZE}:{weights_id}"
+
+
+def load_backend(name, weights, conf, threads=None, int8=False):
+    """Instantiate a backend by name, raising ValueError for unknown names"""
+    if name not in BACKEND_CLASSES:
+        raise ValueError(f"inference backend must be one of {', '.join(BACKENDS)}")
+    backend = BACKEND_CLASSES[name](weights, conf, threads=threads, int8=int8)
+    # After construction: the torch backend may have just downloaded the weights
+    backend.version = model_version(name, weights, int8)
+    return backend
+
+
+# ---- parity check ----
+def box_iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare_detections(reference, candidate, min_iou):
+    """Greedy same-class matching; returns (matched, missing, extra, max_conf_diff, min_iou)"""
+    unmatched = list(candidate)
+    matched, worst_iou, conf_diff = 0, 1.0, 0.0
+    for ref in sorted(reference, key=lambda d: -d["conf"]):
+        best, best_iou = None, min_iou
+        for cand in unmatched:
+            if cand["class"] != ref["class"]:
+                continue
+            iou = box_iou(ref["box"], cand["box"])
+            if iou >= best_iou:
+                best, best_iou = cand, iou
+        if best is None:
+            continue
+        unmatched.remove(best)
+        matched += 1
+        worst_iou = min(worst_iou, best_iou)
+        conf_diff = max(conf_diff, abs(ref["conf"] - best["conf"]))
+    return matched, len(reference) - matched, len(unmatched), conf_diff, worst_iou
+
+
+def parity_report(backends, images, min_iou=0.9, batch=8, repeat=3):
+    """Run every backend over `images` and compare each against the first
+
+    Returns {name: {...timing and match statistics...}}.
+    """
+    report = {}
+    reference = None
+    for backend in backends:
+        outputs = []
+        for start in range(0, len(images), batch):
+            outputs.extend(backend.predict_batch(images[start:start + batch]))
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for start in range(0, len(images), batch):
+                backend.predict_batch(images[start:start + batch])
+        elapsed = (time.perf_counter() - started) / repeat
+
+        entry = {"ms_per_image": round(elapsed * 1000 / max(1, len(images)), 2),
+                 "detections": sum(len(o) for o in outputs)}
+        if reference is None:
+            reference = outputs
+        else:
+            totals = [compare_detections(r, c, min_iou) for r, c in zip(reference, outputs)]
+            entry.update(
+                matched=sum(t[0] for t in totals),
+                missing=sum(t[1] for t in totals),
+                extra=sum(t[2] for t in totals),
+                max_conf_diff=round(max((t[3] for t in totals), default=0.0), 4),
+                min_iou=round(min((t[4] for t in totals), default=1.0), 4),
+            )
+            entry["speedup"] = round(report[backends[0].name]["ms_per_image"] / entry["ms_per_image"], 2) \
+                if entry["ms_per_image"] else None
+        report[backend.name] = entry
+    return report
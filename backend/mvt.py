@@ -0,0 +1,110 @@
+"""
+Minimal Mapbox Vector Tile (v2.1) encoder for point layers
+
+Only what the pothole tiles need: point geometries plus string, number
+and boolean attributes, written straight to protobuf without a schema
+compiler. Spec: https://github.com/mapbox/vector-tile-spec/tree/master/2.1
+"""
+
+import struct
+
+EXTENT = 4096
+
+# protobuf wire types
+VARINT = 0
+FIXED64 = 1
+LENGTH = 2
+
+POINT = 1
+MOVE_TO = 1
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _length_delimited(field, payload):
+    return _key(field, LENGTH) + _varint(len(payload)) + payload
+
+
+def _packed(field, values):
+    return _length_delimited(field, b"".join(_varint(v) for v in values))
+
+
+def _encode_value(value):
+    if isinstance(value, bool):
+        return _key(7, VARINT) + _varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _key(5, VARINT) + _varint(value)
+        return _key(6, VARINT) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, FIXED64) + struct.pack("<d", value)
+    return _length_delimited(1, str(value).encode("utf-8"))
+
+
+class PointLayer:
+    """Accumulates point features for one layer, interning keys and values"""
+
+    def __init__(self, name, extent=EXTENT):
+        self.name = name
+        self.extent = extent
+        self.features = []
+        self.keys = {}
+        self.values = {}
+
+    def _index(self, table, item):
+        if item not in table:
+            table[item] = len(table)
+        return table[item]
+
+    def add(self, x, y, properties, feature_id=None):
+        """Add a point at tile-space (x, y) in [0, extent)"""
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            tags.append(self._index(self.keys, key))
+            # type-qualified so True / 1 / 1.0 / "1" stay distinct values
+            tags.append(self._index(self.values, (type(value).__name__, value)))
+
+        feature = b""
+        if feature_id is not None:
+            feature += _key(1, VARINT) + _varint(feature_id)
+        feature += _packed(2, tags)
+        feature += _key(3, VARINT) + _varint(POINT)
+        feature += _packed(4, [(1 << 3) | MOVE_TO, _zigzag(int(x)), _zigzag(int(y))])
+        self.features.append(feature)
+
+    def encode(self):
+        out = _key(15, VARINT) + _varint(2)
+        out += _length_delimited(1, self.name.encode("utf-8"))
+        for feature in self.features:
+            out += _length_delimited(2, feature)
+        for key in self.keys:
+            out += _length_delimited(3, key.encode("utf-8"))
+        for _, value in self.values:
+            out += _length_delimited(4, _encode_value(value))
+        out += _key(5, VARINT) + _varint(self.extent)
+        return out
+
+
+def encode_tile(layers):
+    """Serialize PointLayer objects into one tile; empty layers are skipped"""
+    return b"".join(_length_delimited(3, layer.encode()) for layer in layers if layer.features)
@@ -0,0 +1,194 @@
+"""
+In-process cache of read-endpoint results
+
+Entries are keyed on the endpoint and its normalized parameters and hold
+encoded response bodies, so a hit skips both SQLite and serialization.
+Memory is bounded by the total size of those bodies (and an entry count);
+every entry has a TTL, and the least recently used ones are evicted first.
+
+Write handlers drop what they affect by tag ("reports", "votes",
+"comments", "users"). Writes made by other processes (the dashboard's
+retention sweep, manage.py commands) never reach those tags, so the cache
+also follows the shared data version (data_version.py): a version that
+did not come from one of its own record_write() calls clears everything.
+
+Concurrent misses on one key are coalesced: the first request computes
+and the others wait for its result (or its exception), so a burst of
+identical requests costs one query. A computation that overlaps an
+invalidation of its tags is returned to its callers but not stored, and
+requests arriving after the invalidation do not wait on it.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ("value", "tags", "expires")
+
+    def __init__(self, value, tags, expires):
+        self.value = value
+        self.tags = tags
+        self.expires = expires
+
+
+class _Fill:
+    """A computation in flight; other requests for its key wait on `done`"""
+
+    __slots__ = ("done", "value", "error", "generations")
+
+    def __init__(self, generations):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.generations = generations
+
+
+def _parse_version(token):
+    epoch, _, counter = token.rpartition("-")
+    return epoch, int(counter)
+
+
+class QueryCache:
+    """TTL + LRU cache of bytes values with tag invalidation and miss coalescing"""
+
+    def __init__(self, max_bytes, max_entries=10000, ttl=60, data_version=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.data_version = data_version
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._fills = {}
+        self._bytes = 0
+        self._generation = 0  # bumped by clear()
+        self._tag_generations = {}
+        self._version = data_version.read()[0] if data_version else None
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "expired": 0, "evicted": 0,
+                       "invalidated": 0, "cleared": 0, "not_stored": 0}
+
+    def get(self, key, compute, tags=(), ttl=None):
+        """Cached bytes for `key`, or compute() stored under `tags` for `ttl` seconds"""
+        self._sync()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry.value
+                self._remove(key)
+                self._stats["expired"] += 1
+
+            generations = self._snapshot(tags)
+            fill = self._fills.get(key)
+            owner = fill is None or fill.generations != generations
+            if owner:
+                fill = self._fills[key] = _Fill(generations)
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not owner:
+            fill.done.wait()
+            if fill.error is not None:
+                raise fill.error
+            return fill.value
+
+        try:
+            fill.value = compute()
+        except Exception as e:
+            fill.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._fills.get(key) is fill:
+                    del self._fills[key]
+                if fill.error is None:
+                    if self._snapshot(tags) == generations and len(fill.value) <= self.max_bytes:
+                        self._store(key, fill.value, tags, ttl or self.ttl)
+                    else:
+                        self._stats["not_stored"] += 1
+            fill.done.set()
+        return fill.value
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying one of `tags`"""
+        with self._lock:
+            for tag in tags:
+                self._tag_generations[tag] = self._tag_generations.get(tag, 0) + 1
+            stale = [key for key, entry in self._entries.items() if not entry.tags.isdisjoint(tags)]
+            for key in stale:
+                self._remove(key)
+            self._stats["invalidated"] += len(stale)
+
+    def record_write(self, tags, bump):
+        """After a commit: drop `tags`, then bump the data version and accept it as our own
+
+        Invalidating before the bump means a request that sees the new
+        version can never be answered from an entry older than the write.
+        """
+        self.invalidate(*tags)
+        token = bump()
+        with self._lock:
+            if self._version is None:
+                return
+            epoch, counter = _parse_version(token)
+            known_epoch, known = _parse_version(self._version)
+            if epoch == known_epoch and counter <= known:
+                return  # a lookup already synced past it
+            if epoch != known_epoch or counter != known + 1:
+                self._clear()  # other processes wrote in between
+            self._version = token
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = round((stats["hits"] + stats["coalesced"]) / lookups, 3) if lookups else 0
+        stats["max_bytes"] = self.max_bytes
+        stats["ttl_s"] = self.ttl
+        return stats
+
+    # ---- internals (lock held unless noted) ----
+    def _sync(self):
+        """Clear on a data version written by another process (lock not held)"""
+        if self.data_version is None:
+            return
+        token = self.data_version.read()[0]
+        if token == self._version:
+            return
+        with self._lock:
+            epoch, counter = _parse_version(token)
+            known_epoch, known = _parse_version(self._version)
+            if epoch != known_epoch or counter > known:
+                self._clear()
+                self._version = token
+
+    def _snapshot(self, tags):
+        return self._generation, tuple(self._tag_generations.get(tag, 0) for tag in tags)
+
+    def _store(self, key, value, tags, ttl):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(value, frozenset(tags), time.monotonic() + ttl)
+        self._bytes += len(value)
+        while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self._stats["evicted"] += 1
+
+    def _remove(self, key):
+        self._bytes -= len(self._entries.pop(key).value)
+
+    def _clear(self):
+        self._generation += 1
+        self._stats["cleared"] += 1
+        self._entries.clear()
+        self._bytes = 0
@@ -0,0 +1,137 @@
+"""
+EXPLAIN QUERY PLAN audit for every SQL statement in the backend
+
+Static queries are collected from string literals in the backend modules;
+queries assembled at runtime are enumerated by dynamic_queries() through
+their builder functions. A statement fails the audit when its plan scans a
+table without an index, or walks a whole index without a LIMIT.
+Intentional full scans (exports, maintenance) carry a `-- full-scan-ok`
+marker in the SQL itself. Queries listed in REQUIRED_INDEXES must also
+use the named index, so a predicate drifting from its index is caught.
+"""
+
+import os
+import re
+import ast
+import sqlite3
+import itertools
+
+from migrations import run_migrations
+from report_queries import build_reports_query
+from exports import EXPORT_TABLES, build_export_query
+from retention import RETENTION_TABLES, batch_sql
+from stats_rollup import counters_sql
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+FULL_SCAN_OK = "-- full-scan-ok"
+SQL_START = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|REPLACE)\s+\S")  # backend SQL keywords are upper case; docstrings are not
+SKIP_MODULES = {"query_plans.py", "migrations.py"}
+
+# location -> index its plan must use
+REQUIRED_INDEXES = {
+    "retention.batch_sql[reports]:select": "idx_reports_last_active",
+}
+
+
+def static_queries(backend_dir=BACKEND_DIR):
+    """Yield (location, sql) for every SQL string literal in the backend"""
+    for name in sorted(os.listdir(backend_dir)):
+        if not name.endswith(".py") or name in SKIP_MODULES:
+            continue
+        path = os.path.join(backend_dir, name)
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=name)
+        # f-string fragments are not complete statements; those come from dynamic_queries()
+        fragments = {id(part) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr)
+                     for part in node.values}
+        for node in ast.walk(tree):
+            if (isinstance(node, ast.Constant) and isinstance(node.value, str)
+                    and id(node) not in fragments and SQL_START.match(node.value)):
+                yield f"{name}:{node.lineno}", node.value
+
+
+def dynamic_queries():
+    """Yield (location, sql) for each filter combination of runtime-built queries"""
+    spatial_options = {
+        "none": None,
+        "bbox": {"bbox": (-1.0, 51.0, 1.0, 52.0)},
+        "radius": {"bbox": (-1.0, 51.0, 1.0, 52.0), "center": (51.5, 0.0), "radius": 500.0},
+    }
+    for (spatial_name, spatial), severity, verified, after in itertools.product(
+            spatial_options.items(), (None, "high"), (None, True), (None, ["2030-01-01", 1])):
+        page_sql, _, count_sql, _ = build_reports_query(spatial, severity, verified, after)
+        label = f"build_reports_query[{spatial_name},severity={severity},verified={verified},after={bool(after)}]"
+        yield label, page_sql
+        if not after:
+            yield label + ":count", count_sql
+
+    yield "counters_sql[3]", counters_sql(3)
+
+    for table, bbox, since, until in itertools.product(
+            EXPORT_TABLES, (None, (-1.0, 51.0, 1.0, 52.0)), (None, "2030-01-01"), (None, "2030-02-01")):
+        sql, _ = build_export_query(table, since, until, bbox)
+        yield f"build_export_query[{table},bbox={bool(bbox)},since={bool(since)},until={bool(until)}]", sql
+
+    for table in RETENTION_TABLES:
+        select_sql, delete_sql = batch_sql(table)
+        yield f"retention.batch_sql[{table}]:select", select_sql
+        yield f"retention.batch_sql[{table}]:delete", delete_sql
+
+
+def explain(conn, sql):
+    placeholders = sql.count("?")
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, [None] * placeholders)]
+
+
+def full_scans(plan, sql):
+    """Return the plan lines that amount to a full table or index scan"""
+    derived = {line.split(" ", 1)[1] for line in plan
+               if line.startswith(("MATERIALIZE ", "CO-ROUTINE "))}
+    limited = re.search(r"\bLIMIT\b", sql, re.IGNORECASE) is not None
+    bad = []
+    for line in plan:
+        if not line.startswith("SCAN "):
+            continue
+        target = line[5:].split(" ", 1)[0]
+        if "VIRTUAL TABLE" in line or target.startswith("(") or target in derived or line == "SCAN CONSTANT ROW":
+            continue
+        if " USING " in line and limited:
+            continue  # ordered index walk that stops at LIMIT
+        bad.append(line)
+    return bad
+
+
+def schema_only_db():
+    """Fresh in-memory database at the current schema version
+
+    Plans are checked without sqlite_stat1 data so the result depends on the
+    indexes alone, not on how many rows a particular database happens to hold.
+    """
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    run_migrations(conn)
+    return conn
+
+
+def check_query_plans(conn=None):
+    """Return a list of (location, sql, offending plan lines)"""
+    conn = conn or schema_only_db()
+    failures = []
+    seen = set()
+    for location, sql in itertools.chain(static_queries(), dynamic_queries()):
+        seen.add(location)
+        if FULL_SCAN_OK in sql:
+            continue
+        try:
+            plan = explain(conn, sql)
+            bad = full_scans(plan, sql)
+        except sqlite3.Error as e:
+            plan, bad = [], [f"cannot explain: {e}"]
+        index = REQUIRED_INDEXES.get(location)
+        if index and plan and not any(f"INDEX {index} " in f"{line} " for line in plan):
+            bad.append(f"does not use {index}: {' | '.join(plan)}")
+        if bad:
+            failures.append((location, " ".join(sql.split()), bad))
+    for location in REQUIRED_INDEXES.keys() - seen:
+        failures.append((location, "", ["query not found; update REQUIRED_INDEXES"]))
+    return failures
@@ -0,0 +1,70 @@
+"""
+SQL builders for the dynamic /api/reports query
+
+Kept apart from the Flask handler so the query-plan check can build
+every filter combination without importing the web app.
+"""
+
+import math
+
+from geo import METERS_PER_DEG_LAT
+
+
+def build_reports_query(spatial=None, severity=None, verified=None, after=None):
+    """Return (page_sql, page_params, count_sql, count_params)
+
+    page_sql still expects LIMIT and OFFSET parameters appended.
+    """
+    from_clause = "FROM reports r"
+    params = []
+    where_clauses = []
+
+    if spatial:
+        min_lon, min_lat, max_lon, max_lat = spatial['bbox']
+        from_clause = "FROM reports_rtree g JOIN reports r ON r.id = g.id"
+        # The rtree stores 32-bit floats, so re-check the exact coordinates too
+        where_clauses.append(
+            "g.min_lon <= ? AND g.max_lon >= ? AND g.min_lat <= ? AND g.max_lat >= ?"
+            " AND r.lon BETWEEN ? AND ? AND r.lat BETWEEN ? AND ?"
+        )
+        params.extend([max_lon, min_lon, max_lat, min_lat, min_lon, max_lon, min_lat, max_lat])
+
+        if 'radius' in spatial:
+            # Equirectangular distance is accurate to well under 1% at city scale
+            lat, lon = spatial['center']
+            radius = spatial['radius']
+            kx = METERS_PER_DEG_LAT * math.cos(math.radians(lat))
+            where_clauses.append(
+                "((r.lat - ?) * ?) * ((r.lat - ?) * ?) + ((r.lon - ?) * ?) * ((r.lon - ?) * ?) <= ?"
+            )
+            params.extend([lat, METERS_PER_DEG_LAT, lat, METERS_PER_DEG_LAT,
+                           lon, kx, lon, kx, radius * radius])
+
+    if severity:
+        where_clauses.append("r.severity = ?")
+        params.append(severity)
+    if verified is not None:
+        where_clauses.append("r.verified = ?")
+        params.append(verified)
+
+    where_sql = (" WHERE " + " AND ".join(where_clauses)) if where_clauses else ""
+
+    # Keyset mode: seek past the last (created_at, id) seen instead of OFFSET
+    page_sql = where_sql
+    page_params = list(params)
+    if after:
+        page_sql = (where_sql + " AND " if where_sql else " WHERE ") + "(r.created_at, r.id) < (?, ?)"
+        page_params.extend(after)
+
+    query = f"""
+        SELECT r.*, u.username
+        {from_clause}
+        JOIN users u ON r.user_id = u.id
+        {page_sql}
+        ORDER BY r.created_at DESC, r.id DESC LIMIT ? OFFSET ?
+    """
+    count_query = f"SELECT COUNT(*) as total {from_clause}{where_sql}"
+    if not where_clauses:
+        count_query += " -- full-scan-ok: unfiltered total, skipped in cursor mode"
+
+    return query, page_params, count_query, params
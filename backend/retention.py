@@ -0,0 +1,256 @@
+"""
+Data retention: archive then delete old rows in small batches
+
+A sweep walks analysis jobs, votes, comments and reports older than the
+cutoff in age order. Reports age from their last confirmation (see
+dedup), so a pothole that is still being reported is never archived. Each batch is its own short BEGIN IMMEDIATE
+transaction: the rows are appended to a gzipped JSONL archive partitioned
+by table and day (<archive>/<table>/<YYYY-MM-DD>.jsonl.gz), the archive is
+fsynced, and only then are the rows deleted. Batches are separated by a
+pause so API writers never wait long for the lock. Archives are written
+at-least-once (a crash between fsync and commit repeats a batch), and
+restore_archive() ignores rows that already exist.
+
+Afterwards unreferenced uploads are garbage collected (see blob_store) and
+free pages are handed back to the filesystem with incremental vacuum,
+also in steps.
+"""
+
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from blob_store import collect_garbage
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive")
+RETENTION_DAYS = 30
+BATCH_SIZE = 500
+BATCH_PAUSE = 0.05  # seconds between batches
+VACUUM_STEP_PAGES = 2000
+
+# Child tables first; each table is filtered by its own age expression
+RETENTION_TABLES = ("analysis_jobs", "votes", "comments", "reports")
+# Same liveness test as find_duplicate(); backed by idx_reports_last_active
+AGE_EXPRESSIONS = {"reports": "COALESCE(last_confirmed_at, created_at)"}
+TABLE_KEYS = {
+    "analysis_jobs": ("id",),
+    "votes": ("user_id", "report_id"),
+    "comments": ("id",),
+    "reports": ("id",),
+}
+
+
+def cutoff_for(days, now=None):
+    """SQLite-format UTC timestamp `days` before now"""
+    now = now or datetime.utcnow()
+    return (now - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def archive_path(archive_dir, table, created_at):
+    return os.path.join(archive_dir, table, f"{created_at[:10]}.jsonl.gz")
+
+
+def _append_archive(archive_dir, table, rows):
+    """Append rows to their day partitions and fsync; gzip members concatenate"""
+    partitions = {}
+    for row in rows:
+        partitions.setdefault(archive_path(archive_dir, table, row["created_at"] or "unknown"), []).append(row)
+
+    for path, items in partitions.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+                gz.write("".join(json.dumps(dict(r), separators=(",", ":")) + "\n" for r in items).encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def batch_sql(table):
+    """(select_sql, delete_sql) for one retention batch of `table`"""
+    where = " AND ".join(f"{k} = ?" for k in TABLE_KEYS[table])
+    age = AGE_EXPRESSIONS.get(table, "created_at")
+    return (
+        f"SELECT * FROM {table} WHERE {age} < ? ORDER BY {age} LIMIT ?",
+        f"DELETE FROM {table} WHERE {where}",
+    )
+
+
+def sweep_batch(conn, table, cutoff, archive_dir, batch_size=BATCH_SIZE):
+    """Archive and delete up to batch_size rows of `table`; returns rows removed"""
+    select_sql, delete_sql = batch_sql(table)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(select_sql, (cutoff, batch_size)).fetchall()
+        if rows:
+            if archive_dir:
+                _append_archive(archive_dir, table, rows)
+            conn.executemany(delete_sql, [tuple(row[k] for k in TABLE_KEYS[table]) for row in rows])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+def incremental_vacuum(conn, step_pages=VACUUM_STEP_PAGES, pause=BATCH_PAUSE):
+    """Release free pages in steps; returns pages freed (0 if not enabled)"""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        logger.info("🧹 auto_vacuum is not INCREMENTAL; run `manage.py enable-incremental-vacuum` once")
+        return 0
+
+    freed = 0
+    while True:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free:
+            return freed
+        # execute() steps this pragma once, freeing one page; executescript runs it to completion
+        conn.executescript(f"PRAGMA incremental_vacuum({int(min(free, step_pages))})")
+        freed += free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        time.sleep(pause)
+
+
+def run_retention(conn, days=RETENTION_DAYS, archive_dir=None, batch_size=BATCH_SIZE,
+                  pause=BATCH_PAUSE, progress=None, on_reports_deleted=None, blob_store=None,
+                  data_version=None):
+    """Run one full sweep; `progress` receives the running totals dict
+
+    With a blob_store, uploads no report references any more are garbage
+    collected afterwards. A data_version is bumped if anything was deleted.
+    """
+    totals = {"cutoff": cutoff_for(days), "deleted": {t: 0 for t in RETENTION_TABLES}, "vacuumed_pages": 0}
+
+    for table in RETENTION_TABLES:
+        while True:
+            removed = sweep_batch(conn, table, totals["cutoff"], archive_dir, batch_size)
+            totals["deleted"][table] += removed
+            if progress:
+                progress(totals)
+            if removed < batch_size:
+                break
+            time.sleep(pause)
+
+    # Bump first: a tile render in the API that overlaps the sweep then
+    # sees the new version and does not store what it read
+    if any(totals["deleted"].values()) and data_version:
+        data_version.bump()
+    if totals["deleted"]["reports"] and on_reports_deleted:
+        on_reports_deleted()
+
+    if blob_store:
+        totals["blobs_removed"], totals["blob_bytes_freed"] = collect_garbage(conn, blob_store)
+
+    totals["vacuumed_pages"] = incremental_vacuum(conn, pause=pause)
+    logger.info(f"🗑️ Retention sweep before {totals['cutoff']} removed {totals['deleted']}, "
+                f"vacuumed {totals['vacuumed_pages']} pages")
+    return totals
+
+
+class RetentionWorker:
+    """Runs sweeps on a background thread, one at a time"""
+
+    def __init__(self, connect, archive_dir, on_reports_deleted=None, blob_store=None, data_version=None):
+        self.connect = connect
+        self.archive_dir = archive_dir
+        self.on_reports_deleted = on_reports_deleted
+        self.blob_store = blob_store
+        self.data_version = data_version
+        self._lock = threading.Lock()
+        self._thread = None
+        self._status = {"state": "idle"}
+
+    def status(self):
+        with self._lock:
+            return json.loads(json.dumps(self._status))
+
+    def start(self, days=RETENTION_DAYS):
+        """Start a sweep; returns False if one is already running"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return False
+            self._status = {
+                "state": "running",
+                "days": days,
+                "started_at": datetime.utcnow().isoformat(),
+                "archive_dir": self.archive_dir,
+            }
+            self._thread = threading.Thread(target=self._run, args=(days,), name="retention", daemon=True)
+            self._thread.start()
+        return True
+
+    def _progress(self, totals):
+        with self._lock:
+            self._status.update(totals)
+
+    def _run(self, days):
+        conn = self.connect()
+        try:
+            totals = run_retention(conn, days, self.archive_dir, progress=self._progress,
+                                   on_reports_deleted=self.on_reports_deleted, blob_store=self.blob_store,
+                                   data_version=self.data_version)
+            state = {"state": "done", **totals}
+        except Exception as e:
+            logger.error(f"❌ Retention sweep failed: {e}")
+            state = {"state": "failed", "error": str(e)}
+        finally:
+            conn.close()
+        with self._lock:
+            self._status.update(state, finished_at=datetime.utcnow().isoformat())
+
+
+# ---- restore ----
+def iter_archive(path):
+    """Yield row dicts from an archive file (all gzip members)"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def archive_files(path):
+    """Archive files under `path` (a file, a table dir or the archive root)"""
+    if os.path.isfile(path):
+        return [path]
+    found = []
+    for root, _, files in os.walk(path):
+        found.extend(os.path.join(root, f) for f in files if f.endswith(".jsonl.gz"))
+    # Parents before children so restored comments and votes find their report
+    order = {t: i for i, t in enumerate(reversed(RETENTION_TABLES))}
+    return sorted(found, key=lambda p: (order.get(os.path.basename(os.path.dirname(p)), 99), p))
+
+
+def restore_archive(conn, path, batch_size=BATCH_SIZE):
+    """Re-import archived rows; existing rows are left alone. Returns {table: inserted}"""
+    restored = {}
+    for file in archive_files(path):
+        table = os.path.basename(os.path.dirname(file))
+        if table not in TABLE_KEYS:
+            continue
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        batch = []
+
+        def flush():
+            if not batch:
+                return
+            names = [c for c in columns if c in batch[0]]
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.executemany(
+                f"INSERT OR IGNORE INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                [[item.get(c) for c in names] for item in batch]
+            )
+            conn.commit()
+            # rowcount leaves out trigger writes, unlike total_changes
+            restored[table] = restored.get(table, 0) + cursor.rowcount
+            batch.clear()
+
+        for item in iter_archive(file):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    return restored
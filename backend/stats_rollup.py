@@ -0,0 +1,86 @@
+"""
+Statistics rollups behind /api/stats and the dashboard
+
+stats_counters holds running totals (rows per table, reports per severity,
+AI confidence sum/count) and stats_daily holds per-day counts by kind and
+severity. Triggers on the base tables keep both current on every write path
+(see migrations.m005_stats_rollups), so readers only do primary-key lookups.
+Days are UTC, matching the datetime('now') defaults on created_at.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_PREFIX = "severity:"
+
+
+def counters_sql(count):
+    return f"SELECT name, value FROM stats_counters WHERE name IN ({','.join('?' * count)})"
+
+
+def read_counters(conn, names):
+    """Return {name: value} for the requested counters (missing ones are 0)"""
+    rows = conn.execute(counters_sql(len(names)), list(names)).fetchall()
+    values = {name: 0 for name in names}
+    values.update({row['name']: row['value'] for row in rows})
+    return values
+
+
+def severity_counts(conn):
+    rows = conn.execute(
+        "SELECT name, value FROM stats_counters WHERE name >= ? AND name < ?",
+        (SEVERITY_PREFIX, SEVERITY_PREFIX[:-1] + ";")
+    ).fetchall()
+    return {row['name'][len(SEVERITY_PREFIX):]: int(row['value']) for row in rows if row['value']}
+
+
+def last_days(days):
+    """UTC day labels for the last `days` days, oldest first"""
+    today = datetime.utcnow().date()
+    return [(today - timedelta(days=days - 1 - i)).strftime('%Y-%m-%d') for i in range(days)]
+
+
+def daily_counts(conn, kind, days):
+    """Return [(day, count)] for the last `days` UTC days, oldest first"""
+    labels = last_days(days)
+    rows = conn.execute("""
+        SELECT day, SUM(count) AS count
+        FROM stats_daily
+        WHERE day >= ? AND kind = ?
+        GROUP BY day
+    """, (labels[0], kind)).fetchall()
+    by_day = {row['day']: row['count'] for row in rows}
+    return [(day, by_day.get(day, 0)) for day in labels]
+
+
+def rebuild_rollups(conn):
+    """Recompute every rollup from the base tables; the caller commits"""
+    conn.execute("DELETE FROM stats_daily -- full-scan-ok: rebuild")
+    conn.execute("DELETE FROM stats_counters -- full-scan-ok: rebuild")
+
+    conn.execute("""
+        INSERT INTO stats_daily (day, kind, severity, count)
+        SELECT substr(created_at, 1, 10), 'reports', severity, COUNT(*)
+        FROM reports GROUP BY 1, 3 -- full-scan-ok: rebuild
+    """)
+    for kind in ("users", "comments"):
+        conn.execute(f"""
+            INSERT INTO stats_daily (day, kind, severity, count)
+            SELECT substr(created_at, 1, 10), '{kind}', '', COUNT(*)
+            FROM {kind} GROUP BY 1
+        """)
+
+    conn.execute("""
+        INSERT INTO stats_counters (name, value)
+        SELECT 'reports', COUNT(*) FROM reports
+        UNION ALL SELECT 'users', COUNT(*) FROM users
+        UNION ALL SELECT 'comments', COUNT(*) FROM comments
+        UNION ALL SELECT 'votes', COUNT(*) FROM votes
+        UNION ALL SELECT 'ai_conf_sum', COALESCE(SUM(ai_conf), 0) FROM reports
+        UNION ALL SELECT 'ai_conf_count', COUNT(ai_conf) FROM reports
+        UNION ALL SELECT 'severity:' || severity, COUNT(*) FROM reports GROUP BY severity
+        -- full-scan-ok: rebuild
+    """)
+    logger.info("📈 Statistics rollups rebuilt")
@@ -0,0 +1,215 @@
+"""
+Vector tiles of reports with an on-disk tile cache
+
+Tiles use the usual Web Mercator z/x/y scheme. From CLUSTER_TILE_ZOOM up a
+tile carries every report in it (layer "reports"); below that it carries
+the report_grid clusters of the same zoom (layer "clusters"), which keeps
+low-zoom tiles small however many reports exist.
+
+Rendered tiles are written to TileCache and served from disk until a
+write touches them: a new report or vote invalidates only the tiles that
+contain that point (or, for cluster tiles, its grid cell), and bulk
+deletes drop the whole cache. Other processes (the dashboard's retention
+sweep, manage.py) bump the shared data version before clearing tiles, so
+a render that overlaps their write is served but never stored.
+"""
+
+import os
+import math
+import shutil
+import logging
+import threading
+
+from clusters import cell_bbox, cell_of, query_clusters
+from mvt import EXTENT, PointLayer, encode_tile
+
+logger = logging.getLogger(__name__)
+
+MAX_TILE_ZOOM = 20
+CLUSTER_TILE_ZOOM = 13
+TILE_BUFFER = 64  # tile-space units rendered beyond each edge
+MAX_TILE_FEATURES = 20000
+MAX_LAT = 85.0511287798
+
+
+# ---- projection ----
+def lonlat_to_world(lat, lon, zoom):
+    """Fractional tile coordinates of a point at `zoom`"""
+    n = 1 << zoom
+    lat = max(-MAX_LAT, min(MAX_LAT, lat))
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    return x, y
+
+
+def tile_lonlat(x, y, zoom):
+    """North-west corner of a tile (fractional x/y allowed)"""
+    n = 1 << zoom
+    lon = x / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lat, lon
+
+
+def tile_bbox(zoom, x, y, buffer=0.0):
+    """(min_lon, min_lat, max_lon, max_lat) of a tile grown by `buffer` tiles"""
+    north, west = tile_lonlat(x - buffer, y - buffer, zoom)
+    south, east = tile_lonlat(x + 1 + buffer, y + 1 + buffer, zoom)
+    return max(-180.0, west), max(-90.0, south), min(180.0, east), min(90.0, north)
+
+
+def valid_tile(zoom, x, y):
+    return 0 <= zoom <= MAX_TILE_ZOOM and 0 <= x < (1 << zoom) and 0 <= y < (1 << zoom)
+
+
+def tiles_for_point(lat, lon, min_zoom=0, max_zoom=MAX_TILE_ZOOM):
+    """Every (z, x, y) tile, buffer included, that renders a point at (lat, lon)"""
+    margin = TILE_BUFFER / EXTENT
+    tiles = set()
+    for zoom in range(min_zoom, max_zoom + 1):
+        n = 1 << zoom
+        fx, fy = lonlat_to_world(lat, lon, zoom)
+        for x in {int(fx - margin), int(fx), int(fx + margin)}:
+            for y in {int(fy - margin), int(fy), int(fy + margin)}:
+                if 0 <= x < n and 0 <= y < n:
+                    tiles.add((zoom, x, y))
+    return tiles
+
+
+def tiles_for_bbox(bbox, zoom):
+    """Every tile at `zoom` whose buffered area overlaps bbox"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    margin = TILE_BUFFER / EXTENT
+    n = 1 << zoom
+    x0, y0 = lonlat_to_world(max_lat, min_lon, zoom)
+    x1, y1 = lonlat_to_world(min_lat, max_lon, zoom)
+    return {(zoom, x, y)
+            for x in range(max(0, math.floor(x0 - margin)), min(n - 1, math.floor(x1 + margin)) + 1)
+            for y in range(max(0, math.floor(y0 - margin)), min(n - 1, math.floor(y1 + margin)) + 1)}
+
+
+def tiles_for_report(lat, lon, min_zoom=0):
+    """Every tile a new or changed report at (lat, lon) can alter
+
+    From CLUSTER_TILE_ZOOM up that is the tiles around the point. Below it
+    the report moves its grid cell's centroid anywhere inside the cell,
+    and cells are equirectangular, so one can straddle Mercator tile rows:
+    every tile overlapping the cell is affected.
+    """
+    tiles = tiles_for_point(lat, lon, min_zoom=max(min_zoom, CLUSTER_TILE_ZOOM))
+    for zoom in range(min_zoom, CLUSTER_TILE_ZOOM):
+        tiles |= tiles_for_bbox(cell_bbox(*cell_of(lat, lon, zoom), zoom), zoom)
+    return tiles
+
+
+# ---- rendering ----
+def render_tile(conn, zoom, x, y):
+    """Encode tile z/x/y as MVT bytes"""
+    bbox = tile_bbox(zoom, x, y, buffer=TILE_BUFFER / EXTENT)
+
+    def to_tile(lat, lon):
+        fx, fy = lonlat_to_world(lat, lon, zoom)
+        return (fx - x) * EXTENT, (fy - y) * EXTENT
+
+    if zoom < CLUSTER_TILE_ZOOM:
+        layer = PointLayer("clusters")
+        for cluster in query_clusters(conn, bbox, zoom):
+            # Grid cells straddle tile edges; each centroid belongs to one tile
+            px, py = to_tile(cluster['lat'], cluster['lon'])
+            if not (-TILE_BUFFER <= px < EXTENT + TILE_BUFFER and -TILE_BUFFER <= py < EXTENT + TILE_BUFFER):
+                continue
+            layer.add(px, py, {
+                "count": cluster['count'],
+                "severity": cluster['severity'],
+                "high": cluster['severity_counts']['high'],
+                "medium": cluster['severity_counts']['medium'],
+                "low": cluster['severity_counts']['low']
+            })
+        return encode_tile([layer])
+
+    min_lon, min_lat, max_lon, max_lat = bbox
+    rows = conn.execute("""
+        SELECT r.id, r.lat, r.lon, r.severity, r.upvotes, r.downvotes, r.verified
+        FROM reports_rtree g JOIN reports r ON r.id = g.id
+        WHERE g.min_lon <= ? AND g.max_lon >= ? AND g.min_lat <= ? AND g.max_lat >= ?
+        LIMIT ?
+    """, (max_lon, min_lon, max_lat, min_lat, MAX_TILE_FEATURES)).fetchall()
+
+    layer = PointLayer("reports")
+    for row in rows:
+        px, py = to_tile(row['lat'], row['lon'])
+        layer.add(px, py, {
+            "id": row['id'],
+            "severity": row['severity'],
+            "upvotes": row['upvotes'],
+            "downvotes": row['downvotes'],
+            "verified": bool(row['verified'])
+        }, feature_id=row['id'])
+    return encode_tile([layer])
+
+
+# ---- cache ----
+class TileCache:
+    """Rendered tiles on disk at <root>/<z>/<x>/<y>.mvt"""
+
+    def __init__(self, root, data_version=None):
+        self.root = root
+        self.data_version = data_version
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.stats = {"hits": 0, "misses": 0, "invalidated": 0}
+
+    def _marker(self):
+        """Changes with every invalidation, in this process or (via data_version) any other"""
+        return self._generation, self.data_version.read()[0] if self.data_version else None
+
+    def path(self, zoom, x, y):
+        return os.path.join(self.root, str(zoom), str(x), f"{y}.mvt")
+
+    def get(self, conn, zoom, x, y):
+        """Return tile bytes, rendering and storing them on a miss"""
+        path = self.path(zoom, x, y)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            self.stats["hits"] += 1
+            return data
+        except FileNotFoundError:
+            pass
+
+        self.stats["misses"] += 1
+        marker = self._marker()
+        data = render_tile(conn, zoom, x, y)
+
+        with self._lock:
+            # An invalidation raced the render; serve it but don't cache it
+            if marker != self._marker():
+                return data
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return data
+
+    def invalidate_point(self, lat, lon, min_zoom=0):
+        """Drop every cached tile a report at (lat, lon) shows up in, as itself or in a cluster"""
+        with self._lock:
+            self._generation += 1
+            for zoom, x, y in tiles_for_report(lat, lon, min_zoom=min_zoom):
+                try:
+                    os.remove(self.path(zoom, x, y))
+                    self.stats["invalidated"] += 1
+                except FileNotFoundError:
+                    pass
+
+    def invalidate_all(self):
+        """Drop the whole cache (bulk deletes, imports)"""
+        with self._lock:
+            self._generation += 1
+            if not os.path.isdir(self.root):
+                return
+            # Rename first so readers never see a half-deleted tree
+            doomed = f"{self.root}.{os.getpid()}.{self._generation}.old"
+            os.replace(self.root, doomed)
+        shutil.rmtree(doomed, ignore_errors=True)
+        logger.info("🧹 Tile cache cleared")
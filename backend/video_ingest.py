@@ -0,0 +1,351 @@
+"""
+Dashcam video ingestion: sampled frames -> tracked detections -> geo-located reports
+
+Frames are streamed from the video with OpenCV and sampled adaptively.
+Frames closer together than min_interval_s are only grabbed, never
+decoded. A decoded frame is kept when it differs enough from the last
+kept one (mean absolute difference of a 64x36 grey thumbnail), or when
+max_interval_s has passed, so a truck stopped at a light costs almost
+nothing. Kept frames go through the inference backend in batches.
+
+An IoU tracker links detections across frames, so one pothole seen in
+twenty frames becomes one track. A track becomes one report once it has
+at least min_hits sightings. The report is placed where the vehicle was
+when the track was last seen (the closest approach), interpolated
+linearly from the GPX or NMEA track. The best-scoring frame is stored as
+the report image.
+
+Reports are merged into nearby open reports (as add_report does) or
+written with bulk_ingest.insert_rows.
+"""
+
+import io
+import os
+import json
+import bisect
+import logging
+import calendar
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+import numpy as np
+from PIL import Image
+
+from blob_store import store_blob
+from bulk_ingest import insert_rows
+from dedup import find_duplicate, merge_submission
+from geo import haversine_m
+from image_variants import variant_url
+from model_backends import box_iou
+
+logger = logging.getLogger(__name__)
+
+MAX_GPS_GAP_S = 5.0  # how far past either end of the track a fix may be extrapolated
+SIGNATURE_SIZE = (64, 36)
+
+
+# ---- GPS tracks ----
+class GpsTrack:
+    """Time-ordered (epoch seconds, lat, lon) fixes with linear interpolation"""
+
+    def __init__(self, fixes):
+        fixes = sorted(fixes)
+        if len(fixes) < 2:
+            raise ValueError("GPS track needs at least two timestamped fixes")
+        self.times = [f[0] for f in fixes]
+        self.lats = [f[1] for f in fixes]
+        self.lons = [f[2] for f in fixes]
+
+    @property
+    def start(self):
+        return self.times[0]
+
+    def position_at(self, t):
+        """(lat, lon) at epoch time t, or None outside the track"""
+        if t < self.times[0] - MAX_GPS_GAP_S or t > self.times[-1] + MAX_GPS_GAP_S:
+            return None
+        i = min(max(bisect.bisect_left(self.times, t), 1), len(self.times) - 1)
+        t0, t1 = self.times[i - 1], self.times[i]
+        k = (t - t0) / (t1 - t0) if t1 > t0 else 0.0
+        return (self.lats[i - 1] + k * (self.lats[i] - self.lats[i - 1]),
+                self.lons[i - 1] + k * (self.lons[i] - self.lons[i - 1]))
+
+
+def iso_epoch(value):
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_gpx(text):
+    root = ET.fromstring(text)
+    fixes = []
+    for element in root.iter():
+        if element.tag.rsplit("}", 1)[-1] not in ("trkpt", "rtept", "wpt"):
+            continue
+        time_el = next((c for c in element if c.tag.rsplit("}", 1)[-1] == "time"), None)
+        if time_el is None or not time_el.text:
+            continue
+        fixes.append((iso_epoch(time_el.text), float(element.get("lat")), float(element.get("lon"))))
+    return GpsTrack(fixes)
+
+
+def _nmea_coord(value, hemisphere):
+    if not value:
+        return None
+    degrees_len = value.index(".") - 2
+    coord = float(value[:degrees_len]) + float(value[degrees_len:]) / 60.0
+    return -coord if hemisphere in ("S", "W") else coord
+
+
+def parse_nmea(lines):
+    """RMC sentences give date and time; GGA fixes reuse the last RMC date"""
+    fixes = []
+    date = None
+    for line in lines:
+        line = line.strip().split("*", 1)[0]
+        fields = line.split(",")
+        kind = fields[0][-3:] if fields[0].startswith("$") else ""
+        try:
+            if kind == "RMC" and len(fields) > 9 and fields[2] == "A":
+                date = fields[9]
+                time_str, lat, lon = fields[1], _nmea_coord(fields[3], fields[4]), _nmea_coord(fields[5], fields[6])
+            elif kind == "GGA" and len(fields) > 6 and fields[6] not in ("", "0") and date:
+                time_str, lat, lon = fields[1], _nmea_coord(fields[2], fields[3]), _nmea_coord(fields[4], fields[5])
+            else:
+                continue
+            if lat is None or lon is None:
+                continue
+            stamp = datetime.strptime(date + time_str.split(".")[0], "%d%m%y%H%M%S")
+            fraction = float("0." + time_str.split(".")[1]) if "." in time_str else 0.0
+        except ValueError:
+            continue  # garbled sentence
+        fixes.append((calendar.timegm(stamp.timetuple()) + fraction, lat, lon))
+    # RMC and GGA often report the same instant
+    return GpsTrack(list({f[0]: f for f in fixes}.values()))
+
+
+def load_track(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        if path.lower().endswith(".gpx"):
+            return parse_gpx(f.read())
+        return parse_nmea(f)
+
+
+# ---- frame sampling ----
+def iter_frames(path, min_interval_s=0.25, max_interval_s=2.0, diff_threshold=6.0, stats=None):
+    """Yield (seconds_into_video, rgb_array) for the frames worth analysing"""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"cannot open video {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, int(round(fps * min_interval_s)))
+    stats = stats if stats is not None else {}
+    stats.update(frames=0, decoded=0, kept=0)
+
+    last_signature, last_kept_t = None, None
+    index = -1
+    try:
+        while True:
+            index += 1
+            if index % step:
+                if not cap.grab():
+                    break
+                stats["frames"] += 1
+                continue
+            ok, frame = cap.read()
+            if not ok:
+                break
+            stats["frames"] += 1
+            stats["decoded"] += 1
+            t = index / fps
+
+            grey = cv2.cvtColor(cv2.resize(frame, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            signature = grey.astype(np.float32)
+            changed = last_signature is None or float(np.abs(signature - last_signature).mean()) >= diff_threshold
+            if not changed and t - last_kept_t < max_interval_s:
+                continue
+
+            last_signature, last_kept_t = signature, t
+            stats["kept"] += 1
+            yield t, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        cap.release()
+
+
+# ---- tracking ----
+class Track:
+    def __init__(self, t, detection, frame):
+        self.box = detection["box"]
+        self.label = detection["class"]
+        self.hits = 0
+        self.best_conf = -1.0
+        self.update(t, detection, frame)
+
+    def update(self, t, detection, frame):
+        self.box = detection["box"]
+        self.last_t = t
+        self.hits += 1
+        if detection["conf"] > self.best_conf:
+            self.best_conf = detection["conf"]
+            self.best_box = detection["box"]
+            self.best_t = t
+            self.best_frame = frame
+            height, width = frame.shape[:2]
+            box = detection["box"]
+            self.box_fraction = (box[2] - box[0]) * (box[3] - box[1]) / float(width * height)
+
+
+class IouTracker:
+    """Greedy IoU association of per-frame detections into tracks"""
+
+    def __init__(self, iou_threshold=0.2, max_age_s=1.5, min_hits=2):
+        self.iou_threshold = iou_threshold
+        self.max_age_s = max_age_s
+        self.min_hits = min_hits
+        self.active = []
+
+    def update(self, t, detections, frame):
+        """Feed one frame; returns tracks that just ended with enough hits"""
+        unmatched = list(self.active)
+        for detection in sorted(detections, key=lambda d: -d["conf"]):
+            best, best_iou = None, self.iou_threshold
+            for track in unmatched:
+                if track.label != detection["class"]:
+                    continue
+                iou = box_iou(track.box, detection["box"])
+                if iou >= best_iou:
+                    best, best_iou = track, iou
+            if best is None:
+                self.active.append(Track(t, detection, frame))
+            else:
+                best.update(t, detection, frame)
+                unmatched.remove(best)
+
+        ended = [tr for tr in self.active if t - tr.last_t > self.max_age_s]
+        self.active = [tr for tr in self.active if t - tr.last_t <= self.max_age_s]
+        return [tr for tr in ended if tr.hits >= self.min_hits]
+
+    def flush(self):
+        ended, self.active = self.active, []
+        return [tr for tr in ended if tr.hits >= self.min_hits]
+
+
+def severity_for(box_fraction):
+    """Rough severity from how much of the frame the pothole covers at its best view"""
+    if box_fraction >= 0.05:
+        return "high"
+    if box_fraction >= 0.015:
+        return "medium"
+    return "low"
+
+
+# ---- ingestion ----
+def _sql_time(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _save_frame(conn, store, track):
+    out = io.BytesIO()
+    Image.fromarray(track.best_frame).save(out, "JPEG", quality=85)
+    blob = store_blob(conn, store, out.getvalue(), "jpg")
+    return store.url(blob), variant_url(blob)
+
+
+def ingest_video(conn, video_path, gps, backend, user_id, store,
+                 start_epoch=None, batch_size=8, classes=None, dedup_radius_m=15,
+                 dedup_window_days=30, dry_run=False, tracker=None, sampling=None):
+    """Run the whole pipeline; returns a summary dict
+
+    start_epoch is when the video's first frame was recorded (defaults to
+    the start of the GPS track).
+    """
+    start_epoch = gps.start if start_epoch is None else start_epoch
+    tracker = tracker or IouTracker()
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    frame_stats = {}
+    sightings = []
+    summary = {"tracks": 0, "unlocated": 0, "inserted": 0, "merged": 0, "id_range": None}
+
+    def finish(tracks):
+        for track in tracks:
+            summary["tracks"] += 1
+            when = start_epoch + track.last_t
+            position = gps.position_at(when)
+            if position is None:
+                summary["unlocated"] += 1
+                continue
+            try:
+                # Embedded raw in API responses, so it must be strict JSON
+                ai_boxes = json.dumps([{"conf": track.best_conf, "box": track.best_box, "class": track.label}],
+                                      allow_nan=False)
+            except ValueError:
+                logger.warning(f"⚠️ Skipping track at {track.best_t:.1f}s: non-finite confidence or box")
+                continue
+            image_url, thumb_url = (None, None) if dry_run else _save_frame(conn, store, track)
+            minutes, seconds = divmod(int(track.best_t), 60)
+            sightings.append({
+                "text": f"Dashcam detection ({video_name} @ {minutes:02d}:{seconds:02d}, {track.hits} frames)",
+                "lat": position[0],
+                "lon": position[1],
+                "severity": severity_for(track.box_fraction),
+                "image_url": image_url,
+                "thumb_url": thumb_url,
+                "ai_conf": round(track.best_conf, 3),
+                "ai_boxes": ai_boxes,
+                "created_at": _sql_time(when),
+            })
+
+    def run_batch(batch):
+        outputs = backend.predict_batch([frame for _, frame in batch])
+        for (t, frame), detections in zip(batch, outputs):
+            if classes:
+                detections = [d for d in detections if d["class"] in classes]
+            finish(tracker.update(t, detections, frame))
+
+    batch = []
+    for t, frame in iter_frames(video_path, stats=frame_stats, **(sampling or {})):
+        batch.append((t, frame))
+        if len(batch) >= batch_size:
+            run_batch(batch)
+            batch = []
+    if batch:
+        run_batch(batch)
+    finish(tracker.flush())
+
+    summary["frames"] = frame_stats
+    if dry_run or not sightings:
+        summary["sightings"] = sightings if dry_run else []
+        return summary
+
+    # Potholes already reported nearby get a confirmation, like add_report;
+    # a track the tracker lost and re-found counts as the same pothole
+    new_rows = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for sighting in sightings:
+            duplicate = find_duplicate(conn, sighting["lat"], sighting["lon"], dedup_radius_m, dedup_window_days)
+            if any(haversine_m(sighting["lat"], sighting["lon"], row[2], row[3]) <= dedup_radius_m
+                   for row in new_rows):
+                summary["merged"] += 1
+            elif duplicate:
+                merge_submission(conn, duplicate, sighting)
+                summary["merged"] += 1
+            else:
+                new_rows.append((
+                    user_id, sighting["text"], sighting["lat"], sighting["lon"], sighting["severity"],
+                    sighting["image_url"], sighting["thumb_url"], sighting["ai_conf"], sighting["ai_boxes"],
+                    sighting["created_at"]
+                ))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    if new_rows:
+        summary["id_range"] = insert_rows(conn, new_rows)
+        summary["inserted"] = len(new_rows)
+    return summary
@@ -0,0 +1,49 @@
+"""
+Denormalized reports.upvotes / reports.downvotes maintenance
+
+The counters are kept current by triggers on the votes table (see
+migrations.m003_vote_counters); these helpers rebuild them from scratch
+and verify them.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTUAL_COUNTS_SQL = """
+    SELECT report_id,
+           SUM(vote_type = 'up') AS upvotes,
+           SUM(vote_type = 'down') AS downvotes
+    FROM votes
+    GROUP BY report_id -- full-scan-ok: maintenance only
+"""
+
+
+def repair_vote_counters(conn):
+    """Recompute every report's counters from the votes table; returns rows fixed
+
+    Runs inside the caller's transaction; the caller commits.
+    """
+    mismatches = check_vote_counters(conn)
+    conn.execute("""
+        UPDATE reports SET
+            upvotes = (SELECT COUNT(*) FROM votes v WHERE v.report_id = reports.id AND v.vote_type = 'up'),
+            downvotes = (SELECT COUNT(*) FROM votes v WHERE v.report_id = reports.id AND v.vote_type = 'down')
+        -- full-scan-ok: maintenance only
+    """)
+    logger.info(f"🔧 Vote counters rebuilt, {len(mismatches)} reports corrected")
+    return len(mismatches)
+
+
+def check_vote_counters(conn):
+    """Return reports whose stored counters disagree with the votes table"""
+    rows = conn.execute(f"""
+        SELECT r.id AS report_id,
+               r.upvotes AS stored_up, COALESCE(c.upvotes, 0) AS actual_up,
+               r.downvotes AS stored_down, COALESCE(c.downvotes, 0) AS actual_down
+        FROM reports r
+        LEFT JOIN ({ACTUAL_COUNTS_SQL}) AS c ON c.report_id = r.id
+        WHERE r.upvotes != COALESCE(c.upvotes, 0) OR r.downvotes != COALESCE(c.downvotes, 0)
+        -- full-scan-ok: maintenance only
+    """).fetchall()
+    return [dict(row) for row in rows]
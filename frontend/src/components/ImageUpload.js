@@ -1,12 +1,38 @@
 import React, { useState } from 'react';
 import { api } from '../utils/api';
 import { validateImage } from '../utils/helpers';
+import { useSocket } from '../context/SocketContext';
+
+const JOB_POLL_MS = 3000;
 
 const ImageUpload = ({ onDetectionComplete }) => {
   const [uploading, setUploading] = useState(false);
   const [preview, setPreview] = useState(null);
   const [results, setResults] = useState(null);
   const [error, setError] = useState('');
+  const { socket } = useSocket();
+
+  // Resolve with the finished job from the Socket.IO push, polling as a fallback
+  const waitForJob = (jobId) => new Promise((resolve) => {
+    let timer = null;
+    const finish = (job) => {
+      if (job.job_id !== jobId || !['done', 'failed'].includes(job.state)) return;
+      clearInterval(timer);
+      if (socket) socket.off('analysis_done', finish);
+      resolve(job);
+    };
+    if (socket) {
+      socket.on('analysis_done', finish);
+      socket.emit('watch_job', { job_id: jobId, token: localStorage.getItem('token') });
+    }
+    timer = setInterval(async () => {
+      try {
+        finish((await api.get(`/api/jobs/${jobId}`)).data);
+      } catch (e) {
+        // keep waiting; the socket may still deliver
+      }
+    }, JOB_POLL_MS);
+  });
 
   const handleFileSelect = (e) => {
     const file = e.target.files[0];
@@ -39,16 +65,25 @@ const ImageUpload = ({ onDetectionComplete }) => {
     formData.append('image', file);
 
     try {
-      const response = await api.post('/api/analyze-image', formData, {
+      const response = await api.post('/api/analyze-image?async=1', formData, {
         headers: { 'Content-Type': 'multipart/form-data' }
       });
-      
-      setResults(response.data);
+
+      let data = response.data;
+      if (response.status === 202) {
+        const job = await waitForJob(data.job_id);
+        if (job.state === 'failed') {
+          throw new Error(job.error || 'Analysis failed');
+        }
+        data = { status: 'success', ...job.result };
+      }
+
+      setResults(data);
       if (onDetectionComplete) {
-        onDetectionComplete(response.data);
+        onDetectionComplete(data);
       }
     } catch (error) {
-      setError(error.response?.data?.error || 'Upload failed');
+      setError(error.response?.data?.error || error.message || 'Upload failed');
     } finally {
       setUploading(false);
     }
@@ -1,5 +1,5 @@
-import React, { useEffect, useState } from 'react';
-import { MapContainer, TileLayer, Marker, Popup, useMap } from 'react-leaflet';
+import React, { useCallback, useEffect, useState } from 'react';
+import { MapContainer, TileLayer, Marker, Popup, useMapEvents } from 'react-leaflet';
 import { api } from '../utils/api';
 import { useSocket } from '../context/SocketContext';
 import 'leaflet/dist/leaflet.css';
@@ -13,28 +13,29 @@ L.Icon.Default.mergeOptions({
   shadowUrl: 'https://cdnjs.cloudflare.com/ajax/libs/leaflet/1.7.1/images/marker-shadow.png',
 });
 
-const MapUpdater = ({ reports }) => {
-  const map = useMap();
-  
+// Below this zoom the map shows server-side clusters instead of markers
+const CLUSTER_BELOW_ZOOM = 15;
+
+// Re-query the reports inside the visible viewport whenever the map settles
+const ViewportWatcher = ({ onViewportChange }) => {
+  const map = useMapEvents({
+    moveend: () => onViewportChange(map.getBounds(), map.getZoom()),
+  });
+
   useEffect(() => {
-    if (reports.length > 0) {
-      const group = new L.FeatureGroup(reports.map(report => 
-        L.marker([report.lat, report.lon])
-      ));
-      map.fitBounds(group.getBounds().pad(0.1));
-    }
-  }, [reports, map]);
+    onViewportChange(map.getBounds(), map.getZoom());
+  }, [map, onViewportChange]);
 
   return null;
 };
 
 const PotholeMap = ({ selectedReport, onReportSelect }) => {
   const [reports, setReports] = useState([]);
+  const [clusters, setClusters] = useState([]);
   const [position, setPosition] = useState([51.505, -0.09]); // Default London
   const { reports: socketReports } = useSocket();
 
   useEffect(() => {
-    fetchReports();
     getCurrentLocation();
   }, []);
 
@@ -49,14 +50,28 @@ const PotholeMap = ({ selectedReport, onReportSelect }) => {
     }
   }, [socketReports]);
 
-  const fetchReports = async () => {
+  const fetchReports = useCallback(async (bounds, zoom) => {
+    const bbox = [
+      Math.max(bounds.getWest(), -180),
+      Math.max(bounds.getSouth(), -90),
+      Math.min(bounds.getEast(), 180),
+      Math.min(bounds.getNorth(), 90)
+    ].map(v => v.toFixed(6)).join(',');
+
     try {
-      const response = await api.get('/api/reports?limit=100');
-      setReports(response.data.reports);
+      if (zoom < CLUSTER_BELOW_ZOOM) {
+        const response = await api.get(`/api/clusters?bbox=${bbox}&zoom=${zoom}`);
+        setClusters(response.data.clusters);
+        setReports([]);
+      } else {
+        const response = await api.get(`/api/reports?limit=500&bbox=${bbox}`);
+        setReports(response.data.reports);
+        setClusters([]);
+      }
     } catch (error) {
       console.error('Failed to fetch reports for map:', error);
     }
-  };
+  }, []);
 
   const getCurrentLocation = () => {
     if (navigator.geolocation) {
@@ -96,6 +111,27 @@ const PotholeMap = ({ selectedReport, onReportSelect }) => {
     });
   };
 
+  const createClusterIcon = (cluster) => {
+    const size = Math.min(56, 24 + Math.round(Math.log2(cluster.count) * 4));
+    return L.divIcon({
+      className: 'custom-marker',
+      html: `<div style="
+        background-color: ${getMarkerColor(cluster.severity)};
+        width: ${size}px;
+        height: ${size}px;
+        line-height: ${size - 6}px;
+        border-radius: 50%;
+        border: 3px solid white;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.3);
+        color: white;
+        font-weight: bold;
+        text-align: center;
+      ">${cluster.count}</div>`,
+      iconSize: [size, size],
+      iconAnchor: [size / 2, size / 2]
+    });
+  };
+
   const getSeverityBadge = (severity) => {
     const severityStyles = {
       low: 'bg-success',
@@ -117,7 +153,15 @@ const PotholeMap = ({ selectedReport, onReportSelect }) => {
           url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
         />
         
-        <MapUpdater reports={reports} />
+        <ViewportWatcher onViewportChange={fetchReports} />
+
+        {clusters.map(cluster => (
+          <Marker
+            key={`cluster-${cluster.cell.join('-')}`}
+            position={[cluster.lat, cluster.lon]}
+            icon={createClusterIcon(cluster)}
+          />
+        ))}
         
         {reports.map(report => (
           <Marker
@@ -28,6 +28,13 @@ export const SocketProvider = ({ children }) => {
       setReports(prev => [report, ...prev]);
     });
 
+    // A duplicate submission was merged into an existing report
+    newSocket.on('report_confirmed', (report) => {
+      setReports(prev => prev.map(existing =>
+        existing.id === report.id ? { ...existing, ...report } : existing
+      ));
+    });
+
     newSocket.on('new_comment', (comment) => {
       setComments(prev => ({
         ...prev,
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { api } from '../utils/api';
 import CommentsSection from '../components/CommentsSection';
-import { formatDate, getSeverityBadge } from '../utils/helpers';
+import { formatDate, getSeverityBadge, imageVariant } from '../utils/helpers';
 
 const ReportPage = () => {
   const { id } = useParams();
@@ -72,7 +72,8 @@ const ReportPage = () => {
           <div className="card shadow-sm mb-4">
             {report.image_url && (
               <img 
-                src={report.image_url} 
+                src={imageVariant(report.image_url, 960)}
+                srcSet={`${imageVariant(report.image_url, 960)} 1x, ${imageVariant(report.image_url, 1600)} 2x`}
                 className="card-img-top"
                 alt="Pothole report"
                 style={{ maxHeight: '500px', objectFit: 'cover' }}
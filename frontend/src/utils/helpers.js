@@ -37,4 +37,9 @@ export const validateImage = (file) => {
   }
 
   return { valid: true };
-};
\ No newline at end of file
+};
+// Resized variant of an uploaded image (served by /img on the backend); other URLs pass through
+export const imageVariant = (url, width) => {
+  const match = url && url.match(/^\/static\/uploads\/(?:[0-9a-f]{2}\/[0-9a-f]{2}\/)?([^/?]+)$/);
+  return match ? `/img/${match[1]}?w=${width}` : url;
+};